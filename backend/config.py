@@ -4,7 +4,7 @@ Loads environment variables from .env file.
 """
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from functools import lru_cache
+from functools import cache
 
 
 class Settings(BaseSettings):
@@ -14,6 +14,7 @@ class Settings(BaseSettings):
     app_name: str = "Thumbnail Generator API"
     debug: bool = False
     api_version: str = "v1"
+    log_level: str = "info"
 
     # CORS
     cors_origins: list[str] = ["http://localhost:3000"]
@@ -42,14 +43,63 @@ class Settings(BaseSettings):
     flux_guidance_scale: float = 3.5
     flux_inference_steps: int = 28
 
+    # Start the FLUX fallback if PuLID has not finished after this many seconds
+    pulid_speculative_fallback: bool = True
+    pulid_fallback_delay: float = 2.0
+
+    # Worker threads for blocking OpenAI / YouTube calls
+    ai_pool_workers: int = 16
+
+    # Encoding of images returned with text overlays: "jpeg", "webp" or "png"
+    overlay_output_format: str = "jpeg"
+
+    # Starting limit for concurrent Gemini calls (halves on 429s, regrows on success)
+    gemini_max_concurrency: int = 4
+
+    # Identical Gemini requests reuse a result from the last 10 minutes (0 disables)
+    gemini_result_cache_size: int = 16
+
+    # OpenAI account quota; async prompt calls are paced to stay under it (0 disables)
+    openai_requests_per_minute: float = 500
+    openai_tokens_per_minute: float = 30000
+
+    # Prompt-generation model tier: "fast"/"balanced" use gpt-4o-mini, "best" gpt-4o
+    prompt_quality: str = "balanced"
+
+    # Overrides the prompt_quality model choice when set
+    prompt_model: str = ""
+
+    # Vision model for reference/face analysis, and an optional second model
+    # each analysis is also run on in the background to log differences
+    vision_model: str = "gpt-4o-mini"
+    vision_shadow_model: str = ""
+
+    # Limit for concurrent async vision calls (halves if OpenAI keeps rate limiting, regrows on success)
+    vision_max_concurrency: int = 20
+
+    # Seconds a face photo waits for photos from concurrent requests to share
+    # one vision call (0 sends each request's faces straight away)
+    face_batch_window: float = 0.0
+
+    # Identical prompt requests reuse a result from the last hour (0 disables)
+    prompt_cache_size: int = 256
+
+    # SQLite file persisting prompts and vision analyses for a week across restarts (empty disables)
+    llm_cache_path: str = ""
+
     model_config = SettingsConfigDict(
-        env_file=".env",
+        # Containers inject env vars directly; only read .env when one exists
+        env_file=".env" if os.path.exists(".env") else None,
         env_file_encoding="utf-8",
         case_sensitive=False,
+        frozen=True,
+        # Defaults are trusted literals, so skip revalidating them
+        validate_default=False,
+        extra="ignore",
     )
 
 
-@lru_cache()
+@cache
 def get_settings() -> Settings:
     """Get cached settings instance."""
     return Settings()
@@ -57,9 +107,3 @@ def get_settings() -> Settings:
 
 # Export settings instance
 settings = get_settings()
-
-# Set API keys in environment for clients to pick up
-if settings.fal_key:
-    os.environ["FAL_KEY"] = settings.fal_key
-if settings.google_ai_api_key:
-    os.environ["GOOGLE_AI_API_KEY"] = settings.google_ai_api_key
@@ -2,14 +2,36 @@
 AI Thumbnail Generator - FastAPI Backend
 Main application entry point.
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+from __future__ import annotations
+
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, File, Form, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Iterable, Optional, TYPE_CHECKING
+import asyncio
+import functools
+import hashlib
+import logging
+import logging.handlers
 import os
+import queue
+
+import orjson
+from async_lru import alru_cache
 
 from config import settings
+from services.base64_codec import b64encode_as_string, strip_data_uri
+from services.cache import TTLCache
+from services.llm_cache import LLMCache
 from models import (
+    MAX_FACE_IMAGES,
+    MAX_IMAGE_BYTES,
+    MAX_REFERENCE_THUMBNAILS,
+    ReferenceImage,
+    FacePhotoWithName,
     VideoURLRequest,
     PromptRequest,
     InpaintRequest,
@@ -21,64 +43,184 @@ from models import (
     TemplateResponse,
     HealthResponse,
 )
-from services import (
-    VideoAnalyzer,
-    PromptGenerator,
-    ImageGenerator,
-    ImagenGenerator,
-    TextOverlayService,
-    LoRATrainer,
-    ReferenceAnalyzer,
-)
+
+# Service classes are imported inside lifespan() so the AI SDKs only load
+# when the service is actually constructed.
+if TYPE_CHECKING:
+    from services import (
+        VideoAnalyzer,
+        PromptGenerator,
+        ImageGenerator,
+        ImagenGenerator,
+        TextOverlayService,
+        LoRATrainer,
+        ReferenceAnalyzer,
+        FaceAnalysisBatcher,
+    )
+
+
+# Records are formatted where they are logged but written to stderr by a
+# listener thread, so a slow terminal or log pipe never stalls the event loop
+_LOG_QUEUE: queue.SimpleQueue = queue.SimpleQueue()
+_LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, logging.StreamHandler())
+logging.basicConfig(level=settings.log_level.upper(), handlers=[logging.handlers.QueueHandler(_LOG_QUEUE)])
+logger = logging.getLogger(__name__)
 
 
 # ============================================
 # Application Lifespan
 # ============================================
 
+# Service singletons, set once in lifespan and returned directly by the
+# dependency getters so requests skip the app.state attribute lookup.
+_VIDEO_ANALYZER: Optional[VideoAnalyzer] = None
+_PROMPT_GENERATOR: Optional[PromptGenerator] = None
+_REFERENCE_ANALYZER: Optional[ReferenceAnalyzer] = None
+_IMAGE_GENERATOR: Optional[ImageGenerator] = None
+_IMAGEN: Optional[ImagenGenerator] = None
+_TEXT_OVERLAY: Optional[TextOverlayService] = None
+_LORA_TRAINER: Optional[LoRATrainer] = None
+_LLM_CACHE: Optional[LLMCache] = None
+_FACE_BATCHER: Optional[FaceAnalysisBatcher] = None
+
+# Bounded pool for the blocking OpenAI / YouTube SDK calls, kept separate from
+# the default executor so AI latency cannot starve other to_thread work.
+_AI_POOL: Optional[ThreadPoolExecutor] = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking AI/API call on the AI thread pool.
+
+    Args:
+        func: Synchronous callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The callable's return value
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_AI_POOL, functools.partial(func, *args, **kwargs))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application startup and shutdown events."""
-    # Startup: Initialize services
-    app.state.video_analyzer = VideoAnalyzer(settings.youtube_api_key)
-    app.state.prompt_generator = PromptGenerator(settings.openai_api_key)
-    app.state.reference_analyzer = ReferenceAnalyzer(settings.openai_api_key)
-    app.state.image_generator = ImageGenerator()  # FLUX (fallback)
-    app.state.text_overlay = TextOverlayService()
+    global _VIDEO_ANALYZER, _PROMPT_GENERATOR, _REFERENCE_ANALYZER
+    global _IMAGE_GENERATOR, _IMAGEN, _TEXT_OVERLAY, _LORA_TRAINER, _AI_POOL, _LLM_CACHE, _FACE_BATCHER
+
+    _LOG_LISTENER.start()
+
+    # Startup: Set API keys in environment for clients to pick up
+    if settings.fal_key:
+        os.environ["FAL_KEY"] = settings.fal_key
+    if settings.google_ai_api_key:
+        os.environ["GOOGLE_AI_API_KEY"] = settings.google_ai_api_key
+
+    _AI_POOL = ThreadPoolExecutor(max_workers=settings.ai_pool_workers, thread_name_prefix="ai")
+
+    # Initialize services
+    if settings.llm_cache_path:
+        _LLM_CACHE = LLMCache(settings.llm_cache_path)
+    from services.video_analyzer import VideoAnalyzer
+    _VIDEO_ANALYZER = VideoAnalyzer(settings.youtube_api_key)
+    from services.prompt_generator import PromptGenerator
+    _PROMPT_GENERATOR = PromptGenerator(
+        settings.openai_api_key,
+        model=settings.prompt_model or None,
+        quality=settings.prompt_quality,
+        requests_per_minute=settings.openai_requests_per_minute,
+        tokens_per_minute=settings.openai_tokens_per_minute,
+        result_cache_size=settings.prompt_cache_size,
+        persistent_cache=_LLM_CACHE,
+    )
+    from services.reference_analyzer import ReferenceAnalyzer
+    _REFERENCE_ANALYZER = ReferenceAnalyzer(
+        settings.openai_api_key,
+        model=settings.vision_model,
+        shadow_model=settings.vision_shadow_model or None,
+        max_concurrency=settings.vision_max_concurrency,
+    )
+    if settings.face_batch_window > 0:
+        from services.reference_analyzer import FaceAnalysisBatcher
+        _FACE_BATCHER = FaceAnalysisBatcher(_REFERENCE_ANALYZER, window=settings.face_batch_window)
+    # FLUX (fallback) ImageGenerator is created on first use in get_image_generator
+    from services.text_overlay import TextOverlayService
+    _TEXT_OVERLAY = TextOverlayService(output_format=settings.overlay_output_format)
 
     # Initialize Imagen generator if API key is available
     if settings.google_ai_api_key:
         try:
-            app.state.imagen_generator = ImagenGenerator(settings.google_ai_api_key)
-            print("Google Imagen generator initialized successfully")
+            from services.imagen_generator import ImagenGenerator
+            _IMAGEN = ImagenGenerator(
+                settings.google_ai_api_key,
+                max_concurrency=settings.gemini_max_concurrency,
+                result_cache_size=settings.gemini_result_cache_size,
+            )
+            logger.info("Google Imagen generator initialized successfully")
         except Exception as e:
-            print(f"Failed to initialize Imagen generator: {e}")
-            app.state.imagen_generator = None
+            logger.warning("Failed to initialize Imagen generator: %s", e)
+            _IMAGEN = None
     else:
-        app.state.imagen_generator = None
-        print("Google AI API key not configured, using FLUX only")
+        _IMAGEN = None
+        logger.info("Google AI API key not configured, using FLUX only")
 
-    app.state.lora_trainer = LoRATrainer(
-        supabase_url=settings.supabase_url,
-        supabase_key=settings.supabase_service_key
-    )
+    # Connect to Supabase up front only when it is configured; otherwise the
+    # trainer (and the fal/supabase SDKs) load on first face-model request
+    if settings.supabase_url and settings.supabase_service_key:
+        get_lora_trainer()
 
     yield
 
-    # Shutdown: Cleanup if needed
-    pass
+    # Shutdown: Release the pooled HTTP connections held by long-lived clients
+    if _LORA_TRAINER is not None:
+        _LORA_TRAINER.close()
+    _VIDEO_ANALYZER.close()
+    await _PROMPT_GENERATOR.aclose()
+    await _REFERENCE_ANALYZER.aclose()
+    if _IMAGEN is not None:
+        await _IMAGEN.aclose()
+    if _LLM_CACHE is not None:
+        _LLM_CACHE.close()
+    _AI_POOL.shutdown(wait=False, cancel_futures=True)
+    # Drains the records still queued before returning
+    _LOG_LISTENER.stop()
 
 
 # ============================================
 # FastAPI Application
 # ============================================
 
+class ORJSONRequest(Request):
+    """Request that parses JSON bodies with orjson instead of the stdlib."""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """Route that hands its endpoint an ORJSONRequest, so multi-MB base64 bodies parse fast."""
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request) -> Response:
+            return await route_handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
+
+
 app = FastAPI(
     title=settings.app_name,
     version=settings.api_version,
     description="AI-powered YouTube thumbnail generation API",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
+app.router.route_class = ORJSONRoute
 
 # CORS middleware
 app.add_middleware(
@@ -95,31 +237,78 @@ app.add_middleware(
 # ============================================
 
 def get_video_analyzer() -> VideoAnalyzer:
-    return app.state.video_analyzer
+    return _VIDEO_ANALYZER
 
 
 def get_prompt_generator() -> PromptGenerator:
-    return app.state.prompt_generator
+    return _PROMPT_GENERATOR
 
 
 def get_reference_analyzer() -> ReferenceAnalyzer:
-    return app.state.reference_analyzer
+    return _REFERENCE_ANALYZER
 
 
 def get_image_generator() -> ImageGenerator:
-    return app.state.image_generator
+    global _IMAGE_GENERATOR
+    if _IMAGE_GENERATOR is None:
+        from services.image_generator import ImageGenerator
+        _IMAGE_GENERATOR = ImageGenerator(
+            speculative_fallback=settings.pulid_speculative_fallback,
+            fallback_delay=settings.pulid_fallback_delay,
+        )
+    return _IMAGE_GENERATOR
 
 
 def get_lora_trainer() -> LoRATrainer:
-    return app.state.lora_trainer
+    global _LORA_TRAINER
+    if _LORA_TRAINER is None:
+        from services.lora_trainer import LoRATrainer
+        _LORA_TRAINER = LoRATrainer(
+            supabase_url=settings.supabase_url,
+            supabase_key=settings.supabase_service_key
+        )
+    return _LORA_TRAINER
 
 
 def get_imagen_generator() -> Optional[ImagenGenerator]:
-    return getattr(app.state, 'imagen_generator', None)
+    return _IMAGEN
 
 
 def get_text_overlay() -> TextOverlayService:
-    return app.state.text_overlay
+    return _TEXT_OVERLAY
+
+
+class _ModelNotReady(Exception):
+    """Raised for models that are missing or still training, so they are not cached."""
+
+
+@alru_cache(maxsize=512, ttl=600)
+async def _fetch_completed_model(lora_trainer: LoRATrainer, model_id: str) -> dict:
+    model = await lora_trainer.get_training_status(model_id)
+    if not model or model.get("training_status") != "completed":
+        raise _ModelNotReady(model_id)
+    return model
+
+
+async def get_completed_model(lora_trainer: LoRATrainer, model_id: str) -> Optional[dict]:
+    """
+    Look up a face model, returning it only once training has completed.
+
+    Completed models never change, so they are cached for a few minutes to
+    skip the Supabase round-trip on repeat generations. Pending models are
+    re-fetched every time so a finished training run is picked up immediately.
+
+    Args:
+        lora_trainer: LoRA trainer service
+        model_id: Face model ID
+
+    Returns:
+        The completed model record, or None
+    """
+    try:
+        return await _fetch_completed_model(lora_trainer, model_id)
+    except _ModelNotReady:
+        return None
 
 
 # ============================================
@@ -176,19 +365,54 @@ TEMPLATES = {
     },
 }
 
+# Templates are static: validate them once at import and keep the serialized
+# JSON bytes so the endpoints skip validation and encoding per request.
+_TEMPLATE_BY_ID = {k: TemplateResponse(**v) for k, v in TEMPLATES.items()}
+_TEMPLATES_JSON = orjson.dumps([t.model_dump() for t in _TEMPLATE_BY_ID.values()])
+_TEMPLATE_JSON_BY_ID = {k: orjson.dumps(t.model_dump()) for k, t in _TEMPLATE_BY_ID.items()}
+
+
+def _compute_etag(body: bytes) -> str:
+    """Build a strong ETag from serialized response bytes."""
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+# Templates only change at deploy time, so their ETags are fixed for the process
+_TEMPLATES_ETAG = _compute_etag(_TEMPLATES_JSON)
+_TEMPLATE_ETAG_BY_ID = {k: _compute_etag(v) for k, v in _TEMPLATE_JSON_BY_ID.items()}
+TEMPLATE_CACHE_CONTROL = "public, max-age=3600"
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Check whether the client's If-None-Match already covers this ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _template_response(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": TEMPLATE_CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@app.get("/templates", response_model=list[TemplateResponse])
-async def get_templates():
+
+@app.get("/templates", responses={200: {"model": list[TemplateResponse]}})
+async def get_templates(request: Request):
     """Get all available thumbnail templates."""
-    return [TemplateResponse(**t) for t in TEMPLATES.values()]
+    return _template_response(request, _TEMPLATES_JSON, _TEMPLATES_ETAG)
 
 
-@app.get("/templates/{template_id}", response_model=TemplateResponse)
-async def get_template(template_id: str):
+@app.get("/templates/{template_id}", responses={200: {"model": TemplateResponse}})
+async def get_template(template_id: str, request: Request):
     """Get a specific template by ID."""
-    if template_id not in TEMPLATES:
+    try:
+        body = _TEMPLATE_JSON_BY_ID[template_id]
+    except KeyError:
         raise HTTPException(status_code=404, detail="Template not found")
-    return TemplateResponse(**TEMPLATES[template_id])
+    return _template_response(request, body, _TEMPLATE_ETAG_BY_ID[template_id])
 
 
 # ============================================
@@ -202,7 +426,7 @@ async def analyze_video(
 ):
     """Analyze a YouTube video and extract metadata + transcript."""
     try:
-        data = video_analyzer.analyze(url)
+        data = await run_blocking(video_analyzer.analyze, url)
         return VideoAnalysisResponse(
             video_id=data["video_id"],
             title=data["title"],
@@ -221,172 +445,578 @@ async def analyze_video(
 # Generation Endpoints
 # ============================================
 
-@app.post("/generate/from-url", response_model=ThumbnailResponse)
-async def generate_from_url(
-    request: VideoURLRequest,
-    video_analyzer: VideoAnalyzer = Depends(get_video_analyzer),
-    prompt_generator: PromptGenerator = Depends(get_prompt_generator),
-    reference_analyzer: ReferenceAnalyzer = Depends(get_reference_analyzer),
-    image_generator: ImageGenerator = Depends(get_image_generator),
-    imagen_generator: Optional[ImagenGenerator] = Depends(get_imagen_generator),
-    text_overlay: TextOverlayService = Depends(get_text_overlay),
-    lora_trainer: LoRATrainer = Depends(get_lora_trainer),
-):
-    """Generate thumbnails from a YouTube URL."""
-    import traceback
-    try:
-        print(f"[DEBUG] Starting generation for URL: {request.url}")
-        # Step 1: Analyze video to get context
-        print(f"[DEBUG] Step 1: Analyzing YouTube video for context...")
-        video_data = video_analyzer.analyze(request.url)
-        print(f"[DEBUG] Video context extracted:")
-        print(f"  - Title: {video_data.get('title', 'N/A')}")
-        print(f"  - Channel: {video_data.get('channel', 'N/A')}")
-        print(f"  - Tags: {video_data.get('tags', [])[:5]}")
-        print(f"  - Description: {video_data.get('description', 'N/A')[:200]}...")
-        print(f"  - Transcript available: {'Yes' if video_data.get('transcript') else 'No'}")
-
-        # Step 2: Get face model if specified (for FLUX only)
-        lora_url = None
-        trigger_word = "person"
+async def overlay_image(
+    text_overlay: TextOverlayService,
+    image: str,
+    text: str,
+    **text_options,
+) -> str:
+    """
+    Add a readability gradient and text to one image in worker threads.
+
+    Args:
+        text_overlay: Text overlay service
+        image: Base64 data URI
+        text: Text to draw (used as given)
+        **text_options: Extra keyword arguments for add_text
+
+    Returns:
+        Image with text as a base64 data URI
+    """
+    # Add gradient background for readability, kept as a PIL image so the
+    # intermediate result is never PNG/base64 encoded
+    img_with_gradient = await asyncio.to_thread(
+        text_overlay.add_gradient_background,
+        image, position="bottom", opacity=0.5, height_ratio=0.35, as_image=True,
+    )
+    # Add the text
+    return await asyncio.to_thread(
+        text_overlay.add_text,
+        image_data=img_with_gradient,
+        text=text,
+        **text_options,
+    )
 
-        if request.face_model_id:
-            model = await lora_trainer.get_training_status(request.face_model_id)
-            if model and model.get("training_status") == "completed":
-                lora_url = model.get("lora_url")
-                trigger_word = model.get("trigger_word", "person")
 
-        # Step 3: Analyze reference thumbnails if provided
+async def apply_text_overlay(
+    text_overlay: TextOverlayService,
+    images: list[str],
+    text: str,
+    **text_options,
+) -> list[str]:
+    """
+    Add a readability gradient and the thumbnail text to each image.
+
+    Images are composited concurrently in worker threads so PIL work does not
+    block the event loop and N variations cost roughly one image's time.
+
+    Args:
+        text_overlay: Text overlay service
+        images: Base64 data URIs of the generated images
+        text: Thumbnail text (uppercased once here)
+        **text_options: Extra keyword arguments for add_text
+
+    Returns:
+        Images with text, in the original order
+    """
+    text = text.upper()
+    return list(await asyncio.gather(
+        *(overlay_image(text_overlay, img, text, **text_options) for img in images)
+    ))
+
+
+# Vision analysis results keyed by a SHA-256 of the uploaded images, so
+# iterating on prompts with the same references skips the GPT-4V call.
+_ANALYSIS_CACHE = TTLCache(maxsize=256, ttl=3600)
+
+
+def _hash_images(kind: str, parts: Iterable[tuple[str | bytes, Optional[str]]]) -> str:
+    digest = hashlib.sha256(kind.encode())
+    for data, extra in parts:
+        digest.update(b"\0")
+        digest.update(data.encode() if isinstance(data, str) else data)
+        digest.update(b"\0")
+        digest.update((extra or "").encode())
+    return digest.hexdigest()
+
+
+def _unique_images(images: list[FacePhotoWithName]) -> list[FacePhotoWithName]:
+    """Drop repeated uploads of the same image, keeping the first occurrence."""
+    seen = set()
+    unique = []
+    for image in images:
+        data = strip_data_uri(image.data)
+        digest = hashlib.blake2b(data.encode() if isinstance(data, str) else data, digest_size=12).digest()
+        if digest not in seen:
+            seen.add(digest)
+            unique.append(image)
+    return unique
+
+
+async def _lookup_analysis(key: str, version: str):
+    cached = _ANALYSIS_CACHE.get(key)
+    if cached is None and _LLM_CACHE is not None:
+        # A re-upload after a restart still skips the vision call
+        cached = await run_blocking(_LLM_CACHE.check, key, version)
+        if cached is not None:
+            _ANALYSIS_CACHE.set(key, cached)
+    return cached
+
+
+async def _store_analysis(key: str, version: str, result) -> None:
+    _ANALYSIS_CACHE.set(key, result)
+    if _LLM_CACHE is not None:
+        await run_blocking(_LLM_CACHE.save, key, version, result)
+
+
+async def _cached_analysis(key: str, version: str, func, payload: Iterable):
+    cached = await _lookup_analysis(key, version)
+    if cached is not None:
+        return cached
+    result = await func(payload)
+    if result:
+        await _store_analysis(key, version, result)
+    return result
+
+
+async def _describe_faces(reference_analyzer: ReferenceAnalyzer, face_images: list[FacePhotoWithName]) -> list:
+    """
+    Describe face photos, one per photo, through the batcher when enabled.
+
+    A None entry means the model did not describe every photo sent with it,
+    so the descriptions could be misaligned and none of them can be trusted;
+    an empty one means that photo alone got no description.
+    """
+    if _FACE_BATCHER is not None:
+        return await asyncio.gather(*(_FACE_BATCHER.describe(photo) for photo in face_images))
+    descriptions = (await reference_analyzer.aanalyze_face_photos(face_images))["face_descriptions"]
+    if len(descriptions) != len(face_images):
+        return [None] * len(face_images)
+    return descriptions
+
+
+async def _cached_face_analysis(reference_analyzer: ReferenceAnalyzer, face_images: list[FacePhotoWithName]) -> dict:
+    """
+    Analyze face photos, caching each photo's description on its own.
+
+    A set that adds one face to photos analyzed before only sends the new
+    face to the vision model.
+
+    Args:
+        reference_analyzer: Reference analyzer service
+        face_images: Face photos from the request
+
+    Returns:
+        Face analysis as from ReferenceAnalyzer.analyze_face_photos
+    """
+    version = reference_analyzer.prompt_version
+    keys = [_hash_images("face", ((photo.data, None),)) for photo in face_images]
+    descriptions = list(await asyncio.gather(*(_lookup_analysis(key, version) for key in keys)))
+
+    missing = [i for i, description in enumerate(descriptions) if description is None]
+    if missing:
+        logger.debug("Analyzing %d new face photo(s)...", len(missing))
+        fresh = await _describe_faces(reference_analyzer, [face_images[i] for i in missing])
+        for i, description in zip(missing, fresh):
+            if not description:
+                descriptions[i] = "A person"
+            else:
+                descriptions[i] = description
+                await _store_analysis(keys[i], version, description)
+
+    return reference_analyzer.face_analysis_from_descriptions(descriptions)
+
+
+async def prepare_references_and_faces(
+    reference_analyzer: ReferenceAnalyzer,
+    reference_thumbnails: Optional[list[ReferenceImage]],
+    face_images: Optional[list[FacePhotoWithName]],
+) -> tuple[Optional[dict], Optional[str], Optional[list[tuple[str, str]]], Optional[str]]:
+    """
+    Analyze reference thumbnails and face photos concurrently.
+
+    Both analyses are optional: a failure is logged and treated as if the
+    images were not provided. Results are cached by image content hash.
+
+    Args:
+        reference_analyzer: Reference analyzer service
+        reference_thumbnails: Style reference thumbnails from the request
+        face_images: Face photos from the request
+
+    Returns:
+        Tuple of (reference_analysis, face_description, face_photos_data,
+        reference_image), where face_photos_data is a list of (data, name)
+        tuples for imagen_generator and reference_image is the first
+        reference thumbnail (used for FORMAT only)
+    """
+    # The same face uploaded twice would be analyzed and sent to Gemini twice
+    if face_images:
+        unique_faces = _unique_images(face_images)
+        if len(unique_faces) < len(face_images):
+            logger.debug("Dropped %d duplicate face photo(s)", len(face_images) - len(unique_faces))
+            face_images = unique_faces
+
+    async def analyze_references():
+        if not reference_thumbnails:
+            return None
+        logger.debug("Analyzing %d reference thumbnail(s)...", len(reference_thumbnails))
+        key = _hash_images("refs", ((ref.data, ref.description) for ref in reference_thumbnails))
+        # The analyzer reads .data/.description itself, so no copy is built
+        return await _cached_analysis(
+            key, reference_analyzer.prompt_version, reference_analyzer.aanalyze_reference_thumbnails, reference_thumbnails
+        )
+
+    async def analyze_faces():
+        if not face_images:
+            return None
+        return await _cached_face_analysis(reference_analyzer, face_images)
+
+    reference_analysis, face_description = await asyncio.gather(
+        analyze_references(), analyze_faces(), return_exceptions=True
+    )
+
+    if isinstance(reference_analysis, Exception):
+        logger.error("Failed to analyze reference thumbnails", exc_info=reference_analysis)
         reference_analysis = None
-        if request.reference_thumbnails and len(request.reference_thumbnails) > 0:
-            try:
-                print(f"[DEBUG] Analyzing {len(request.reference_thumbnails)} reference thumbnail(s)...")
-                reference_data = [{"data": ref.data, "description": ref.description} for ref in request.reference_thumbnails]
-                reference_analysis = reference_analyzer.analyze_reference_thumbnails(reference_data)
-                print(f"[DEBUG] Reference analysis complete:")
-                print(f"  - Composition: {reference_analysis.get('composition', {})}")
-                print(f"  - Colors: {reference_analysis.get('colors', {})}")
-                print(f"  - Mood: {reference_analysis.get('mood', 'N/A')}")
-            except Exception as e:
-                print(f"[ERROR] Failed to analyze reference thumbnails: {e}")
-                import traceback
-                traceback.print_exc()
-                reference_analysis = None
-
-        # Step 4: Analyze face photos if provided
+    elif reference_analysis is not None:
+        logger.debug(
+            "Reference analysis complete: composition=%s colors=%s mood=%s",
+            reference_analysis.get("composition", {}),
+            reference_analysis.get("colors", {}),
+            reference_analysis.get("mood", "N/A"),
+        )
+
+    face_photos_data = None
+    if isinstance(face_description, Exception):
+        logger.error("Failed to analyze face photos", exc_info=face_description)
         face_description = None
-        face_photos_data = None  # List of (data, name) tuples for imagen_generator
-        if request.face_images and len(request.face_images) > 0:
-            try:
-                print(f"[DEBUG] Analyzing {len(request.face_images)} face photo(s)...")
-                # Extract just the base64 data for analysis
-                face_data_list = [photo.data for photo in request.face_images]
-                face_description = reference_analyzer.analyze_face_photos(face_data_list)
-                # Prepare face photos with names for imagen_generator
-                face_photos_data = [(photo.data, photo.name) for photo in request.face_images]
-                print(f"[DEBUG] Face photos: {[name for _, name in face_photos_data]}")
-                print(f"[DEBUG] Face description: {face_description}")
-            except Exception as e:
-                print(f"[ERROR] Failed to analyze face photos: {e}")
-                import traceback
-                traceback.print_exc()
-                face_description = None
-                face_photos_data = None
-
-        # Step 5: Get template system prompt if specified
-        template_prompt = None
-        if request.template_id and request.template_id in TEMPLATES:
-            # Would fetch from database in production
-            pass
-
-        # Step 6: Generate prompt with reference style guidance
-        prompt_data = prompt_generator.generate_prompt(
-            video_data,
-            template_system_prompt=template_prompt,
-            trigger_word=trigger_word,
-            reference_analysis=reference_analysis,
-            face_description=face_description,
+    elif face_description is not None:
+        face_photos_data = [(photo.data, photo.name) for photo in face_images]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Face photos: %s", [name for _, name in face_photos_data])
+        logger.debug("Face description: %s", face_description)
+
+    reference_image = reference_thumbnails[0].data if reference_thumbnails else None
+    return reference_analysis, face_description, face_photos_data, reference_image
+
+
+# Text style used for thumbnails generated from a YouTube URL
+URL_TEXT_OPTIONS = {
+    "position": "bottom_center",
+    "font_preset": "impact",
+    "color_preset": "white_shadow",
+    "stroke_width": 5,
+    "shadow_offset": 4,
+}
+
+
+async def generate_images_from_url(
+    request: VideoURLRequest,
+    video_analyzer: VideoAnalyzer,
+    prompt_generator: PromptGenerator,
+    reference_analyzer: ReferenceAnalyzer,
+    imagen_generator: Optional[ImagenGenerator],
+) -> tuple[dict, dict]:
+    """
+    Run the YouTube URL pipeline up to (not including) text overlay.
+
+    Args:
+        request: Generation request
+        video_analyzer: Video analyzer service
+        prompt_generator: Prompt generator service
+        reference_analyzer: Reference analyzer service
+        imagen_generator: Imagen generator, or None to use FLUX
+
+    Returns:
+        Tuple of (prompt_data, result) from the prompt and image generators
+    """
+    logger.debug("Starting generation for URL: %s", request.url)
+
+    # Steps 1-4 are independent I/O calls (YouTube, Supabase, OpenAI Vision),
+    # so run them concurrently and the wait is the slowest one, not the sum.
+    async def lookup_face_model():
+        # Face model is only used by FLUX
+        if not request.face_model_id:
+            return None
+        return await get_completed_model(get_lora_trainer(), request.face_model_id)
+
+    logger.debug("Step 1: Analyzing YouTube video for context...")
+    video_data, model, prepared = await asyncio.gather(
+        run_blocking(video_analyzer.analyze, request.url),
+        lookup_face_model(),
+        prepare_references_and_faces(
+            reference_analyzer, request.reference_thumbnails, request.face_images
+        ),
+        return_exceptions=True,
+    )
+
+    # Step 1: Video context is required
+    if isinstance(video_data, BaseException):
+        raise video_data
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Video context extracted: title=%s channel=%s tags=%s description=%.200s... transcript=%s",
+            video_data.get("title", "N/A"),
+            video_data.get("channel", "N/A"),
+            video_data.get("tags", [])[:5],
+            video_data.get("description", "N/A"),
+            "yes" if video_data.get("transcript") else "no",
         )
 
-        # Step 7: Generate images using Imagen (preferred) or FLUX as fallback
-        print(f"[DEBUG] Final prompt for image generation:")
-        print(f"  {prompt_data['prompt'][:500]}...")
-        print(f"[DEBUG] Thumbnail text: {prompt_data.get('thumbnail_text', 'N/A')}")
+    # Step 2: Get face model if specified (for FLUX only)
+    if isinstance(model, BaseException):
+        raise model
+    lora_url = None
+    trigger_word = "person"
+    if model:
+        lora_url = model.get("lora_url")
+        trigger_word = model.get("trigger_word", "person")
+
+    # Steps 3-4: Reference and face analysis (optional, failures already logged)
+    if isinstance(prepared, BaseException):
+        raise prepared
+    reference_analysis, face_description, face_photos_data, reference_image = prepared
+
+    # Step 5: Get template system prompt if specified
+    template_prompt = None
+    if request.template_id and request.template_id in TEMPLATES:
+        # Would fetch from database in production
+        pass
+
+    # Step 7: Generate images using Imagen (preferred) or FLUX as fallback
+    async def generate_images(prompt: str) -> dict:
+        logger.debug("Final prompt for image generation: %.500s...", prompt)
 
         if imagen_generator is not None:
-            print(f"[DEBUG] Using Gemini for generation")
+            logger.debug("Using Gemini for generation")
 
-            # Get reference image for FORMAT (but instruct Gemini not to copy people)
-            reference_image = None
-            if request.reference_thumbnails and len(request.reference_thumbnails) > 0:
-                reference_image = request.reference_thumbnails[0].data
-                print(f"[DEBUG] Passing reference thumbnail for FORMAT only (not people)")
+            # Reference image is for FORMAT (but instruct Gemini not to copy people)
+            if reference_image:
+                logger.debug("Passing reference thumbnail for FORMAT only (not people)")
 
             if face_photos_data and len(face_photos_data) > 0:
-                print(f"[DEBUG] Passing {len(face_photos_data)} face photo(s) - these replace ALL characters")
+                logger.debug("Passing %d face photo(s) - these replace ALL characters", len(face_photos_data))
 
-            result = await imagen_generator.generate_thumbnail(
-                prompt=prompt_data["prompt"],
+            return await imagen_generator.generate_thumbnail(
+                prompt=prompt,
                 num_images=request.num_variations,
                 reference_image=reference_image,  # For FORMAT only
                 face_photos=face_photos_data,  # ALL faces with names for ALL characters
             )
-        else:
-            print(f"[DEBUG] Using FLUX for generation (Imagen not available)")
-            result = await image_generator.generate_thumbnail(
-                prompt=prompt_data["prompt"],
-                lora_url=lora_url,
-                num_images=request.num_variations
-            )
 
-        # Step 6: Add text overlay if thumbnail_text was generated
+        logger.debug("Using FLUX for generation (Imagen not available)")
+        return await get_image_generator().generate_thumbnail(
+            prompt=prompt,
+            lora_url=lora_url,
+            num_images=request.num_variations
+        )
+
+    # Step 6: Generate prompt with reference style guidance. The prompt is
+    # streamed so image generation starts as soon as the "prompt" field is
+    # complete, while the model is still writing the remaining fields.
+    prompt_data = None
+    streamed = {}
+    image_task = None
+    try:
+        async for event in prompt_generator.generate_prompt_stream(
+            video_data,
+            template_system_prompt=template_prompt,
+            trigger_word=trigger_word,
+            reference_analysis=reference_analysis,
+            face_description=face_description,
+        ):
+            partial = event.get("partial")
+            if partial is None:
+                prompt_data = event
+            else:
+                streamed.update(partial)
+                if image_task is None and "prompt" in partial:
+                    image_task = asyncio.create_task(generate_images(partial["prompt"]))
+
+        # A reply cut off after its "prompt" field parses to the generic
+        # fallback; report the streamed fields the images were made from
+        prompt_data = {**prompt_data, **streamed}
+        logger.debug("Thumbnail text: %s", prompt_data.get("thumbnail_text", "N/A"))
+        # Cached and unparseable replies arrive without partial events
+        if image_task is None:
+            image_task = asyncio.create_task(generate_images(prompt_data["prompt"]))
+        result = await image_task
+    except BaseException:
+        if image_task is not None:
+            image_task.cancel()
+        raise
+
+    return prompt_data, result
+
+
+@app.post("/generate/from-url", responses={200: {"model": ThumbnailResponse}})
+async def generate_from_url(
+    request: VideoURLRequest,
+    video_analyzer: VideoAnalyzer = Depends(get_video_analyzer),
+    prompt_generator: PromptGenerator = Depends(get_prompt_generator),
+    reference_analyzer: ReferenceAnalyzer = Depends(get_reference_analyzer),
+    imagen_generator: Optional[ImagenGenerator] = Depends(get_imagen_generator),
+    text_overlay: TextOverlayService = Depends(get_text_overlay),
+):
+    """Generate thumbnails from a YouTube URL."""
+    try:
+        prompt_data, result = await generate_images_from_url(
+            request, video_analyzer, prompt_generator, reference_analyzer, imagen_generator
+        )
+
+        # Step 8: Add text overlay if thumbnail_text was generated
         thumbnail_text = prompt_data.get("thumbnail_text", "")
         final_images = result["images"]
 
         if thumbnail_text and request.add_text_overlay:
-            final_images = []
-            for img in result["images"]:
-                # Add gradient background for readability
-                img_with_gradient = text_overlay.add_gradient_background(
-                    img, position="bottom", opacity=0.5, height_ratio=0.35
-                )
-                # Add the text
-                img_with_text = text_overlay.add_text(
-                    image_data=img_with_gradient,
-                    text=thumbnail_text.upper(),
-                    position="bottom_center",
-                    font_preset="impact",
-                    color_preset="white_shadow",
-                    stroke_width=5,
-                    shadow_offset=4,
-                )
-                final_images.append(img_with_text)
-
-        return ThumbnailResponse(
-            images=final_images,
-            prompt_used=prompt_data["prompt"],
-            thumbnail_text=thumbnail_text,
-            generation_time_ms=result.get("generation_time_ms"),
-        )
+            final_images = await apply_text_overlay(
+                text_overlay, result["images"], thumbnail_text, **URL_TEXT_OPTIONS
+            )
+
+        # Trusted payload: skip revalidating megabytes of base64 through Pydantic
+        return ORJSONResponse({
+            "images": final_images,
+            "prompt_used": prompt_data["prompt"],
+            "thumbnail_text": thumbnail_text,
+            "generation_time_ms": result.get("generation_time_ms"),
+        })
 
     except ValueError as e:
-        print(f"[ERROR] ValueError: {e}")
-        traceback.print_exc()
+        logger.info("Rejected generation request: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"[ERROR] Exception: {e}")
-        traceback.print_exc()
+        logger.exception("Generation failed")
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
-@app.post("/generate/from-prompt", response_model=ThumbnailResponse)
+# Raw bytes cap, the same per-image limit the JSON routes apply to base64
+MAX_UPLOAD_BYTES = MAX_IMAGE_BYTES
+
+
+async def read_uploads(files: Optional[list[UploadFile]], limit: int, field: str) -> list[tuple[str, str]]:
+    """
+    Read uploaded image files into memory as base64.
+
+    Each file is encoded exactly once here and the raw bytes are dropped
+    straight away; both the OpenAI Vision analysis and the Gemini request
+    take base64, so they share the one encoded payload.
+
+    Args:
+        files: Uploaded files (may be None)
+        limit: Maximum number of files accepted
+        field: Form field name, for error messages
+
+    Returns:
+        List of (base64_data, file_name) tuples
+
+    Raises:
+        HTTPException: 422 if there are too many or too large files
+    """
+    if not files:
+        return []
+    if len(files) > limit:
+        raise HTTPException(status_code=422, detail=f"{field}: at most {limit} files allowed")
+
+    uploads = []
+    for upload in files:
+        data = await upload.read(MAX_UPLOAD_BYTES + 1)
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=422, detail=f"{field}: {upload.filename} exceeds {MAX_UPLOAD_BYTES} bytes")
+        uploads.append((b64encode_as_string(data), upload.filename or f"{field}.png"))
+    return uploads
+
+
+@app.post("/generate/from-url/upload", responses={200: {"model": ThumbnailResponse}})
+async def generate_from_url_upload(
+    url: str = Form(..., description="YouTube video URL"),
+    template_id: Optional[str] = Form(None),
+    face_model_id: Optional[str] = Form(None),
+    num_variations: int = Form(4, ge=1, le=8),
+    add_text_overlay: bool = Form(True),
+    face_images: Optional[list[UploadFile]] = File(None, description="Face photos; file names label the faces"),
+    reference_thumbnails: Optional[list[UploadFile]] = File(None, description="Reference thumbnail examples"),
+    video_analyzer: VideoAnalyzer = Depends(get_video_analyzer),
+    prompt_generator: PromptGenerator = Depends(get_prompt_generator),
+    reference_analyzer: ReferenceAnalyzer = Depends(get_reference_analyzer),
+    imagen_generator: Optional[ImagenGenerator] = Depends(get_imagen_generator),
+    text_overlay: TextOverlayService = Depends(get_text_overlay),
+):
+    """
+    Generate thumbnails from a YouTube URL with multipart image uploads.
+
+    Same as /generate/from-url, but face and reference images are sent as
+    raw files instead of base64 JSON, which spares the client the base64
+    inflation and the server a large JSON parse (each file is encoded once,
+    server-side, for the OpenAI Vision and Gemini calls).
+    """
+    faces = await read_uploads(face_images, MAX_FACE_IMAGES, "face_images")
+    references = await read_uploads(reference_thumbnails, MAX_REFERENCE_THUMBNAILS, "reference_thumbnails")
+
+    # Scalar fields are validated as usual; image fields carry base64 we just
+    # encoded ourselves, so they are attached without revalidating them
+    request = VideoURLRequest(
+        url=url,
+        template_id=template_id,
+        face_model_id=face_model_id,
+        num_variations=num_variations,
+        add_text_overlay=add_text_overlay,
+    ).model_copy(update={
+        "face_images": [FacePhotoWithName.model_construct(data=data, name=name) for data, name in faces] or None,
+        "reference_thumbnails": [ReferenceImage.model_construct(data=data, description=None) for data, _ in references] or None,
+    })
+
+    return await generate_from_url(
+        request, video_analyzer, prompt_generator, reference_analyzer, imagen_generator, text_overlay
+    )
+
+
+@app.post("/generate/from-url/stream")
+async def generate_from_url_stream(
+    request: VideoURLRequest,
+    video_analyzer: VideoAnalyzer = Depends(get_video_analyzer),
+    prompt_generator: PromptGenerator = Depends(get_prompt_generator),
+    reference_analyzer: ReferenceAnalyzer = Depends(get_reference_analyzer),
+    imagen_generator: Optional[ImagenGenerator] = Depends(get_imagen_generator),
+    text_overlay: TextOverlayService = Depends(get_text_overlay),
+):
+    """
+    Generate thumbnails from a YouTube URL, streaming NDJSON.
+
+    The first line carries prompt_used, thumbnail_text and generation_time_ms;
+    each following line is {"index": i, "image": data_uri}, emitted as soon as
+    that image's text overlay finishes (so not necessarily in index order).
+    """
+    try:
+        prompt_data, result = await generate_images_from_url(
+            request, video_analyzer, prompt_generator, reference_analyzer, imagen_generator
+        )
+    except ValueError as e:
+        logger.info("Rejected generation request: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Generation failed")
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+
+    thumbnail_text = prompt_data.get("thumbnail_text", "")
+    images = result["images"]
+    add_text = bool(thumbnail_text and request.add_text_overlay)
+
+    async def stream():
+        yield orjson.dumps({
+            "prompt_used": prompt_data["prompt"],
+            "thumbnail_text": thumbnail_text,
+            "generation_time_ms": result.get("generation_time_ms"),
+        }) + b"\n"
+
+        if not add_text:
+            for index, image in enumerate(images):
+                yield orjson.dumps({"index": index, "image": image}) + b"\n"
+            return
+
+        text = thumbnail_text.upper()
+
+        async def overlay(index: int, image: str) -> tuple[int, str]:
+            return index, await overlay_image(text_overlay, image, text, **URL_TEXT_OPTIONS)
+
+        tasks = [asyncio.create_task(overlay(i, img)) for i, img in enumerate(images)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, image = await next_done
+                yield orjson.dumps({"index": index, "image": image}) + b"\n"
+        finally:
+            # Client disconnected mid-stream: don't leave overlays running
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/generate/from-prompt", responses={200: {"model": ThumbnailResponse}})
 async def generate_from_prompt(
     request: PromptRequest,
     reference_analyzer: ReferenceAnalyzer = Depends(get_reference_analyzer),
-    image_generator: ImageGenerator = Depends(get_image_generator),
     imagen_generator: Optional[ImagenGenerator] = Depends(get_imagen_generator),
     text_overlay: TextOverlayService = Depends(get_text_overlay),
-    lora_trainer: LoRATrainer = Depends(get_lora_trainer),
 ):
     """Generate thumbnails from a custom prompt."""
     try:
@@ -394,34 +1024,16 @@ async def generate_from_prompt(
 
         # Get face model if specified
         if request.face_model_id:
-            model = await lora_trainer.get_training_status(request.face_model_id)
-            if model and model.get("training_status") == "completed":
+            model = await get_completed_model(get_lora_trainer(), request.face_model_id)
+            if model:
                 lora_url = model.get("lora_url")
 
-        # Analyze reference thumbnails if provided
-        reference_analysis = None
-        if request.reference_thumbnails and len(request.reference_thumbnails) > 0:
-            try:
-                reference_data = [{"data": ref.data, "description": ref.description} for ref in request.reference_thumbnails]
-                reference_analysis = reference_analyzer.analyze_reference_thumbnails(reference_data)
-            except Exception as e:
-                print(f"Warning: Failed to analyze reference thumbnails: {e}")
-                reference_analysis = None
-
-        # Analyze face photos if provided
-        face_description = None
-        face_photos_data = None  # List of (data, name) tuples for imagen_generator
-        if request.face_images and len(request.face_images) > 0:
-            try:
-                # Extract just the base64 data for analysis
-                face_data_list = [photo.data for photo in request.face_images]
-                face_description = reference_analyzer.analyze_face_photos(face_data_list)
-                # Prepare face photos with names for imagen_generator
-                face_photos_data = [(photo.data, photo.name) for photo in request.face_images]
-            except Exception as e:
-                print(f"Warning: Failed to analyze face photos: {e}")
-                face_description = None
-                face_photos_data = None
+        # Analyze reference thumbnails and face photos if provided
+        reference_analysis, face_description, face_photos_data, reference_image = (
+            await prepare_references_and_faces(
+                reference_analyzer, request.reference_thumbnails, request.face_images
+            )
+        )
 
         # Enhance prompt with reference style if analysis available
         enhanced_prompt = request.prompt
@@ -434,16 +1046,14 @@ async def generate_from_prompt(
 
         # Generate images using Imagen (preferred) or FLUX as fallback
         if imagen_generator is not None:
-            print(f"[DEBUG] Using Gemini for generation (from prompt)")
+            logger.debug("Using Gemini for generation (from prompt)")
 
-            # Get reference image for FORMAT
-            reference_image = None
-            if request.reference_thumbnails and len(request.reference_thumbnails) > 0:
-                reference_image = request.reference_thumbnails[0].data
-                print(f"[DEBUG] Passing reference thumbnail for FORMAT only")
+            # Reference image is for FORMAT only
+            if reference_image:
+                logger.debug("Passing reference thumbnail for FORMAT only")
 
             if face_photos_data and len(face_photos_data) > 0:
-                print(f"[DEBUG] Passing {len(face_photos_data)} face photo(s) - replace ALL characters")
+                logger.debug("Passing %d face photo(s) - replace ALL characters", len(face_photos_data))
 
             result = await imagen_generator.generate_thumbnail(
                 prompt=enhanced_prompt,
@@ -452,8 +1062,8 @@ async def generate_from_prompt(
                 face_photos=face_photos_data,  # ALL faces with names for ALL characters
             )
         else:
-            print(f"[DEBUG] Using FLUX for generation (Imagen not available)")
-            result = await image_generator.generate_thumbnail(
+            logger.debug("Using FLUX for generation (Imagen not available)")
+            result = await get_image_generator().generate_thumbnail(
                 prompt=enhanced_prompt,
                 lora_url=lora_url,
                 num_images=request.num_variations,
@@ -464,32 +1074,39 @@ async def generate_from_prompt(
         final_images = result["images"]
 
         if thumbnail_text and request.add_text_overlay:
+            # Resolve the overlay settings once rather than per image
             text_cfg = request.text_config or {}
-            final_images = []
-            for img in result["images"]:
-                # Add gradient background for readability
-                img_with_gradient = text_overlay.add_gradient_background(
-                    img, position="bottom", opacity=0.5, height_ratio=0.35
-                )
-                # Add the text
-                img_with_text = text_overlay.add_text(
-                    image_data=img_with_gradient,
-                    text=thumbnail_text.upper(),
-                    position=text_cfg.get("position", "bottom_center") if isinstance(text_cfg, dict) else getattr(text_cfg, "position", "bottom_center"),
-                    font_preset=text_cfg.get("font_preset", "impact") if isinstance(text_cfg, dict) else getattr(text_cfg, "font_preset", "impact"),
-                    color_preset=text_cfg.get("color_preset", "white_shadow") if isinstance(text_cfg, dict) else getattr(text_cfg, "color_preset", "white_shadow"),
-                    font_size=text_cfg.get("font_size") if isinstance(text_cfg, dict) else getattr(text_cfg, "font_size", None),
-                )
-                final_images.append(img_with_text)
-
-        return ThumbnailResponse(
-            images=final_images,
-            prompt_used=enhanced_prompt,
-            thumbnail_text=thumbnail_text,
-            generation_time_ms=result.get("generation_time_ms"),
-        )
+            if isinstance(text_cfg, dict):
+                position = text_cfg.get("position", "bottom_center")
+                font_preset = text_cfg.get("font_preset", "impact")
+                color_preset = text_cfg.get("color_preset", "white_shadow")
+                font_size = text_cfg.get("font_size")
+            else:
+                position = getattr(text_cfg, "position", "bottom_center")
+                font_preset = getattr(text_cfg, "font_preset", "impact")
+                color_preset = getattr(text_cfg, "color_preset", "white_shadow")
+                font_size = getattr(text_cfg, "font_size", None)
+
+            final_images = await apply_text_overlay(
+                text_overlay,
+                result["images"],
+                thumbnail_text,
+                position=position,
+                font_preset=font_preset,
+                color_preset=color_preset,
+                font_size=font_size,
+            )
+
+        # Trusted payload: skip revalidating megabytes of base64 through Pydantic
+        return ORJSONResponse({
+            "images": final_images,
+            "prompt_used": enhanced_prompt,
+            "thumbnail_text": thumbnail_text,
+            "generation_time_ms": result.get("generation_time_ms"),
+        })
 
     except Exception as e:
+        logger.exception("Generation failed")
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
@@ -617,6 +1234,7 @@ async def delete_face_model(
     """Delete a face model."""
     try:
         await lora_trainer.delete_model(model_id, user_id)
+        _fetch_completed_model.cache_invalidate(lora_trainer, model_id)
         return {"status": "deleted"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -633,4 +1251,5 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.debug,
+        log_level=settings.log_level.lower(),
     )
@@ -1,9 +1,11 @@
 """Pydantic models for request/response schemas."""
 
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, List
+from pydantic import AfterValidator, BaseModel, Field, HttpUrl, StringConstraints
+from typing import Annotated, Optional, List
 from enum import Enum
 
+from services.base64_codec import b64decode_strict, sniff_image_type, strip_data_uri
+
 
 class SubscriptionTier(str, Enum):
     FREE = "free"
@@ -35,6 +37,52 @@ class JobStatus(str, Enum):
 # Request Models
 # ============================================
 
+# Upload limits, enforced by pydantic-core before any image work starts. They
+# match (or exceed) the frontend dropzones, which take up to 5 reference
+# thumbnails and 3 face photos of at most 10MB each
+MAX_IMAGE_BYTES = 10 * 1024 * 1024  # raw bytes per image
+# Base64 characters per image: the encoded size plus room for a data URI prefix
+MAX_IMAGE_DATA_LENGTH = (MAX_IMAGE_BYTES + 2) // 3 * 4 + 256
+MAX_REFERENCE_THUMBNAILS = 5
+MAX_FACE_IMAGES = 6
+
+
+# Base64 characters at the start of an upload decoded to validate it
+_IMAGE_HEADER_CHARS = 4096
+
+
+def _check_image_data(value: str) -> str:
+    """
+    Reject malformed data URIs and payloads that are not base64 images.
+
+    Only the first few KB (alphabet and image signature) and the final
+    quantum (padding) are decoded; the service that uses the image does
+    the one full decode.
+    """
+    if value.startswith("data:") and "," not in value[:256]:
+        raise ValueError("Malformed data URI: missing ',' after the media type")
+    payload = strip_data_uri(value)
+    try:
+        if len(payload) % 4:
+            raise ValueError
+        head = b64decode_strict(payload[:_IMAGE_HEADER_CHARS])
+        b64decode_strict(payload[-4:])
+    except ValueError:
+        raise ValueError("Image data is not valid base64") from None
+    if not sniff_image_type(head, ""):
+        raise ValueError("Image data is not a recognised image format")
+    return value
+
+
+# Base64 image payload (with or without data URI prefix). Validated here so bad
+# uploads fail with a 422 instead of deep inside generation, but kept as a str.
+ImageData = Annotated[
+    str,
+    StringConstraints(strict=True, max_length=MAX_IMAGE_DATA_LENGTH),
+    AfterValidator(_check_image_data),
+]
+
+
 class TextOverlayConfig(BaseModel):
     """Configuration for text overlay."""
     text: Optional[str] = Field(None, description="Custom text (uses generated text if None)")
@@ -46,13 +94,13 @@ class TextOverlayConfig(BaseModel):
 
 class ReferenceImage(BaseModel):
     """A reference image with its base64 data."""
-    data: str = Field(..., description="Base64 encoded image data (with or without data URI prefix)")
+    data: ImageData = Field(..., description="Base64 encoded image data (with or without data URI prefix)")
     description: Optional[str] = Field(None, description="Optional user-provided description")
 
 
 class FacePhotoWithName(BaseModel):
     """A face photo with its name for prompt labeling."""
-    data: str = Field(..., description="Base64 encoded image data")
+    data: ImageData = Field(..., description="Base64 encoded image data")
     name: str = Field(..., description="Original file name for labeling in prompts")
 
 
@@ -61,8 +109,8 @@ class VideoURLRequest(BaseModel):
     url: str = Field(..., description="YouTube video URL")
     template_id: Optional[str] = Field(None, description="Template style to use")
     face_model_id: Optional[str] = Field(None, description="Trained face model ID")
-    face_images: Optional[List[FacePhotoWithName]] = Field(None, description="Face photos with names for prompt labeling")
-    reference_thumbnails: Optional[List[ReferenceImage]] = Field(None, description="Reference thumbnail examples to analyze")
+    face_images: Optional[List[FacePhotoWithName]] = Field(None, max_length=MAX_FACE_IMAGES, description="Face photos with names for prompt labeling")
+    reference_thumbnails: Optional[List[ReferenceImage]] = Field(None, max_length=MAX_REFERENCE_THUMBNAILS, description="Reference thumbnail examples to analyze")
     num_variations: int = Field(4, ge=1, le=8, description="Number of variations")
     add_text_overlay: bool = Field(True, description="Add text overlay to thumbnails")
     text_config: Optional[TextOverlayConfig] = Field(None, description="Text overlay configuration")
@@ -74,8 +122,8 @@ class PromptRequest(BaseModel):
     template_id: Optional[str] = Field(None, description="Template style to use")
     face_model_id: Optional[str] = Field(None, description="Trained face model ID")
     face_image_url: Optional[str] = Field(None, description="Single-shot face image URL")
-    face_images: Optional[List[FacePhotoWithName]] = Field(None, description="Face photos with names for prompt labeling")
-    reference_thumbnails: Optional[List[ReferenceImage]] = Field(None, description="Reference thumbnail examples to analyze")
+    face_images: Optional[List[FacePhotoWithName]] = Field(None, max_length=MAX_FACE_IMAGES, description="Face photos with names for prompt labeling")
+    reference_thumbnails: Optional[List[ReferenceImage]] = Field(None, max_length=MAX_REFERENCE_THUMBNAILS, description="Reference thumbnail examples to analyze")
     num_variations: int = Field(4, ge=1, le=8, description="Number of variations")
     add_text_overlay: bool = Field(False, description="Add text overlay to thumbnails")
     thumbnail_text: Optional[str] = Field(None, description="Text to overlay on thumbnails")
@@ -91,7 +139,7 @@ class InpaintRequest(BaseModel):
 
 class TextOverlayRequest(BaseModel):
     """Request to add text overlay to an image."""
-    image_data: str = Field(..., description="Base64 encoded image or data URI")
+    image_data: ImageData = Field(..., description="Base64 encoded image or data URI")
     text: str = Field(..., min_length=1, description="Text to overlay")
     position: str = Field("bottom_center", description="Position preset")
     font_preset: str = Field("impact", description="Font style preset")
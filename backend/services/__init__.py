@@ -1,19 +1,28 @@
-"""Services package for AI Thumbnail Generator."""
+"""Services package for AI Thumbnail Generator.
 
-from .video_analyzer import VideoAnalyzer
-from .prompt_generator import PromptGenerator
-from .image_generator import ImageGenerator
-from .imagen_generator import ImagenGenerator
-from .text_overlay import TextOverlayService
-from .lora_trainer import LoRATrainer
-from .reference_analyzer import ReferenceAnalyzer
+Service classes are resolved lazily on first attribute access so importing
+the package (or a single submodule) does not pull in every AI SDK.
+"""
+from importlib import import_module
 
-__all__ = [
-    "VideoAnalyzer",
-    "PromptGenerator",
-    "ImageGenerator",
-    "ImagenGenerator",
-    "TextOverlayService",
-    "LoRATrainer",
-    "ReferenceAnalyzer",
-]
+_SERVICE_MODULES = {
+    "VideoAnalyzer": ".video_analyzer",
+    "PromptGenerator": ".prompt_generator",
+    "ImageGenerator": ".image_generator",
+    "ImagenGenerator": ".imagen_generator",
+    "TextOverlayService": ".text_overlay",
+    "LoRATrainer": ".lora_trainer",
+    "ReferenceAnalyzer": ".reference_analyzer",
+    "FaceAnalysisBatcher": ".reference_analyzer",
+}
+
+__all__ = list(_SERVICE_MODULES)
+
+
+def __getattr__(name: str):
+    module_name = _SERVICE_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,150 @@
+"""
+Base64 Codec
+Image payload encoding/decoding using pybase64's SIMD codec when installed,
+falling back to the standard library otherwise.
+"""
+import binascii
+
+# Raw image buffers accepted wherever image data may already be decoded
+BYTES_LIKE = (bytes, bytearray, memoryview)
+
+try:
+    from pybase64 import b64decode as _b64decode, b64encode_as_string
+except ImportError:  # pybase64 is optional
+    from base64 import b64decode as _b64decode, b64encode
+
+    def b64encode_as_string(data: bytes) -> str:
+        """Encode bytes to a base64 str."""
+        return b64encode(data).decode("ascii")
+
+
+def b64decode(data) -> bytes:
+    """
+    Decode base64 data.
+
+    Tries the strict single-pass decoder first (the fast SIMD path in
+    pybase64) and only falls back to the lenient decoder, which skips
+    non-alphabet characters such as line breaks, if that fails.
+
+    Args:
+        data: Base64 str or bytes
+
+    Returns:
+        Decoded bytes
+    """
+    try:
+        return _b64decode(data, validate=True)
+    except binascii.Error:
+        return _b64decode(data)
+
+
+def b64decode_strict(data) -> bytes:
+    """
+    Decode base64 data, rejecting anything outside the base64 alphabet.
+
+    Args:
+        data: Base64 str or bytes
+
+    Returns:
+        Decoded bytes
+
+    Raises:
+        binascii.Error: If the data is not valid base64
+    """
+    return _b64decode(data, validate=True)
+
+
+def strip_data_uri(image_data):
+    """
+    Remove a data URI prefix, if any, leaving the base64 payload.
+
+    Uses a single find + slice instead of split so the payload is copied
+    once and no intermediate list is built. Bytes-like input is sliced
+    through a memoryview, so it is not copied at all.
+
+    Args:
+        image_data: Base64 string or data URI, as str or bytes-like
+
+    Returns:
+        Base64 payload (a str for str input, otherwise a memoryview)
+    """
+    if isinstance(image_data, str):
+        if image_data.startswith("data:"):
+            comma = image_data.find(",", 5)
+            if comma != -1:
+                return image_data[comma + 1:]
+        return image_data
+
+    view = memoryview(image_data)
+    if view[:5] == b"data:":
+        comma = bytes(view[:256]).find(b",", 5)
+        if comma != -1:
+            return view[comma + 1:]
+    return view
+
+
+def decode_image_data(image_data) -> bytes:
+    """
+    Decode a base64 image, with or without a data URI prefix.
+
+    Args:
+        image_data: Base64 string or data URI, as str or bytes-like
+
+    Returns:
+        Raw image bytes
+    """
+    return b64decode(strip_data_uri(image_data))
+
+
+# (offset, magic bytes, media type) checked in order against an image's first
+# _SIGNATURE_BYTES bytes; the ISO BMFF brands (at offset 4) cover phone photos
+_IMAGE_SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF8", "image/gif"),
+    (8, b"WEBP", "image/webp"),  # RIFF container
+    (4, b"ftypheic", "image/heic"),
+    (4, b"ftypheix", "image/heic"),
+    (4, b"ftypavif", "image/avif"),
+    (4, b"ftypmif1", "image/heif"),
+)
+_SIGNATURE_BYTES = 12
+
+
+def sniff_image_type(image_bytes, default: str = "image/png") -> str:
+    """
+    Guess an image's media type from its magic bytes.
+
+    Args:
+        image_bytes: Raw image bytes (any bytes-like object)
+        default: Media type returned when no signature matches
+
+    Returns:
+        Media type
+    """
+    head = bytes(image_bytes[:_SIGNATURE_BYTES])
+    for offset, magic, media_type in _IMAGE_SIGNATURES:
+        if head.startswith(magic, offset):
+            return media_type
+    return default
+
+
+def sniff_base64_image_type(image_data: str, default: str = "image/png") -> str:
+    """
+    Guess an image's media type from the start of its base64 encoding.
+
+    Decodes just the 16 characters that hold the first 12 bytes, so the
+    magic bytes are matched exactly rather than by encoded prefix.
+
+    Args:
+        image_data: Base64 string without a data URI prefix
+        default: Media type returned when no signature matches
+
+    Returns:
+        Media type
+    """
+    try:
+        head = _b64decode(image_data[:_SIGNATURE_BYTES // 3 * 4])
+    except (binascii.Error, ValueError):
+        return default
+    return sniff_image_type(head, default)
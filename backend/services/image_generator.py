@@ -2,20 +2,44 @@
 Image Generator Service
 Generates images using fal.ai FLUX API.
 """
+import asyncio
+import logging
 import time
 from typing import Optional, List
 import fal_client
 
 
+logger = logging.getLogger(__name__)
+
+FLUX_ENDPOINT = "fal-ai/flux/dev"
+FLUX_LORA_ENDPOINT = "fal-ai/flux-lora"
+PULID_ENDPOINT = "fal-ai/pulid"
+FILL_ENDPOINT = "fal-ai/flux-pro/v1/fill"
+
+# Arguments shared by every call to an endpoint; per-call values are merged in
+_BASE_FLUX_ARGS = {"enable_safety_checker": True}
+_BASE_PULID_ARGS = {
+    "guidance_scale": 1.2,
+    "num_inference_steps": 4,
+    "id_weight": 1.0,
+}
+
 class ImageGenerator:
     """Generates thumbnail images using FLUX via fal.ai."""
 
-    def __init__(self):
+    def __init__(self, speculative_fallback: bool = True, fallback_delay: float = 2.0):
         """
         Initialize the image generator.
         fal_client uses FAL_KEY environment variable automatically.
+
+        Args:
+            speculative_fallback: Start the FLUX fallback alongside a slow PuLID
+                call instead of only after it fails (costs an extra generation
+                whenever PuLID is slower than fallback_delay)
+            fallback_delay: Seconds to give PuLID before starting the fallback
         """
-        pass
+        self.speculative_fallback = speculative_fallback
+        self.fallback_delay = fallback_delay
 
     async def generate_thumbnail(
         self,
@@ -44,21 +68,19 @@ class ImageGenerator:
         """
         start_time = time.time()
 
-        arguments = {
+        arguments = _BASE_FLUX_ARGS | {
             "prompt": prompt,
             "image_size": image_size,
             "num_inference_steps": num_inference_steps,
             "guidance_scale": guidance_scale,
             "num_images": num_images,
-            "enable_safety_checker": True,
         }
 
         # Add LoRA if provided (trained face model)
+        endpoint = FLUX_ENDPOINT
         if lora_url:
             arguments["loras"] = [{"path": lora_url, "scale": lora_scale}]
-            endpoint = "fal-ai/flux-lora"
-        else:
-            endpoint = "fal-ai/flux/dev"
+            endpoint = FLUX_LORA_ENDPOINT
 
         result = await fal_client.run_async(endpoint, arguments=arguments)
 
@@ -88,7 +110,9 @@ class ImageGenerator:
         Generate with single-shot face consistency using PuLID.
 
         Uses face image as reference without LoRA training.
-        Falls back to regular FLUX if PuLID fails.
+        Falls back to regular FLUX if PuLID fails; with speculative_fallback,
+        FLUX is also started if PuLID is still running after fallback_delay
+        and whichever result arrives first is returned.
 
         Args:
             prompt: Image generation prompt
@@ -99,36 +123,79 @@ class ImageGenerator:
         Returns:
             Dictionary with images list and generation_time_ms
         """
-        start_time = time.time()
+        pulid_task = asyncio.create_task(
+            self._generate_pulid(prompt, face_image_url, num_images)
+        )
+        fallback_task = None
 
         try:
-            # Use PuLID for face identity preservation
-            result = await fal_client.run_async(
-                "fal-ai/pulid",
-                arguments={
-                    "prompt": prompt,
-                    "reference_images": [face_image_url],
-                    "num_images": num_images,
-                    "guidance_scale": 1.2,
-                    "num_inference_steps": 4,
-                    "id_weight": 1.0,
-                }
-            )
-
-            generation_time_ms = int((time.time() - start_time) * 1000)
-
-            return {
-                "images": [img["url"] for img in result.get("images", [])],
-                "generation_time_ms": generation_time_ms,
-            }
-        except Exception as e:
-            print(f"[WARNING] PuLID face reference failed: {e}, falling back to regular FLUX")
+            # Give PuLID a head start; most requests finish (or fail) within it
+            delay = self.fallback_delay if self.speculative_fallback else None
+            done, _ = await asyncio.wait({pulid_task}, timeout=delay)
+
+            if not done:
+                # PuLID is slow - race it against a FLUX fallback and take the first success
+                fallback_task = asyncio.create_task(
+                    self.generate_thumbnail(prompt=prompt, num_images=num_images, image_size=image_size)
+                )
+                done, _ = await asyncio.wait(
+                    {pulid_task, fallback_task}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if fallback_task in done and not fallback_task.exception():
+                    logger.debug("FLUX fallback finished before PuLID")
+                    return fallback_task.result()
+
+            try:
+                return await pulid_task
+            except Exception as e:
+                logger.warning("PuLID face reference failed: %s, falling back to regular FLUX", e)
+
             # Fall back to regular FLUX generation
-            return await self.generate_thumbnail(
-                prompt=prompt,
-                num_images=num_images,
-                image_size=image_size,
-            )
+            if fallback_task is None:
+                fallback_task = asyncio.create_task(
+                    self.generate_thumbnail(prompt=prompt, num_images=num_images, image_size=image_size)
+                )
+            return await fallback_task
+        finally:
+            # Cancel whichever call lost the race
+            for task in (pulid_task, fallback_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _generate_pulid(self, prompt: str, face_image_url: str, num_images: int) -> dict:
+        """
+        Run a single PuLID generation.
+
+        Args:
+            prompt: Image generation prompt
+            face_image_url: URL to reference face image
+            num_images: Number of variations
+
+        Returns:
+            Dictionary with images list and generation_time_ms
+        """
+        start_time = time.time()
+
+        # Use PuLID for face identity preservation
+        result = await fal_client.run_async(
+            PULID_ENDPOINT,
+            arguments=_BASE_PULID_ARGS | {
+                "prompt": prompt,
+                "reference_images": [face_image_url],
+                "num_images": num_images,
+            }
+        )
+
+        generation_time_ms = int((time.time() - start_time) * 1000)
+
+        images = result.get("images", []) if result else []
+        if not images:
+            raise ValueError("No images generated")
+
+        return {
+            "images": [img["url"] for img in images],
+            "generation_time_ms": generation_time_ms,
+        }
 
     async def inpaint(
         self,
@@ -162,10 +229,7 @@ class ImageGenerator:
         if lora_url:
             arguments["loras"] = [{"path": lora_url, "scale": 0.8}]
 
-        result = await fal_client.run_async(
-            "fal-ai/flux-pro/v1/fill",
-            arguments=arguments
-        )
+        result = await fal_client.run_async(FILL_ENDPOINT, arguments=arguments)
 
         generation_time_ms = int((time.time() - start_time) * 1000)
 
@@ -2,37 +2,207 @@
 Google Gemini Image Generator Service
 Generates images using Google's Gemini 3 Pro Image Preview model.
 """
-import base64
+import asyncio
+import functools
+import hashlib
+import logging
+import re
 import time
 import os
-from typing import Optional, List
+from typing import Optional, List, Tuple, Union
+import httpx
+import orjson
 from google import genai
 from google.genai import types
 
+from .base64_codec import BYTES_LIKE, b64encode_as_string, decode_image_data, sniff_base64_image_type, sniff_image_type
+from .cache import TTLCache
+from .rate_limit import AIMDLimiter
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+logger = logging.getLogger(__name__)
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/"
+
+# Attempts per call when Gemini answers 429 RESOURCE_EXHAUSTED, and the
+# longest retry delay honoured (longer waits fail fast instead)
+GEMINI_MAX_ATTEMPTS = 3
+GEMINI_MAX_RETRY_DELAY = 30.0
+
+
+class GeminiAPIError(RuntimeError):
+    """Error status returned by the Gemini REST API."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Gemini API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+# Thumbnail quality modifiers appended to prompts that do not already mention them
+QUALITY_TERMS = (
+    "high quality",
+    "professional",
+    "vibrant colors",
+    "sharp focus",
+    "eye-catching",
+)
+# One case-insensitive pass finds every quality term plus "thumbnail"
+_PROMPT_TERMS_RE = re.compile(
+    "|".join(re.escape(term) for term in QUALITY_TERMS + ("thumbnail",)),
+    re.IGNORECASE,
+)
+_TERM_COUNT = len(QUALITY_TERMS) + 1
+# Suffix for the common case where the prompt mentions none of the terms
+_FULL_ENHANCEMENT = ", " + ", ".join(QUALITY_TERMS + ("YouTube thumbnail style",))
+
+
+@functools.lru_cache(maxsize=256)
+def _enhance_prompt(prompt: str) -> str:
+    """Append the quality modifiers a prompt is missing (cached for repeat prompts)."""
+    present = set()
+    for match in _PROMPT_TERMS_RE.finditer(prompt):
+        present.add(match.group(0).lower())
+        if len(present) == _TERM_COUNT:
+            # Every marker is already there; no need to scan the rest
+            return prompt
+    if not present:
+        return prompt + _FULL_ENHANCEMENT
+
+    # Add thumbnail-specific quality modifiers if not present
+    enhancements = [term for term in QUALITY_TERMS if term not in present]
+
+    # Add YouTube thumbnail specific guidance
+    if "thumbnail" not in present:
+        enhancements.append("YouTube thumbnail style")
+
+    if enhancements:
+        return f"{prompt}, {', '.join(enhancements)}"
+    return prompt
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_ONLY_HIGH"},
+]
+
+# Request body fragments that never change between calls, serialized once
+_SAFETY_SETTINGS_JSON = b',"safetySettings":' + orjson.dumps(SAFETY_SETTINGS)
+
+
+@functools.lru_cache(maxsize=8)
+def _generation_config_json(candidate_count: Optional[int] = None) -> bytes:
+    """Serialized generationConfig, built once per candidate count."""
+    generation_config = {"responseModalities": ["IMAGE", "TEXT"]}
+    if candidate_count:
+        generation_config["candidateCount"] = candidate_count
+    return orjson.dumps(generation_config)
+
+
+# Fixed prompt text sent alongside the reference thumbnail
+REFERENCE_FORMAT_PROMPT = """REFERENCE THUMBNAIL (FORMAT ONLY):
+This image shows the FORMAT/LAYOUT to replicate:
+- Copy the EXACT composition, layout, and positioning
+- Copy the color scheme, lighting style, and mood
+- Copy the text styling and placement
+- Copy the pose TYPES and expression TYPES
+
+⚠️ CRITICAL: NO FACES from this reference thumbnail should EVER be used in the final output.
+The people/characters in this reference are just placeholders showing poses.
+You must use ONLY the face photos provided below for all people in the thumbnail.
+NEVER include any face from the reference - only use the face photos provided."""
+
+_REFERENCE_FORMAT_PART = {"text": REFERENCE_FORMAT_PROMPT}
+
+# Main generation prompt; bound str.format filled in per request
+_build_generation_prompt = """Generate a YouTube thumbnail image with {aspect_ratio} aspect ratio.
+
+VIDEO CONTEXT:
+{enhanced_prompt}
+
+GENERATION RULES:
+1. Use the REFERENCE FORMAT above for layout, composition, colors, poses, and style
+2. Use ONLY the FACE PHOTOS above as the people - DO NOT use anyone from the reference
+3. The faces provided can fill ANY/ALL character positions in the format
+4. Apply the pose types and expression types from the reference to the provided faces
+5. Adapt the content (text, graphics) to match the video context
+6. Maintain professional YouTube thumbnail quality
+
+⚠️ ABSOLUTE RULE: NO FACES from the reference thumbnail should EVER appear in the final output. Only the provided face photos.""".format
+
+
+@functools.lru_cache(maxsize=None)
+def _get_client(api_key: str) -> genai.Client:
+    """Shared SDK client per API key, so extra generators reuse its connection pool."""
+    return genai.Client(api_key=api_key)
+
 
 class ImagenGenerator:
     """Generates thumbnail images using Google Gemini 3 Pro Image Preview."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 4,
+        result_cache_size: int = 16,
+        result_cache_ttl: float = 600,
+    ):
         """
         Initialize the Gemini image generator.
 
         Args:
             api_key: Google AI API key (uses GOOGLE_AI_API_KEY env var if not provided)
+            max_concurrency: Starting limit for concurrent generateContent calls
+                (adapts to throttling from there)
+            result_cache_size: Generations remembered for identical requests (0 disables)
+            result_cache_ttl: Seconds a remembered generation is reused
         """
         self.api_key = api_key or os.getenv("GOOGLE_AI_API_KEY")
         if not self.api_key:
             raise ValueError("Google AI API key required")
 
-        self.client = genai.Client(api_key=self.api_key)
+        # SDK client for the Imagen edit/upscale endpoints
+        self.client = _get_client(self.api_key)
         self.model = "gemini-3-pro-image-preview"
 
+        # generateContent goes over one pooled keep-alive client (HTTP/2 when
+        # h2 is installed): the SDK opens a new session per call, which costs a
+        # TLS handshake for every parallel variation
+        self._http = httpx.AsyncClient(
+            base_url=GEMINI_API_URL,
+            headers={"x-goog-api-key": self.api_key, "content-type": "application/json"},
+            http2=_HTTP2,
+            timeout=httpx.Timeout(180.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+
+        # Ask for all variations in one request; switched off on the first
+        # request the model rejects
+        self._supports_candidate_count = True
+
+        # Shared across requests so bursts back off together when throttled
+        self._limiter = AIMDLimiter(initial=max_concurrency)
+
+        # Recent results keyed by a digest of the full request, so re-running
+        # identical inputs skips the remote call
+        self._results = TTLCache(maxsize=result_cache_size, ttl=result_cache_ttl) if result_cache_size > 0 else None
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        await self._http.aclose()
+
     async def generate_thumbnail(
         self,
         prompt: str,
         num_images: int = 4,
         aspect_ratio: str = "16:9",
-        reference_image: Optional[str] = None,
+        reference_image: Optional[Union[str, bytes, memoryview]] = None,
         face_photos: Optional[List[tuple]] = None,
         safety_filter_level: str = "block_low_and_above",
         person_generation: str = "allow_adult",
@@ -44,8 +214,8 @@ class ImagenGenerator:
             prompt: Image generation prompt with video context
             num_images: Number of variations to generate (1-4)
             aspect_ratio: Output aspect ratio (16:9 for thumbnails)
-            reference_image: Base64 reference thumbnail - use for FORMAT/LAYOUT only, NOT people
-            face_photos: List of (base64_data, file_name) tuples - these are the ONLY people in the thumbnail
+            reference_image: Base64 (or raw bytes-like) reference thumbnail - use for FORMAT/LAYOUT only, NOT people
+            face_photos: List of (base64_data or bytes-like, file_name) tuples - these are the ONLY people in the thumbnail
             safety_filter_level: Safety filter threshold
             person_generation: Person generation setting
 
@@ -57,157 +227,90 @@ class ImagenGenerator:
         # Build the prompt with thumbnail optimization
         enhanced_prompt = self._enhance_prompt_for_thumbnails(prompt)
 
-        # Build the content array
+        # Build the content array directly in the REST wire shape
         content_parts = []
+        append = content_parts.append
 
         # FIRST: Add the reference image for FORMAT/LAYOUT only
         if reference_image:
-            print(f"[DEBUG] Including reference thumbnail for FORMAT only")
-            ref_bytes = self._decode_base64_image(reference_image)
-            if ref_bytes:
-                content_parts.append(types.Part.from_bytes(data=ref_bytes, mime_type="image/png"))
-                content_parts.append(
-                    """REFERENCE THUMBNAIL (FORMAT ONLY):
-This image shows the FORMAT/LAYOUT to replicate:
-- Copy the EXACT composition, layout, and positioning
-- Copy the color scheme, lighting style, and mood
-- Copy the text styling and placement
-- Copy the pose TYPES and expression TYPES
-
-⚠️ CRITICAL: NO FACES from this reference thumbnail should EVER be used in the final output.
-The people/characters in this reference are just placeholders showing poses.
-You must use ONLY the face photos provided below for all people in the thumbnail.
-NEVER include any face from the reference - only use the face photos provided."""
-                )
+            logger.debug("Including reference thumbnail for FORMAT only")
+            ref_part = self._image_part(reference_image)
+            if ref_part:
+                append(ref_part)
+                append(_REFERENCE_FORMAT_PART)
 
         # SECOND: Add ALL face photos - these replace ALL characters in the reference
         if face_photos and len(face_photos) > 0:
-            print(f"[DEBUG] Including {len(face_photos)} face photo(s) - these are the ONLY people to use")
+            logger.debug("Including %d face photo(s) - these are the ONLY people to use", len(face_photos))
             face_names = [name for _, name in face_photos]
-            content_parts.append(
-                f"""FACE PHOTOS ({len(face_photos)} provided):
+            append({"text": f"""FACE PHOTOS ({len(face_photos)} provided):
 These are the ONLY people who should appear in the final thumbnail.
 Use these faces to replace ALL characters/people from the reference format.
 Each face can be used for any character position in the layout.
-Face photos provided: {', '.join(face_names)}"""
-            )
+Face photos provided: {', '.join(face_names)}"""})
             for i, (face_data, face_name) in enumerate(face_photos):
-                face_bytes = self._decode_base64_image(face_data)
-                if face_bytes:
-                    content_parts.append(types.Part.from_bytes(data=face_bytes, mime_type="image/png"))
+                face_part = self._image_part(face_data)
+                if face_part:
+                    append(face_part)
                     # Use the file name (without extension) as the face label
                     clean_name = face_name.rsplit('.', 1)[0] if '.' in face_name else face_name
-                    content_parts.append(f"FACE '{clean_name}': Use this person's EXACT face, skin tone, and features.")
+                    append({"text": f"FACE '{clean_name}': Use this person's EXACT face, skin tone, and features."})
 
         # THIRD: Add the main generation prompt
-        generation_prompt = f"""Generate a YouTube thumbnail image with {aspect_ratio} aspect ratio.
-
-VIDEO CONTEXT:
-{enhanced_prompt}
-
-GENERATION RULES:
-1. Use the REFERENCE FORMAT above for layout, composition, colors, poses, and style
-2. Use ONLY the FACE PHOTOS above as the people - DO NOT use anyone from the reference
-3. The faces provided can fill ANY/ALL character positions in the format
-4. Apply the pose types and expression types from the reference to the provided faces
-5. Adapt the content (text, graphics) to match the video context
-6. Maintain professional YouTube thumbnail quality
+        generation_prompt = _build_generation_prompt(
+            aspect_ratio=aspect_ratio, enhanced_prompt=enhanced_prompt
+        )
 
-⚠️ ABSOLUTE RULE: NO FACES from the reference thumbnail should EVER appear in the final output. Only the provided face photos."""
+        append({"text": generation_prompt})
 
-        content_parts.append(generation_prompt)
+        # Serialize the (possibly multi-MB) parts once and reuse them for every request
+        parts_json = orjson.dumps(content_parts)
+        # Text-only parts for the safety fallback, likewise shared by every variation
+        fallback_json = orjson.dumps([{"text": generation_prompt}])
 
         try:
-            images = []
-
-            # Generate multiple images by making multiple requests
-            for i in range(min(num_images, 4)):
-                print(f"[DEBUG] Generating image {i + 1}/{num_images}")
+            count = min(num_images, 4)
+
+            # parts_json covers the prompt, aspect ratio and every image
+            cache_key = None
+            if self._results is not None:
+                cache_key = (count, hashlib.blake2b(parts_json, digest_size=16).digest())
+                cached = self._results.get(cache_key)
+                if cached is not None:
+                    logger.debug("Reusing cached generation for identical request")
+                    return {
+                        "images": list(cached),
+                        "generation_time_ms": int((time.time() - start_time) * 1000),
+                    }
 
-                try:
-                    response = self.client.models.generate_content(
-                        model=self.model,
-                        contents=content_parts,
-                        config=types.GenerateContentConfig(
-                            response_modalities=["IMAGE", "TEXT"],
-                            safety_settings=[
-                                types.SafetySetting(
-                                    category="HARM_CATEGORY_DANGEROUS_CONTENT",
-                                    threshold="BLOCK_NONE",
-                                ),
-                                types.SafetySetting(
-                                    category="HARM_CATEGORY_HARASSMENT",
-                                    threshold="BLOCK_NONE",
-                                ),
-                                types.SafetySetting(
-                                    category="HARM_CATEGORY_HATE_SPEECH",
-                                    threshold="BLOCK_NONE",
-                                ),
-                                types.SafetySetting(
-                                    category="HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                                    threshold="BLOCK_ONLY_HIGH",
-                                ),
-                            ],
-                        ),
-                    )
-
-                    # Extract image from response
-                    if response.candidates and len(response.candidates) > 0:
-                        candidate = response.candidates[0]
-                        if hasattr(candidate, 'content') and candidate.content:
-                            for part in candidate.content.parts:
-                                if hasattr(part, 'inline_data') and part.inline_data:
-                                    mime_type = part.inline_data.mime_type
-                                    image_bytes = part.inline_data.data
-                                    if isinstance(image_bytes, bytes):
-                                        b64_data = base64.b64encode(image_bytes).decode('utf-8')
-                                    else:
-                                        b64_data = image_bytes
-                                    images.append(f"data:{mime_type};base64,{b64_data}")
-                                    break
-
-                except Exception as gen_error:
-                    error_str = str(gen_error)
-                    print(f"[WARNING] Image {i + 1} generation error: {error_str}")
-
-                    # Check for safety-related errors
-                    if "IMAGE_SAFETY" in error_str or "safety" in error_str.lower():
-                        print(f"[WARNING] Safety filter triggered. Trying without face images...")
-                        # Try generating without face images as fallback
-                        try:
-                            fallback_response = self.client.models.generate_content(
-                                model=self.model,
-                                contents=[generation_prompt],  # Just the text prompt
-                                config=types.GenerateContentConfig(
-                                    response_modalities=["IMAGE", "TEXT"],
-                                ),
-                            )
-                            if fallback_response.candidates and len(fallback_response.candidates) > 0:
-                                candidate = fallback_response.candidates[0]
-                                if hasattr(candidate, 'content') and candidate.content:
-                                    for part in candidate.content.parts:
-                                        if hasattr(part, 'inline_data') and part.inline_data:
-                                            mime_type = part.inline_data.mime_type
-                                            image_bytes = part.inline_data.data
-                                            if isinstance(image_bytes, bytes):
-                                                b64_data = base64.b64encode(image_bytes).decode('utf-8')
-                                            else:
-                                                b64_data = image_bytes
-                                            images.append(f"data:{mime_type};base64,{b64_data}")
-                                            print(f"[DEBUG] Fallback image {i + 1} generated successfully")
-                                            break
-                        except Exception as fallback_error:
-                            print(f"[ERROR] Fallback also failed: {fallback_error}")
-                            continue
-                    else:
-                        # For other errors, just continue to next attempt
-                        continue
+            images = []
+            used_fallback = False
+
+            # Prefer one multi-candidate request to amortize per-request overhead
+            if count > 1 and self._supports_candidate_count:
+                images = await self._generate_batch(count, parts_json)
+
+            # Otherwise (or to top up blocked candidates) generate the rest with
+            # concurrent single requests; total time is roughly one call
+            missing = count - len(images)
+            if missing > 0:
+                results = await asyncio.gather(
+                    *(self._generate_one(i, count, parts_json, fallback_json)
+                      for i in range(len(images), count))
+                )
+                images.extend(image for image, _ in results if image)
+                used_fallback = any(fallback for _, fallback in results)
 
             generation_time_ms = int((time.time() - start_time) * 1000)
 
             if not images:
                 raise ValueError("No images generated. The safety filter may have blocked the request. Try different face photos or a simpler prompt.")
 
+            # Only remember complete results of the real request - text-only
+            # fallbacks and partial batches should be retried next time
+            if cache_key is not None and len(images) == count and not used_fallback:
+                self._results.set(cache_key, tuple(images))
+
             return {
                 "images": images,
                 "generation_time_ms": generation_time_ms,
@@ -218,16 +321,215 @@ GENERATION RULES:
         except Exception as e:
             raise ValueError(f"Image generation failed: {str(e)}")
 
-    def _decode_base64_image(self, image_data: str) -> Optional[bytes]:
-        """Decode base64 image data to bytes."""
+    async def _generate_content(
+        self,
+        parts_json: bytes,
+        candidate_count: Optional[int] = None,
+        safety_settings: bool = True,
+    ) -> dict:
+        """
+        Call the Gemini generateContent REST endpoint.
+
+        Args:
+            parts_json: Pre-serialized JSON array of request parts
+            candidate_count: Number of candidates to request
+            safety_settings: Whether to send SAFETY_SETTINGS
+
+        Returns:
+            Parsed JSON response
+
+        Raises:
+            GeminiAPIError: If the API returns an error status
+        """
+        body = (
+            b'{"contents":[{"role":"user","parts":' + parts_json
+            + b'}],"generationConfig":' + _generation_config_json(candidate_count)
+        )
+        if safety_settings:
+            body += _SAFETY_SETTINGS_JSON
+        body += b"}"
+
+        for attempt in range(GEMINI_MAX_ATTEMPTS):
+            async with self._limiter:
+                response = await self._http.post(f"models/{self.model}:generateContent", content=body)
+            if response.status_code != 429:
+                break
+
+            self._limiter.on_throttle()
+            delay = self._retry_delay(response, attempt)
+            if attempt == GEMINI_MAX_ATTEMPTS - 1 or delay > GEMINI_MAX_RETRY_DELAY:
+                break
+            logger.warning(
+                "Gemini rate limited, retrying in %.1fs (concurrency limit %d)", delay, self._limiter.limit
+            )
+            await asyncio.sleep(delay)
+
+        if response.is_error:
+            raise GeminiAPIError(response.status_code, response.text[:1000])
+        await self._limiter.on_success()
+        return orjson.loads(response.content)
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        """
+        Work out how long to wait before retrying a throttled call.
+
+        Uses the Retry-After header or the RetryInfo detail in the error body
+        when present, otherwise exponential backoff (1s, 2s, ...).
+
+        Args:
+            response: The 429 response
+            attempt: Zero-based attempt number
+
+        Returns:
+            Delay in seconds
+        """
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+
         try:
-            if image_data.startswith('data:'):
-                # Remove data URI prefix
-                image_data = image_data.split(',')[1]
-            return base64.b64decode(image_data)
-        except Exception as e:
-            print(f"[ERROR] Failed to decode image: {e}")
+            details = orjson.loads(response.content)["error"].get("details") or []
+        except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+            details = []
+        for detail in details:
+            retry_delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+            if retry_delay:
+                try:
+                    return float(retry_delay.rstrip("s"))
+                except ValueError:
+                    pass
+
+        return float(2 ** attempt)
+
+    async def _generate_batch(self, count: int, parts_json: bytes) -> List[str]:
+        """
+        Generate several images in a single request using candidateCount.
+
+        Args:
+            count: Number of candidates to request
+            parts_json: Pre-serialized request parts
+
+        Returns:
+            Image data URIs (possibly fewer than count), or an empty list if
+            the model does not support multiple candidates
+        """
+        logger.debug("Generating %d images in one request", count)
+        try:
+            response = await self._generate_content(parts_json, candidate_count=count)
+        except Exception as batch_error:
+            logger.warning("Multi-candidate request failed, using single requests: %s", batch_error)
+            # Image models may reject multiple candidates; remember only that
+            # explicit rejection, since 5xx, timeouts and exhausted 429 retries
+            # say nothing about support
+            if (
+                isinstance(batch_error, GeminiAPIError)
+                and batch_error.status_code == 400
+                and "candidate" in str(batch_error).lower()
+            ):
+                self._supports_candidate_count = False
+            return []
+
+        images = []
+        for candidate in (response.get("candidates") or [])[:count]:
+            image = self._extract_candidate_image(candidate)
+            if image:
+                images.append(image)
+        return images
+
+    async def _generate_one(
+        self,
+        index: int,
+        count: int,
+        parts_json: bytes,
+        fallback_json: bytes,
+    ) -> Tuple[Optional[str], bool]:
+        """
+        Generate a single image, retrying text-only if the safety filter trips.
+
+        Args:
+            index: Zero-based image index (for logging)
+            count: Total number of images being generated
+            parts_json: Pre-serialized request parts, shared across requests
+            fallback_json: Pre-serialized text-only parts for the safety fallback
+
+        Returns:
+            Tuple of (image data URI or None if generation failed, whether
+            the text-only fallback was used)
+        """
+        logger.debug("Generating image %d/%d", index + 1, count)
+
+        try:
+            response = await self._generate_content(parts_json)
+            return self._extract_image(response), False
+
+        except Exception as gen_error:
+            error_str = str(gen_error)
+            logger.warning("Image %d generation error: %s", index + 1, error_str)
+
+            # Check for safety-related errors; other errors just skip this image
+            if "IMAGE_SAFETY" not in error_str and "safety" not in error_str.lower():
+                return None, False
+
+            logger.warning("Safety filter triggered. Trying without face images...")
+            # Try generating without face images as fallback
+            try:
+                fallback_response = await self._generate_content(
+                    fallback_json,  # Just the text prompt
+                    safety_settings=False,
+                )
+                image = self._extract_image(fallback_response)
+                if image:
+                    logger.debug("Fallback image %d generated successfully", index + 1)
+                return image, True
+            except Exception as fallback_error:
+                logger.error("Fallback also failed: %s", fallback_error)
+                return None, True
+
+    def _extract_image(self, response: dict) -> Optional[str]:
+        """Return the first candidate's inline image in a Gemini response as a data URI."""
+        candidates = response.get("candidates")
+        if candidates:
+            return self._extract_candidate_image(candidates[0])
+        return None
+
+    def _extract_candidate_image(self, candidate: dict) -> Optional[str]:
+        """Return a candidate's first inline image as a data URI (already base64 in the JSON)."""
+        for part in (candidate.get("content") or {}).get("parts") or []:
+            inline_data = part.get("inlineData")
+            if inline_data and inline_data.get("data"):
+                mime_type = inline_data.get("mimeType", "image/png")
+                return f"data:{mime_type};base64,{inline_data['data']}"
+        return None
+
+    def _image_part(self, image_data) -> Optional[dict]:
+        """
+        Build an inline image part from base64 data (data URI or raw) or bytes.
+
+        Base64 input is passed through as-is - the REST API takes base64, so
+        there is no need to decode it.
+        """
+        if isinstance(image_data, BYTES_LIKE):
+            if not image_data:
+                return None
+            return {"inlineData": {"mimeType": sniff_image_type(image_data), "data": b64encode_as_string(image_data)}}
+
+        if image_data.startswith('data:'):
+            # Split the data URI into media type and payload
+            comma = image_data.find(',', 5)
+            if comma == -1:
+                comma = len(image_data)
+            mime_type = image_data[5:comma].split(';', 1)[0] or "image/png"
+            image_data = image_data[comma + 1:]
+        else:
+            mime_type = sniff_base64_image_type(image_data)
+
+        if not image_data:
+            logger.error("Failed to decode image: empty image data")
             return None
+        return {"inlineData": {"mimeType": mime_type, "data": image_data}}
 
     def _enhance_prompt_for_thumbnails(self, prompt: str) -> str:
         """
@@ -239,29 +541,7 @@ GENERATION RULES:
         Returns:
             Enhanced prompt optimized for thumbnails
         """
-        # Add thumbnail-specific quality modifiers if not present
-        quality_terms = [
-            "high quality",
-            "professional",
-            "vibrant colors",
-            "sharp focus",
-            "eye-catching",
-        ]
-
-        prompt_lower = prompt.lower()
-        enhancements = []
-
-        for term in quality_terms:
-            if term not in prompt_lower:
-                enhancements.append(term)
-
-        # Add YouTube thumbnail specific guidance
-        if "thumbnail" not in prompt_lower:
-            enhancements.append("YouTube thumbnail style")
-
-        if enhancements:
-            return f"{prompt}, {', '.join(enhancements)}"
-        return prompt
+        return _enhance_prompt(prompt)
 
     async def generate_with_reference_image(
         self,
@@ -287,11 +567,7 @@ GENERATION RULES:
 
         try:
             # Decode the reference image
-            if reference_image_base64.startswith('data:'):
-                # Remove data URI prefix
-                reference_image_base64 = reference_image_base64.split(',')[1]
-
-            reference_bytes = base64.b64decode(reference_image_base64)
+            reference_bytes = decode_image_data(reference_image_base64)
 
             # Use image editing to incorporate reference
             response = self.client.models.edit_image(
@@ -314,7 +590,7 @@ GENERATION RULES:
             images = []
             for generated_image in response.generated_images:
                 if generated_image.image and generated_image.image.image_bytes:
-                    b64_data = base64.b64encode(generated_image.image.image_bytes).decode('utf-8')
+                    b64_data = b64encode_as_string(generated_image.image.image_bytes)
                     images.append(f"data:image/png;base64,{b64_data}")
 
             return {
@@ -343,10 +619,7 @@ GENERATION RULES:
         start_time = time.time()
 
         try:
-            if image_base64.startswith('data:'):
-                image_base64 = image_base64.split(',')[1]
-
-            image_bytes = base64.b64decode(image_base64)
+            image_bytes = decode_image_data(image_base64)
 
             response = self.client.models.upscale_image(
                 model="imagen-3.0-generate-001",
@@ -359,9 +632,9 @@ GENERATION RULES:
             generation_time_ms = int((time.time() - start_time) * 1000)
 
             if response.generated_images and response.generated_images[0].image:
-                b64_data = base64.b64encode(
+                b64_data = b64encode_as_string(
                     response.generated_images[0].image.image_bytes
-                ).decode('utf-8')
+                )
                 return {
                     "image": f"data:image/png;base64,{b64_data}",
                     "generation_time_ms": generation_time_ms,
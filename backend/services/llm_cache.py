@@ -0,0 +1,94 @@
+"""
+LLM Response Cache
+Persistent SQLite cache of LLM responses keyed by an input hash and prompt version.
+"""
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+import orjson
+
+
+# Cached responses stay valid for a week unless saved with another TTL
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class LLMCache:
+    """
+    Response cache that survives restarts, for LLM calls whose inputs repeat.
+
+    Entries are keyed by a caller-computed hash of the inputs plus the
+    version of the prompt that produced them, so bumping a prompt version
+    invalidates its old responses without touching other callers.
+    Responses are stored as JSON. Safe to use from worker threads.
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL):
+        """
+        Open (creating if needed) the cache database.
+
+        Args:
+            path: SQLite database file
+            ttl: Default seconds a saved response stays valid
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT NOT NULL, version TEXT NOT NULL, expires_at REAL NOT NULL, response TEXT NOT NULL, "
+            "PRIMARY KEY (key, version))"
+        )
+
+    def check(self, key: str, version: str) -> Optional[Any]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Hash of the request inputs
+            version: Prompt version the response must come from
+
+        Returns:
+            The stored response, or None if missing or expired
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT expires_at, response FROM llm_cache WHERE key = ? AND version = ?", (key, version)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] < time.time():
+                self._db.execute("DELETE FROM llm_cache WHERE key = ? AND version = ?", (key, version))
+                return None
+        return orjson.loads(row[1])
+
+    def save(self, key: str, version: str, response: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a response, replacing any previous one for the same key and version.
+
+        Args:
+            key: Hash of the request inputs
+            version: Prompt version that produced the response
+            response: JSON-serializable response
+            ttl: Seconds the response stays valid (default: the cache's ttl)
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        # Decoded so the column keeps holding TEXT, as rows from earlier versions do
+        payload = orjson.dumps(response).decode()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, version, expires_at, response) VALUES (?, ?, ?, ?)",
+                (key, version, expires_at, payload),
+            )
+
+    def purge_expired(self) -> None:
+        """Delete every expired entry."""
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
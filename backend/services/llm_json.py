@@ -0,0 +1,98 @@
+"""
+LLM JSON Parsing
+Fast parsing of JSON objects returned by chat models.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def parse_json_object(raw_content: Optional[str]) -> Optional[dict]:
+    """
+    Parse a model reply that should be a JSON object.
+
+    Bare JSON (the normal case with JSON response formats) goes through
+    orjson. Otherwise the object starting at the first "{" is decoded with
+    raw_decode, which scans once and stops at its closing brace, so text
+    the model wrapped around the object is ignored without a regex.
+
+    Args:
+        raw_content: Message content returned by the model
+
+    Returns:
+        The parsed object, or None if the reply holds no JSON object
+    """
+    if not raw_content:
+        return None
+
+    try:
+        result = orjson.loads(raw_content)
+    except orjson.JSONDecodeError:
+        start = raw_content.find("{")
+        if start == -1:
+            return None
+        try:
+            result, _ = _JSON_DECODER.raw_decode(raw_content, start)
+        except json.JSONDecodeError:
+            return None
+    return result if isinstance(result, dict) else None
+
+
+class JSONFieldStream:
+    """
+    Incremental reader for a streamed JSON object's top-level fields.
+
+    Feed it the reply as it arrives; each call returns the (key, value)
+    pairs whose values were completed by that chunk, in the order the model
+    wrote them. Nested objects and arrays come back whole once closed.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        # Where the next unread key starts; None until the opening "{" arrives
+        self._pos: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add streamed text and return the fields it completed.
+
+        Args:
+            chunk: Next piece of the model's reply
+
+        Returns:
+            Completed (key, value) pairs, possibly none
+        """
+        self._buffer += chunk
+        buffer = self._buffer
+        if self._pos is None:
+            start = buffer.find("{")
+            if start == -1:
+                return []
+            self._pos = start + 1
+
+        fields = []
+        while True:
+            key_start = _skip(buffer, self._pos, " \t\r\n,")
+            try:
+                key, end = _JSON_DECODER.raw_decode(buffer, key_start)
+                value_start = _skip(buffer, end, " \t\r\n")
+                if buffer[value_start:value_start + 1] != ":":
+                    return fields
+                value, end = _JSON_DECODER.raw_decode(buffer, _skip(buffer, value_start + 1, " \t\r\n"))
+            except json.JSONDecodeError:
+                return fields
+            # A number or literal may still be growing until a delimiter follows it
+            if _skip(buffer, end, " \t\r\n") >= len(buffer):
+                return fields
+            fields.append((key, value))
+            self._pos = end
+
+
+def _skip(text: str, pos: int, chars: str) -> int:
+    """Index of the first character at or after pos that is not in chars."""
+    while pos < len(text) and text[pos] in chars:
+        pos += 1
+    return pos
@@ -2,12 +2,26 @@
 LoRA Trainer Service
 Trains face models using fal.ai FLUX LoRA training.
 """
+import asyncio
+import functools
+import inspect
+import logging
 import os
 from typing import Optional, Callable
 import fal_client
 from supabase import create_client, Client
 
 
+logger = logging.getLogger(__name__)
+
+# Progress messages buffered for on_progress before the oldest are dropped
+PROGRESS_QUEUE_SIZE = 64
+# Seconds a finished training waits for on_progress to receive the last messages
+PROGRESS_DRAIN_TIMEOUT = 5.0
+
+_NO_DASH = str.maketrans("", "", "-")
+
+
 class LoRATrainer:
     """Trains custom LoRA models for face consistency."""
 
@@ -27,11 +41,32 @@ class LoRATrainer:
         else:
             self.supabase = None
 
-    def _generate_trigger_word(self, user_id: str) -> str:
+    def close(self) -> None:
+        """Close the pooled Supabase REST connections."""
+        if self.supabase:
+            self.supabase.postgrest.aclose()
+
+    async def _execute(self, query):
+        """
+        Run a Supabase query without blocking the event loop.
+
+        The sync client's execute() is a blocking HTTP request, so it runs in
+        a worker thread; building the query itself does no I/O.
+
+        Args:
+            query: Supabase query builder, ready to execute
+
+        Returns:
+            The query response
+        """
+        return await asyncio.to_thread(query.execute)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _generate_trigger_word(user_id: str) -> str:
         """Generate a unique trigger word for the user's face model."""
         # Use first 8 chars of user_id to create unique trigger
-        short_id = user_id.replace("-", "")[:8].upper()
-        return f"FACE_{short_id}"
+        return f"FACE_{user_id.translate(_NO_DASH)[:8].upper()}"
 
     async def start_training(
         self,
@@ -47,7 +82,9 @@ class LoRATrainer:
             user_id: User's ID
             images_zip_url: URL to ZIP file containing training images
             model_name: User-provided name for the model
-            on_progress: Optional callback for progress updates
+            on_progress: Optional callback (sync or async) for progress updates;
+                it runs in its own task, and if it falls behind the oldest
+                messages are dropped
 
         Returns:
             Dictionary with model_id, trigger_word, lora_url, status
@@ -57,21 +94,27 @@ class LoRATrainer:
         # Create database record
         model_id = None
         if self.supabase:
-            record = self.supabase.table("face_models").insert({
+            record = await self._execute(self.supabase.table("face_models").insert({
                 "user_id": user_id,
                 "name": model_name,
                 "trigger_word": trigger_word,
                 "lora_url": None,
                 "training_status": "training"
-            }).execute()
+            }))
             model_id = record.data[0]["id"]
 
+        progress_queue = asyncio.Queue(maxsize=PROGRESS_QUEUE_SIZE)
+        drainer = asyncio.create_task(self._drain_progress(progress_queue, on_progress)) if on_progress else None
+
         try:
-            # Progress callback wrapper
+            # Progress callback wrapper: only enqueues, so a slow on_progress
+            # never stalls fal's status updates
             def handle_update(update):
-                if on_progress and hasattr(update, 'logs'):
-                    for log in update.logs:
-                        on_progress(log.get("message", ""))
+                logs = getattr(update, "logs", None) if drainer else None
+                for log in logs or ():
+                    if progress_queue.full():
+                        progress_queue.get_nowait()  # Drop the oldest
+                    progress_queue.put_nowait(log.get("message", ""))
 
             # Start fal.ai training
             result = await fal_client.subscribe_async(
@@ -92,10 +135,14 @@ class LoRATrainer:
 
             # Update database with success
             if self.supabase and model_id:
-                self.supabase.table("face_models").update({
+                await self._execute(self.supabase.table("face_models").update({
                     "lora_url": lora_url,
                     "training_status": "completed"
-                }).eq("id", model_id).execute()
+                }).eq("id", model_id))
+
+            if drainer:
+                # The last log lines arrive just before the result; deliver them
+                await self._finish_progress(progress_queue, drainer)
 
             return {
                 "model_id": model_id,
@@ -107,13 +154,42 @@ class LoRATrainer:
         except Exception as e:
             # Update database with failure
             if self.supabase and model_id:
-                self.supabase.table("face_models").update({
+                await self._execute(self.supabase.table("face_models").update({
                     "training_status": "failed",
                     "error_message": str(e),
-                }).eq("id", model_id).execute()
+                }).eq("id", model_id))
 
             raise
 
+        finally:
+            if drainer:
+                drainer.cancel()
+
+    @staticmethod
+    async def _finish_progress(queue: asyncio.Queue, drainer: asyncio.Task) -> None:
+        """Let the drainer deliver what is queued, up to PROGRESS_DRAIN_TIMEOUT, then stop it."""
+        if queue.full():
+            queue.get_nowait()  # Drop the oldest to make room for the end marker
+        queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(drainer, PROGRESS_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Training progress callback still busy after %.0fs, dropping the rest", PROGRESS_DRAIN_TIMEOUT)
+
+    @staticmethod
+    async def _drain_progress(queue: asyncio.Queue, on_progress: Callable) -> None:
+        """Deliver queued progress messages to on_progress until the None end marker or cancellation."""
+        while True:
+            message = await queue.get()
+            if message is None:
+                return
+            try:
+                result = on_progress(message)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Training progress callback failed")
+
     async def get_training_status(self, model_id: str) -> dict:
         """
         Get the status of a training job.
@@ -127,7 +203,7 @@ class LoRATrainer:
         if not self.supabase:
             raise ValueError("Supabase not configured")
 
-        result = self.supabase.table("face_models").select("*").eq("id", model_id).single().execute()
+        result = await self._execute(self.supabase.table("face_models").select("*").eq("id", model_id).single())
 
         if not result.data:
             raise ValueError(f"Model not found: {model_id}")
@@ -147,7 +223,9 @@ class LoRATrainer:
         if not self.supabase:
             return []
 
-        result = self.supabase.table("face_models").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        result = await self._execute(
+            self.supabase.table("face_models").select("*").eq("user_id", user_id).order("created_at", desc=True)
+        )
 
         return result.data
 
@@ -165,12 +243,13 @@ class LoRATrainer:
         if not self.supabase:
             raise ValueError("Supabase not configured")
 
-        # Verify ownership
-        result = self.supabase.table("face_models").select("user_id").eq("id", model_id).single().execute()
+        # Ownership is part of the filter, so verify + delete is one round-trip;
+        # the deleted rows come back, and none means missing or not the owner's
+        result = await self._execute(
+            self.supabase.table("face_models").delete().eq("id", model_id).eq("user_id", user_id)
+        )
 
-        if not result.data or result.data["user_id"] != user_id:
+        if not result.data:
             raise ValueError("Model not found or unauthorized")
 
-        self.supabase.table("face_models").delete().eq("id", model_id).execute()
-
         return True
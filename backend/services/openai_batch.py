@@ -0,0 +1,129 @@
+"""
+OpenAI Batch API
+Submit, poll and collect chat completion batch jobs for the prompt and vision services.
+"""
+import io
+import logging
+import time
+from typing import Dict, Optional
+
+import openai
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Batch API polling: start at 10s, back off to at most 10 minutes between checks
+BATCH_POLL_INTERVAL = 10.0
+BATCH_MAX_POLL_INTERVAL = 600.0
+# Batch API jobs that end in these states produce no output file
+_BATCH_FAILED_STATUSES = ("failed", "expired", "cancelled")
+
+
+def submit_batch(client: openai.OpenAI, requests: Dict[str, dict], filename: str, label: str) -> str:
+    """
+    Upload chat completion requests and start a Batch API job for them.
+
+    Batch jobs cost half as much as interactive calls and complete within
+    24 hours, so they suit bulk, non-interactive work.
+
+    Args:
+        client: OpenAI client
+        requests: chat.completions.create keyword arguments keyed by a unique item ID
+        filename: Name for the uploaded JSONL input file
+        label: What the batch holds, for log and error messages
+
+    Returns:
+        Batch ID to pass to poll_batch or collect_batch
+
+    Raises:
+        ValueError: If there are no requests to submit
+    """
+    if not requests:
+        raise ValueError(f"No {label} requests to submit")
+
+    lines = io.BytesIO()
+    for item_id, request in requests.items():
+        # Batch bodies are raw API payloads, so the SDK's extra_body is merged in
+        body = {key: value for key, value in request.items() if key != "extra_body"}
+        body.update(request.get("extra_body", {}))
+        lines.write(orjson.dumps({
+            "custom_id": item_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body,
+        }))
+        lines.write(b"\n")
+
+    input_file = client.files.create(file=(filename, lines.getvalue()), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info("Submitted %s batch %s with %d requests", label, batch.id, len(requests))
+    return batch.id
+
+
+def poll_batch(client: openai.OpenAI, batch_id: str, label: str) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Check a batch once, without waiting, and read its replies if it has finished.
+
+    Args:
+        client: OpenAI client
+        batch_id: ID returned by submit_batch
+        label: What the batch holds, for log and error messages
+
+    Returns:
+        Message content keyed by item ID (failed requests omitted), or None
+        while the batch is still running
+
+    Raises:
+        RuntimeError: If the batch failed, expired or was cancelled
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status in _BATCH_FAILED_STATUSES:
+        raise RuntimeError(f"{label.capitalize()} batch {batch_id} {batch.status}")
+    if batch.status != "completed":
+        return None
+
+    if batch.error_file_id:
+        logger.warning("%s batch %s had failed requests (error file %s)", label.capitalize(), batch_id, batch.error_file_id)
+    if not batch.output_file_id:
+        return {}
+
+    contents = {}
+    for line in client.files.content(batch.output_file_id).content.splitlines():
+        if not line:
+            continue
+        record = orjson.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        contents[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return contents
+
+
+def collect_batch(client: openai.OpenAI, batch_id: str, label: str) -> Dict[str, Optional[str]]:
+    """
+    Wait for a batch to finish and read its replies.
+
+    Blocks, polling with exponential backoff, until the batch finishes.
+
+    Args:
+        client: OpenAI client
+        batch_id: ID returned by submit_batch
+        label: What the batch holds, for log and error messages
+
+    Returns:
+        Message content keyed by item ID; failed requests are omitted
+
+    Raises:
+        RuntimeError: If the batch failed, expired or was cancelled
+    """
+    interval = BATCH_POLL_INTERVAL
+    while True:
+        contents = poll_batch(client, batch_id, label)
+        if contents is not None:
+            return contents
+        time.sleep(interval)
+        interval = min(interval * 2, BATCH_MAX_POLL_INTERVAL)
@@ -0,0 +1,71 @@
+"""
+OpenAI Clients
+Pooled OpenAI clients shared per API key by every service that calls the API.
+"""
+from functools import lru_cache
+from typing import Dict
+
+import httpx
+import openai
+
+# httpx[http2] pulls in h2; without it both clients stay on HTTP/1.1
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+# Fan-out (reference + face analysis + prompt generation at once) often
+# needs as many connections as it has calls; keep them all alive between
+# bursts instead of re-handshaking, and drop idle ones after a minute.
+# With HTTP/2 the concurrent calls multiplex over a few connections anyway.
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100, keepalive_expiry=60.0)
+_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+# One pooled async client per API key, so PromptGenerator and
+# ReferenceAnalyzer instances reuse warm keep-alive connections instead of
+# paying a fresh TLS handshake. A dict rather than lru_cache so it can be evicted.
+_ASYNC_CLIENTS: Dict[str, openai.AsyncOpenAI] = {}
+
+
+def get_async_client(api_key: str) -> openai.AsyncOpenAI:
+    """
+    Shared AsyncOpenAI client for an API key.
+
+    The client makes no retries of its own; callers that want SDK retries
+    take a view with client.with_options(max_retries=...), which keeps the
+    same connection pool.
+
+    Args:
+        api_key: OpenAI API key
+
+    Returns:
+        The pooled client, recreated if it was closed
+    """
+    client = _ASYNC_CLIENTS.get(api_key)
+    if client is None or client.is_closed():
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_LIMITS, timeout=_TIMEOUT, http2=_HTTP2),
+        )
+        _ASYNC_CLIENTS[api_key] = client
+    return client
+
+
+async def close_async_client(api_key: str) -> None:
+    """Close and forget the shared async client for an API key (call once, at shutdown)."""
+    client = _ASYNC_CLIENTS.pop(api_key, None)
+    if client is not None:
+        await client.close()
+
+
+@lru_cache(maxsize=None)
+def get_sync_client(api_key: str) -> openai.OpenAI:
+    """Shared OpenAI client for an API key."""
+    # Sync calls fan out from the AI thread pool, so they get the same pool and HTTP/2 as the async client
+    return openai.OpenAI(
+        api_key=api_key,
+        http_client=httpx.Client(limits=_LIMITS, timeout=_TIMEOUT, http2=_HTTP2),
+    )
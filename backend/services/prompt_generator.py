@@ -2,18 +2,40 @@
 Prompt Generator Service
 Uses LLM to generate image prompts from video content.
 """
+import asyncio
+import hashlib
 import json
-from typing import Optional
+import logging
+import random
+import re
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Literal, Optional
 import openai
 
+from services import openai_batch
+from services.cache import TTLCache
+from services.llm_cache import LLMCache
+from services.llm_json import JSONFieldStream, parse_json_object
+from services.openai_clients import close_async_client, get_async_client, get_sync_client
+from services.rate_limit import TokenBucketLimiter
 
-# System prompt for the LLM
-SYSTEM_PROMPT = """You are a YouTube Thumbnail Architect specializing in viral, high-CTR thumbnail designs.
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to a character estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+# System prompt for the LLM. It is identical on every call so OpenAI's prompt
+# cache can reuse it; per-request instructions go in a second system message
+# and the trigger word in the user message.
+SYSTEM_PROMPT_STATIC = """You are a YouTube Thumbnail Architect specializing in viral, high-CTR thumbnail designs.
 
 Your task: Analyze the video content and generate a detailed image prompt for FLUX AI image generation.
 
 RULES:
-1. SUBJECT: If a person should appear, use the token "{trigger_word}" to represent them. Describe their expression vividly (shocked with mouth wide open, excited with eyes sparkling, skeptical with raised eyebrow, pointing dramatically).
+1. SUBJECT: If a person should appear, use the token given as TRIGGER WORD FOR PERSON in the user message to represent them. Describe their expression vividly (shocked with mouth wide open, excited with eyes sparkling, skeptical with raised eyebrow, pointing dramatically).
 
 2. COMPOSITION: Use proven viral layouts:
    - Split screen: face on right, dramatic object/scene on left
@@ -41,19 +63,22 @@ RULES:
 
 6. BACKGROUND: Describe a relevant, slightly blurred background that adds context without distracting.
 
-{reference_style_section}
+Any further rules, such as a reference format or style requirements, follow in the next system message.
 
 OUTPUT FORMAT:
 Return ONLY a valid JSON object with these exact fields:
-{{
+{
     "prompt": "The complete FLUX image generation prompt (detailed, 50-100 words)",
     "thumbnail_text": "The 2-4 word text that should appear on the thumbnail",
     "emotion": "The primary emotion the thumbnail should convey (one word)",
     "composition": "Brief description of the layout (10 words max)"
-}}
+}
 
 Do not include any explanation or text outside the JSON object."""
 
+# Pins calls sharing the static prefix to the same prompt cache bucket
+_PROMPT_CACHE_BODY = {"prompt_cache_key": hashlib.md5(SYSTEM_PROMPT_STATIC.encode("utf-8")).hexdigest()}
+
 
 REFERENCE_STYLE_SECTION = """
 7. REFERENCE FORMAT (TEMPLATE ONLY - DO NOT COPY PEOPLE):
@@ -90,19 +115,244 @@ REFERENCE_STYLE_SECTION = """
    5. The reference people are just showing WHAT POSE/EXPRESSION to use, not WHO should appear"""
 
 
+# Defaults for fields a reference analysis may omit
+_COMPOSITION_DEFAULTS = {
+    'layout_type': 'split',
+    'person_position': 'left 35%',
+    'person_size': '80% of frame height',
+    'background_zones': [],
+}
+_PERSON_DEFAULTS = {
+    'pose': 'facing camera',
+    'expression': 'confident',
+    'eye_direction': 'looking at camera',
+    'lighting_on_face': 'soft front lighting',
+}
+_TEXT_ELEMENT_DEFAULTS = {
+    'text': '',
+    'position': 'top',
+    'font_style': 'bold',
+    'font_size': 'large',
+    'color': 'white',
+    'effects': 'none',
+}
+_GRAPHIC_ELEMENT_DEFAULTS = {
+    'type': 'graphic',
+    'content': '',
+    'position': '',
+    'size': 'medium',
+}
+_COLOR_DEFAULTS = {
+    'primary': 'white',
+    'secondary': 'black',
+    'accent': 'yellow',
+    'background': 'white',
+    'text_colors': ['white', 'black'],
+}
+
+# Bound str.format filled in per request
+_render_reference_style_section = REFERENCE_STYLE_SECTION.format
+
+# Structured output schema; strict mode constrains the model to exactly these fields
+THUMBNAIL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "prompt": {"type": "string"},
+        "thumbnail_text": {"type": "string"},
+        "emotion": {"type": "string"},
+        "composition": {"type": "string"},
+    },
+    "required": ["prompt", "thumbnail_text", "emotion", "composition"],
+    "additionalProperties": False,
+}
+
+# Bump when the prompts change meaningfully, so persisted responses from the
+# old prompts are no longer served (v2 also drops generic fallbacks that v1
+# could persist for a refused or cut-off reply)
+PROMPT_VERSION = "v2"
+
+# Shared chat completion settings for the sync and async paths
+COMPLETION_OPTIONS = {
+    "response_format": {
+        "type": "json_schema",
+        "json_schema": {"name": "thumbnail", "strict": True, "schema": THUMBNAIL_SCHEMA},
+    },
+    "temperature": 0.8,  # Some creativity
+    "max_tokens": 300,  # A 100-word prompt plus the short fields is ~200 tokens
+    # The JSON never contains a blank line; this cuts off trailing whitespace padding
+    "stop": ["\n\n\n"],
+}
+
+
+def _completion_options(temperature: Optional[float] = None) -> dict:
+    """Completion options, with the temperature overridden when one is given."""
+    if temperature is None:
+        return COMPLETION_OPTIONS
+    return {**COMPLETION_OPTIONS, "temperature": temperature}
+
+
+# Models by quality tier; prompt writing is a short structured task the mini model handles well
+QUALITY_MODELS = {
+    "fast": "gpt-4o-mini",
+    "balanced": "gpt-4o-mini",
+    "best": "gpt-4o",
+}
+
+# Fields every prompt result carries
+_RESULT_FIELDS = tuple(THUMBNAIL_SCHEMA["required"])
+
+
+class FallbackPrompt(dict):
+    """Generic concept returned in place of a refused or cut-off reply; never cached."""
+
+
+# Retry throttled calls, 5xx responses and dropped or timed-out connections
+# (the cases the SDK's own retries covered) with jittered exponential backoff
+OPENAI_MAX_ATTEMPTS = 5
+OPENAI_RETRY_BASE = 1.0
+OPENAI_RETRY_JITTER = 1.0
+_RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    return tiktoken.get_encoding("o200k_base")
+
+
+def _count_tokens(text: str) -> int:
+    """Count tokens in text, roughly four characters per token without tiktoken."""
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    return len(_get_encoding().encode(text))
+
+
+# The static system prompt repeats across calls; other messages vary, so only it is cached
+_count_system_tokens = lru_cache(maxsize=64)(_count_tokens)
+
+
+def _estimate_tokens(messages: List[dict]) -> int:
+    """Estimate the tokens a completion will consume, prompt plus maximum output."""
+    static, *rest = messages
+    return (
+        _count_system_tokens(static["content"])
+        + sum(_count_tokens(message["content"]) for message in rest)
+        + COMPLETION_OPTIONS["max_tokens"]
+    )
+
+
+
+# Input budgets for the video text sent to the model
+TRANSCRIPT_MAX_TOKENS = 400
+DESCRIPTION_MAX_TOKENS = 120
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_HOOK_WORDS_RE = re.compile(r'\b(SHOCKED|NEVER|HOW|WHY|BIGGEST|FIRST|LAST|SECRET|REVEALED)\b', re.I)
+
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens (four characters per token without tiktoken)."""
+    if tiktoken is None:
+        return text[:max_tokens * 4]
+    tokens = _get_encoding().encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return _get_encoding().decode(tokens[:max_tokens])
+
+
+def _extract_hook_sentences(text: str, max_tokens: int) -> str:
+    """
+    Pick the sentences of a transcript or description most useful for a thumbnail.
+
+    Keeps the first two and last two sentences (the hook and the payoff),
+    then any sentence with a curiosity word (NEVER, SECRET, BIGGEST, ...),
+    until max_tokens is reached. Chosen sentences keep their original order.
+    Text already within budget is returned unchanged.
+    Text without sentence punctuation, such as auto-generated captions, is
+    simply cut to max_tokens.
+
+    Args:
+        text: Transcript or description
+        max_tokens: Token budget for the excerpt
+
+    Returns:
+        Excerpt of at most max_tokens tokens
+    """
+    # Short text that already fits is sent whole (the length check skips
+    # tokenizing long transcripts that cannot fit)
+    if len(text) <= max_tokens * 4 and _count_tokens(text) <= max_tokens:
+        return text
+
+    sentences = _SENTENCE_SPLIT_RE.split(text.strip())
+    if len(sentences) <= 1:
+        return _truncate_tokens(text, max_tokens)
+
+    last = len(sentences) - 1
+    priority = [0, 1, last - 1, last]
+    priority += [i for i in range(2, last - 1) if _HOOK_WORDS_RE.search(sentences[i])]
+
+    chosen = set()
+    budget = max_tokens
+    for i in dict.fromkeys(i for i in priority if 0 <= i <= last):
+        cost = _count_tokens(sentences[i])
+        if cost > budget:
+            if not chosen:
+                # Even the opening sentence is over budget; keep what fits of it
+                return _truncate_tokens(sentences[i], max_tokens)
+            continue
+        chosen.add(i)
+        budget -= cost
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+# Quality tokens enhance_prompt appends when missing (lowercase)
+ENHANCE_QUALITY_TOKENS = (
+    "4k resolution",
+    "sharp focus",
+    "professional photography",
+    "vibrant colors",
+)
+
+_PERSON_RE = re.compile(r'\b(a|the) person\b')
+
 class PromptGenerator:
     """Generates image prompts from video analysis using LLM."""
 
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(
+        self,
+        api_key: str,
+        model: Optional[str] = None,
+        quality: Literal["fast", "balanced", "best"] = "balanced",
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 30000,
+        result_cache_size: int = 256,
+        result_cache_ttl: float = 3600,
+        persistent_cache: Optional[LLMCache] = None,
+    ):
         """
         Initialize the prompt generator.
 
         Args:
             api_key: OpenAI API key
-            model: Model to use (default: gpt-4o)
+            model: Model to use; overrides quality when given
+            quality: Quality tier picking the model from QUALITY_MODELS (best: gpt-4o, otherwise gpt-4o-mini)
+            requests_per_minute: RPM budget for async calls
+            tokens_per_minute: TPM budget for async calls
+            result_cache_size: Number of recent prompts kept for identical requests (0 disables)
+            result_cache_ttl: Seconds a cached prompt stays valid
+            persistent_cache: Optional on-disk cache consulted after the in-memory one
         """
-        self.client = openai.OpenAI(api_key=api_key)
-        self.model = model
+        self.api_key = api_key
+        self.client = get_sync_client(api_key)
+        # No SDK retries: _create_async retries so retries also respect the rate limiter
+        self.async_client = get_async_client(api_key)
+        self.model = model or QUALITY_MODELS[quality]
+        self._limiter = TokenBucketLimiter(requests_per_minute, tokens_per_minute)
+        # Recent prompts keyed by a digest of the messages and model, so
+        # retries and re-renders of the same inputs skip the API call
+        self._results = TTLCache(maxsize=result_cache_size, ttl=result_cache_ttl) if result_cache_size > 0 else None
+        self._persistent = persistent_cache
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def generate_prompt(
         self,
@@ -111,72 +361,413 @@ class PromptGenerator:
         trigger_word: str = "person",
         reference_analysis: Optional[dict] = None,
         face_description: Optional[dict] = None,
+        temperature: Optional[float] = None,
     ) -> dict:
         """
         Generate a thumbnail prompt from video analysis.
 
+        Blocking; async callers should use generate_prompt_async.
+
+        Args:
+            video_data: Dictionary from VideoAnalyzer.analyze()
+            template_system_prompt: Optional template-specific instructions
+            trigger_word: Token to use for the person (from LoRA training)
+            reference_analysis: Optional analysis from ReferenceAnalyzer
+            face_description: Optional dict with 'primary_face', 'secondary_faces', 'faces' from analyze_face_photos()
+            temperature: Sampling temperature override; 0 gives the most reproducible (and cacheable) prompts
+
+        Returns:
+            Dictionary with prompt, thumbnail_text, emotion, composition
+        """
+        messages = self._build_messages(
+            video_data, template_system_prompt, trigger_word, reference_analysis, face_description
+        )
+        options = _completion_options(temperature)
+        cache_key = self._cache_key(messages, options)
+        cached = self._cached_result(cache_key)
+        if cached is not None:
+            return cached
+
+        response = self.client.chat.completions.create(
+            model=self.model, messages=messages, extra_body=_PROMPT_CACHE_BODY, **options
+        )
+        return self._store_result(cache_key, self._parse_result(response.choices[0].message.content, video_data))
+
+    async def generate_prompt_async(
+        self,
+        video_data: dict,
+        template_system_prompt: Optional[str] = None,
+        trigger_word: str = "person",
+        reference_analysis: Optional[dict] = None,
+        face_description: Optional[dict] = None,
+        temperature: Optional[float] = None,
+    ) -> dict:
+        """
+        Generate a thumbnail prompt from video analysis without blocking the event loop.
+
+        The inputs are independent of each other, so gather them before this
+        call rather than awaiting each one in turn (generate_images_from_url
+        does this):
+
+            video_data, (reference_analysis, face_description) = await asyncio.gather(
+                fetch_video_data(url), analyze_references_and_faces(refs, faces)
+            )
+            prompt = await generator.generate_prompt_async(
+                video_data, reference_analysis=reference_analysis, face_description=face_description
+            )
+
+        For several videos, use generate_prompts to fan the calls out.
+
         Args:
             video_data: Dictionary from VideoAnalyzer.analyze()
             template_system_prompt: Optional template-specific instructions
             trigger_word: Token to use for the person (from LoRA training)
             reference_analysis: Optional analysis from ReferenceAnalyzer
             face_description: Optional dict with 'primary_face', 'secondary_faces', 'faces' from analyze_face_photos()
+            temperature: Sampling temperature override; 0 gives the most reproducible (and cacheable) prompts
 
         Returns:
             Dictionary with prompt, thumbnail_text, emotion, composition
         """
+        # Prompt assembly (templating, transcript tokenizing) is CPU work; keep
+        # it off the event loop so concurrent requests keep being serviced
+        messages = await asyncio.to_thread(
+            self._build_messages, video_data, template_system_prompt, trigger_word, reference_analysis, face_description
+        )
+        options = _completion_options(temperature)
+        cache_key = self._cache_key(messages, options)
+        cached = await self._acached_result(cache_key)
+        if cached is not None:
+            return cached
+
+        response = await self._create_async(messages, options)
+        return await self._astore_result(cache_key, self._parse_result(response.choices[0].message.content, video_data))
+
+    def _cache_key(self, messages: List[dict], options: dict) -> Optional[bytes]:
+        """
+        Digest a request for the result cache.
+
+        The messages already contain every input (video data, reference
+        analysis, face descriptions and template), so hashing them with the
+        model and temperature identifies the request.
+
+        Args:
+            messages: Chat messages from _build_messages
+            options: Completion options from _completion_options
+
+        Returns:
+            16-byte digest, or None when caching is disabled
+        """
+        if self._results is None and self._persistent is None:
+            return None
+        canonical = json.dumps([self.model, options["temperature"], messages], sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+    def _cached_result(self, cache_key: Optional[bytes]) -> Optional[dict]:
+        """Return a copy of the cached prompt for cache_key, counting hits and misses."""
+        if cache_key is None:
+            return None
+        cached = self._results.get(cache_key) if self._results is not None else None
+        if cached is None and self._persistent is not None:
+            cached = self._persistent.check(cache_key.hex(), PROMPT_VERSION)
+            if cached is not None and self._results is not None:
+                self._results.set(cache_key, cached)
+        return self._count_lookup(cached)
+
+    async def _acached_result(self, cache_key: Optional[bytes]) -> Optional[dict]:
+        """As _cached_result, but the SQLite lookup runs in a worker thread."""
+        if cache_key is None:
+            return None
+        cached = self._results.get(cache_key) if self._results is not None else None
+        if cached is None and self._persistent is not None:
+            cached = await asyncio.to_thread(self._persistent.check, cache_key.hex(), PROMPT_VERSION)
+            if cached is not None and self._results is not None:
+                self._results.set(cache_key, cached)
+        return self._count_lookup(cached)
+
+    def _count_lookup(self, cached: Optional[dict]) -> Optional[dict]:
+        """Count a cache hit or miss and return a copy of the cached prompt, if any."""
+        if cached is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        logger.debug("Reusing cached prompt for identical request")
+        return dict(cached)
+
+    def _store_result(self, cache_key: Optional[bytes], result: dict) -> dict:
+        """Cache a copy of result under cache_key (if caching is enabled and it came from the model) and return it."""
+        # A fallback would otherwise be served for the whole TTL (a week, and
+        # across restarts, once persisted) instead of asking the model again
+        if cache_key is None or isinstance(result, FallbackPrompt):
+            return result
+        if self._results is not None:
+            self._results.set(cache_key, dict(result))
+        if self._persistent is not None:
+            self._persistent.save(cache_key.hex(), PROMPT_VERSION, result)
+        return result
+
+    async def _astore_result(self, cache_key: Optional[bytes], result: dict) -> dict:
+        """As _store_result, but the SQLite write runs in a worker thread."""
+        if cache_key is None or isinstance(result, FallbackPrompt):
+            return result
+        if self._results is not None:
+            self._results.set(cache_key, dict(result))
+        if self._persistent is not None:
+            await asyncio.to_thread(self._persistent.save, cache_key.hex(), PROMPT_VERSION, result)
+        return result
+
+    async def generate_prompt_stream(
+        self,
+        video_data: dict,
+        template_system_prompt: Optional[str] = None,
+        trigger_word: str = "person",
+        reference_analysis: Optional[dict] = None,
+        face_description: Optional[dict] = None,
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a thumbnail prompt, yielding each field as soon as the model finishes it.
+
+        Yields ``{"partial": {field: value}}`` once per completed field, in the
+        order the model writes them, then the full result dictionary (the same
+        value generate_prompt_async returns) as the final item. A cached
+        result is yielded straight away as the only item.
+
+        Args:
+            video_data: Dictionary from VideoAnalyzer.analyze()
+            template_system_prompt: Optional template-specific instructions
+            trigger_word: Token to use for the person (from LoRA training)
+            reference_analysis: Optional analysis from ReferenceAnalyzer
+            face_description: Optional dict with 'primary_face', 'secondary_faces', 'faces' from analyze_face_photos()
+            temperature: Sampling temperature override; 0 gives the most reproducible (and cacheable) prompts
+
+        Yields:
+            Partial field events, then the complete prompt dictionary
+        """
+        messages = await asyncio.to_thread(
+            self._build_messages, video_data, template_system_prompt, trigger_word, reference_analysis, face_description
+        )
+        options = _completion_options(temperature)
+        cache_key = self._cache_key(messages, options)
+        cached = await self._acached_result(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        stream = await self._create_async(messages, options, stream=True)
+        fields = JSONFieldStream()
+        chunks = []
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            chunks.append(chunk.choices[0].delta.content)
+            for key, value in fields.feed(chunks[-1]):
+                yield {"partial": {key: value}}
+
+        yield await self._astore_result(cache_key, self._parse_result("".join(chunks), video_data))
+
+    async def _create_async(self, messages: List[dict], options: dict, **extra):
+        """
+        Run a chat completion within the RPM/TPM budget, retrying throttled calls.
+
+        Args:
+            messages: Chat messages from _build_messages
+            options: Completion options from _completion_options
+            **extra: Extra create() arguments, e.g. stream=True
+
+        Returns:
+            The chat completion response (or stream)
+        """
+        estimated_tokens = _estimate_tokens(messages)
+        for attempt in range(OPENAI_MAX_ATTEMPTS):
+            await self._limiter.acquire(estimated_tokens)
+            try:
+                return await self.async_client.chat.completions.create(
+                    model=self.model, messages=messages, extra_body=_PROMPT_CACHE_BODY, **options, **extra
+                )
+            except _RETRYABLE_ERRORS as e:
+                if attempt == OPENAI_MAX_ATTEMPTS - 1:
+                    raise
+                delay = OPENAI_RETRY_BASE * 2 ** attempt + random.random() * OPENAI_RETRY_JITTER
+                logger.warning("OpenAI call failed (%s), retrying in %.1fs", type(e).__name__, delay)
+                await asyncio.sleep(delay)
+
+    async def generate_prompts(self, items: List[dict], max_concurrency: int = 10) -> List[dict]:
+        """
+        Generate prompts for several videos concurrently.
+
+        Args:
+            items: Keyword arguments for generate_prompt_async, one dict per video
+            max_concurrency: Maximum number of OpenAI calls in flight
+
+        Returns:
+            Prompt dictionaries in the same order as items
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def generate(item: dict) -> dict:
+            async with semaphore:
+                return await self.generate_prompt_async(**item)
+
+        return await asyncio.gather(*(generate(item) for item in items))
+
+    def submit_batch(self, items: Dict[str, dict]) -> str:
+        """
+        Submit prompt requests to the OpenAI Batch API.
+
+        Batch jobs cost half as much as interactive calls and complete
+        within 24 hours, so use this for bulk, non-interactive work such as
+        regenerating prompts for a channel's back catalogue.
+
+        Args:
+            items: Keyword arguments for generate_prompt, keyed by a unique item ID
+
+        Returns:
+            Batch ID to pass to collect_batch or poll_batch
+
+        Raises:
+            ValueError: If items is empty
+        """
+        requests = {
+            item_id: {
+                "model": self.model,
+                "messages": self._build_messages(**item),
+                **COMPLETION_OPTIONS,
+                "extra_body": _PROMPT_CACHE_BODY,
+            }
+            for item_id, item in items.items()
+        }
+        return openai_batch.submit_batch(self.client, requests, "prompts.jsonl", "prompt")
+
+    def collect_batch(self, batch_id: str, items: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+        """
+        Wait for a batch submitted with submit_batch and parse its results.
+
+        Blocks, polling with exponential backoff, until the batch finishes.
+
+        Args:
+            batch_id: ID returned by submit_batch
+            items: The submitted items, used for per-item fallback prompts
+
+        Returns:
+            Prompt dictionaries keyed by item ID; failed requests are omitted
+
+        Raises:
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        return self._parse_batch(openai_batch.collect_batch(self.client, batch_id, "prompt"), items)
+
+    def poll_batch(self, batch_id: str, items: Optional[Dict[str, dict]] = None) -> Optional[Dict[str, dict]]:
+        """
+        Check a batch once, without waiting, and parse its results if it has finished.
+
+        Suits job queues that re-check on their own schedule instead of
+        blocking a worker in collect_batch.
+
+        Args:
+            batch_id: ID returned by submit_batch
+            items: The submitted items, used for per-item fallback prompts
+
+        Returns:
+            Prompt dictionaries keyed by item ID (failed requests omitted),
+            or None while the batch is still running
+
+        Raises:
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        contents = openai_batch.poll_batch(self.client, batch_id, "prompt")
+        return None if contents is None else self._parse_batch(contents, items)
+
+    def _parse_batch(self, contents: Dict[str, Optional[str]], items: Optional[Dict[str, dict]]) -> Dict[str, dict]:
+        """Parse batch replies keyed by item ID, dropping any that lack required fields."""
+        items = items or {}
+        results = {}
+        for item_id, content in contents.items():
+            video_data = items.get(item_id, {}).get("video_data", {})
+            try:
+                results[item_id] = self._parse_result(content, video_data)
+            except ValueError as e:
+                logger.warning("Dropping prompt batch item %s: %s", item_id, e)
+        return results
+
+    def _build_messages(
+        self,
+        video_data: dict,
+        template_system_prompt: Optional[str] = None,
+        trigger_word: str = "person",
+        reference_analysis: Optional[dict] = None,
+        face_description: Optional[dict] = None,
+    ) -> List[dict]:
+        """
+        Build the chat messages for a prompt generation request.
+
+        Args:
+            video_data: Dictionary from VideoAnalyzer.analyze()
+            template_system_prompt: Optional template-specific instructions
+            trigger_word: Token to use for the person (from LoRA training)
+            reference_analysis: Optional analysis from ReferenceAnalyzer
+            face_description: Optional dict with 'primary_face', 'secondary_faces', 'faces' from analyze_face_photos()
+
+        Returns:
+            System and user messages for the chat completion
+        """
         # Build reference style section if analysis is provided
         reference_style_section = ""
         if reference_analysis:
-            # Handle the new detailed JSON structure
-            composition = reference_analysis.get('composition', {})
-            person = reference_analysis.get('person', {})
+            # Handle the new detailed JSON structure; fields the analysis omits
+            # fall back to the module defaults
+            composition = {**_COMPOSITION_DEFAULTS, **reference_analysis.get('composition', {})}
+            person = {**_PERSON_DEFAULTS, **reference_analysis.get('person', {})}
+            colors = {**_COLOR_DEFAULTS, **reference_analysis.get('colors', {})}
             text_elements = reference_analysis.get('text_elements', [])
             graphic_elements = reference_analysis.get('graphic_elements', [])
-            colors = reference_analysis.get('colors', {})
 
             # Format composition details
             composition_details = f"""
-   - Layout: {composition.get('layout_type', 'split')}
-   - Person position: {composition.get('person_position', 'left 35%')}
-   - Person size: {composition.get('person_size', '80% of frame height')}
-   - Background zones: {', '.join(composition.get('background_zones', []))}"""
+   - Layout: {composition['layout_type']}
+   - Person position: {composition['person_position']}
+   - Person size: {composition['person_size']}
+   - Background zones: {', '.join(composition['background_zones'])}"""
 
             # Format person details
             person_details = f"""
-   - Pose: {person.get('pose', 'facing camera')}
-   - Expression: {person.get('expression', 'confident')}
-   - Eye direction: {person.get('eye_direction', 'looking at camera')}
-   - Lighting: {person.get('lighting_on_face', 'soft front lighting')}"""
-
-            # Format text elements
-            text_details = ""
-            for i, text in enumerate(text_elements):
-                text_details += f"""
-   Text {i+1}: "{text.get('text', '')}"
-      - Position: {text.get('position', 'top')}
-      - Style: {text.get('font_style', 'bold')} {text.get('font_size', 'large')}
-      - Color: {text.get('color', 'white')}
-      - Effects: {text.get('effects', 'none')}"""
+   - Pose: {person['pose']}
+   - Expression: {person['expression']}
+   - Eye direction: {person['eye_direction']}
+   - Lighting: {person['lighting_on_face']}"""
+
+            # Format text elements (joined once rather than rebuilt per element)
+            text_parts = []
+            for i, text in enumerate(text_elements, 1):
+                text = {**_TEXT_ELEMENT_DEFAULTS, **text}
+                text_parts.append(f"""
+   Text {i}: "{text['text']}"
+      - Position: {text['position']}
+      - Style: {text['font_style']} {text['font_size']}
+      - Color: {text['color']}
+      - Effects: {text['effects']}""")
+            text_details = "".join(text_parts)
 
             # Format graphic elements
-            graphic_details = ""
-            for i, graphic in enumerate(graphic_elements):
-                graphic_details += f"""
-   Element {i+1}: {graphic.get('type', 'graphic')}
-      - Content: {graphic.get('content', '')}
-      - Position: {graphic.get('position', '')}
-      - Size: {graphic.get('size', 'medium')}"""
+            graphic_parts = []
+            for i, graphic in enumerate(graphic_elements, 1):
+                graphic = {**_GRAPHIC_ELEMENT_DEFAULTS, **graphic}
+                graphic_parts.append(f"""
+   Element {i}: {graphic['type']}
+      - Content: {graphic['content']}
+      - Position: {graphic['position']}
+      - Size: {graphic['size']}""")
+            graphic_details = "".join(graphic_parts)
 
             # Format colors
             color_details = f"""
-   - Primary: {colors.get('primary', 'white')}
-   - Secondary: {colors.get('secondary', 'black')}
-   - Accent: {colors.get('accent', 'yellow')}
-   - Background: {colors.get('background', 'white')}
-   - Text colors: {', '.join(colors.get('text_colors', ['white', 'black']))}"""
+   - Primary: {colors['primary']}
+   - Secondary: {colors['secondary']}
+   - Accent: {colors['accent']}
+   - Background: {colors['background']}
+   - Text colors: {', '.join(colors['text_colors'])}"""
 
-            reference_style_section = REFERENCE_STYLE_SECTION.format(
+            reference_style_section = _render_reference_style_section(
                 composition_details=composition_details,
                 person_details=person_details,
                 text_details=text_details if text_details else "   No text elements",
@@ -186,56 +777,60 @@ class PromptGenerator:
                 recreation_prompt=reference_analysis.get('recreation_prompt', 'Generate a YouTube thumbnail matching the reference style'),
             )
 
-        # Build system prompt
-        system = SYSTEM_PROMPT.format(
-            trigger_word=trigger_word,
-            reference_style_section=reference_style_section
-        )
-
+        # Per-request rules, kept out of the cached static system prompt
+        style_system = reference_style_section
         if template_system_prompt:
-            system += f"\n\nADDITIONAL STYLE REQUIREMENTS:\n{template_system_prompt}"
+            style_system += f"\n\nADDITIONAL STYLE REQUIREMENTS:\n{template_system_prompt}"
 
         # Build user content with video analysis
         description = video_data.get('description') or 'No description'
         transcript = video_data.get('transcript') or 'No transcript available'
 
-        # Build face description section - these faces REPLACE the characters in the reference format
-        face_section = ""
-        if face_description:
-            if isinstance(face_description, dict):
-                # Get all face descriptions
-                face_descriptions = face_description.get("face_descriptions", [])
-                # Fallback to old format if needed
-                if not face_descriptions:
-                    if face_description.get("primary_face"):
-                        face_descriptions = [face_description.get("primary_face")] + face_description.get("secondary_faces", [])
+        # Face descriptions - these faces REPLACE the characters in the reference format
+        face_section = self._build_face_section(face_description)
 
-                if face_descriptions:
-                    face_section = f"""
+        user_content = f"""Analyze this video and create a viral thumbnail concept:
 
-========== FACES TO USE IN THUMBNAIL ({len(face_descriptions)} people) ==========
-These faces REPLACE the characters in the reference format.
-DO NOT include ANY people from the reference thumbnail - use ONLY these faces.
-"""
-                    for i, face_desc in enumerate(face_descriptions):
-                        face_section += f"""
-FACE {i + 1}:
-{face_desc}
-"""
+VIDEO TITLE: {video_data.get('title', 'Unknown')}
 
-                    face_section += f"""
-==========================================================================
+VIDEO DESCRIPTION: {_extract_hook_sentences(description, DESCRIPTION_MAX_TOKENS)}
 
-RULES:
-1. Use ONLY the {len(face_descriptions)} face(s) described above
-2. These faces REPLACE the characters shown in the reference format
-3. DO NOT copy any person from the reference image
-4. Apply the poses/expressions/positions from the reference FORMAT to these faces
-5. If reference has 2 characters and 2 faces provided, Face 1 replaces character 1, Face 2 replaces character 2"""
+TAGS: {', '.join(video_data.get('tags', [])[:10])}
+
+CHANNEL: {video_data.get('channel', 'Unknown')}
+
+TRANSCRIPT EXCERPT: {_extract_hook_sentences(transcript, TRANSCRIPT_MAX_TOKENS)}
+
+TRIGGER WORD FOR PERSON: {trigger_word}{face_section}
+
+Generate a viral thumbnail concept that will maximize click-through rate."""
+
+        messages = [{"role": "system", "content": SYSTEM_PROMPT_STATIC}]
+        if style_system:
+            messages.append({"role": "system", "content": style_system.lstrip("\n")})
+        messages.append({"role": "user", "content": user_content})
+        return messages
+
+    def _build_face_section(self, face_description) -> str:
+        """
+        Build the user-message section describing the faces to use.
 
-            else:
-                # Legacy string format
-                face_section = f"""
+        Accepts every shape analyze_face_photos() has produced: a dict with
+        'face_descriptions', an older dict with 'primary_face' and
+        'secondary_faces', or a legacy plain string.
+
+        Args:
+            face_description: Face analysis in any of the shapes above, or None
+
+        Returns:
+            Section text (with leading blank lines), or "" when there are no faces
+        """
+        if not face_description:
+            return ""
+
+        if not isinstance(face_description, dict):
+            # Legacy string format
+            return f"""
 
 ========== FACE TO USE IN THUMBNAIL ==========
 {face_description}
@@ -244,60 +839,72 @@ This face REPLACES the character in the reference format.
 DO NOT copy any person from the reference.
 =============================================="""
 
-        user_content = f"""Analyze this video and create a viral thumbnail concept:
-
-VIDEO TITLE: {video_data.get('title', 'Unknown')}
+        face_descriptions = face_description.get("face_descriptions", [])
+        # Fallback to old format if needed
+        if not face_descriptions and face_description.get("primary_face"):
+            face_descriptions = [face_description["primary_face"], *face_description.get("secondary_faces", [])]
+        if not face_descriptions:
+            return ""
 
-VIDEO DESCRIPTION: {description[:500]}
-
-TAGS: {', '.join(video_data.get('tags', [])[:10])}
+        faces = "".join(
+            f"""
+FACE {i}:
+{face_desc}
+"""
+            for i, face_desc in enumerate(face_descriptions, 1)
+        )
+        return f"""
 
-CHANNEL: {video_data.get('channel', 'Unknown')}
+========== FACES TO USE IN THUMBNAIL ({len(face_descriptions)} people) ==========
+These faces REPLACE the characters in the reference format.
+DO NOT include ANY people from the reference thumbnail - use ONLY these faces.
+{faces}
+==========================================================================
 
-TRANSCRIPT EXCERPT: {transcript[:2000]}
+RULES:
+1. Use ONLY the {len(face_descriptions)} face(s) described above
+2. These faces REPLACE the characters shown in the reference format
+3. DO NOT copy any person from the reference image
+4. Apply the poses/expressions/positions from the reference FORMAT to these faces
+5. If reference has 2 characters and 2 faces provided, Face 1 replaces character 1, Face 2 replaces character 2"""
 
-TRIGGER WORD FOR PERSON: {trigger_word}{face_section}
+    def _parse_result(self, raw_content: Optional[str], video_data: dict) -> dict:
+        """
+        Parse the model's JSON reply, falling back to a generic concept.
 
-Generate a viral thumbnail concept that will maximize click-through rate."""
+        Structured outputs guarantee the schema, so the generic fallback only
+        covers refusals (no content) and replies cut off at max_tokens.
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user_content}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.8,  # Some creativity
-            max_tokens=500,
-        )
+        Args:
+            raw_content: Message content returned by the model
+            video_data: Video data, used for the fallback prompt
 
-        # Parse JSON response with error handling
-        raw_content = response.choices[0].message.content
-        try:
-            # Strip whitespace and parse
-            result = json.loads(raw_content.strip())
-        except json.JSONDecodeError as e:
-            # If JSON parsing fails, try to extract JSON from the response
-            import re
-            json_match = re.search(r'\{[\s\S]*\}', raw_content)
-            if json_match:
-                result = json.loads(json_match.group())
-            else:
-                # Fallback: create a basic response
-                result = {
-                    "prompt": f"A YouTube thumbnail for a video about {video_data.get('title', 'content')}, dramatic lighting, 4k, sharp focus",
-                    "thumbnail_text": "MUST WATCH",
-                    "emotion": "excitement",
-                    "composition": "centered dramatic shot"
-                }
-
-        # Validate required fields
-        required_fields = ["prompt", "thumbnail_text", "emotion", "composition"]
-        for field in required_fields:
-            if field not in result:
-                result[field] = ""
+        Returns:
+            Dictionary with prompt, thumbnail_text, emotion, composition;
+            a FallbackPrompt when the generic concept was used
 
-        return result
+        Raises:
+            ValueError: If the reply parsed but lacks a required field
+        """
+        result = parse_json_object(raw_content)
+        if result is not None:
+            # parse_json_object also accepts non-schema objects wrapped in text
+            missing = [field for field in _RESULT_FIELDS if field not in result]
+            if missing:
+                raise ValueError(f"Prompt reply is missing {', '.join(missing)}")
+            return result
+
+        logger.warning("Prompt reply was not valid JSON, using a generic concept")
+        return FallbackPrompt({
+            "prompt": f"A YouTube thumbnail for a video about {video_data.get('title', 'content')}, dramatic lighting, 4k, sharp focus",
+            "thumbnail_text": "MUST WATCH",
+            "emotion": "excitement",
+            "composition": "centered dramatic shot"
+        })
+
+    async def aclose(self) -> None:
+        """Close the shared async client's pooled connections (call once, at shutdown)."""
+        await close_async_client(self.api_key)
 
     def enhance_prompt(
         self,
@@ -316,23 +923,14 @@ Generate a viral thumbnail concept that will maximize click-through rate."""
         Returns:
             Enhanced prompt string
         """
-        enhanced = base_prompt
-
         # Replace generic person references with trigger word
-        enhanced = enhanced.replace("a person", f"a {trigger_word}")
-        enhanced = enhanced.replace("the person", f"the {trigger_word}")
+        enhanced = _PERSON_RE.sub(lambda m: f"{m.group(1)} {trigger_word}", base_prompt)
 
         if add_quality_tokens:
-            quality_tokens = [
-                "4k resolution",
-                "sharp focus",
-                "professional photography",
-                "vibrant colors",
-            ]
-
             # Only add tokens not already present
-            for token in quality_tokens:
-                if token.lower() not in enhanced.lower():
-                    enhanced += f", {token}"
+            lowered = enhanced.lower()
+            missing = [token for token in ENHANCE_QUALITY_TOKENS if token not in lowered]
+            if missing:
+                enhanced = ", ".join([enhanced, *missing])
 
         return enhanced
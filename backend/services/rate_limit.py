@@ -0,0 +1,142 @@
+"""
+Rate Limiting
+Adaptive (AIMD) concurrency limiter and request/token budget for outbound API calls.
+"""
+import asyncio
+import time
+
+
+class AIMDLimiter:
+    """
+    Concurrency limiter that adapts to provider throttling.
+
+    The limit is halved whenever the provider throttles (multiplicative
+    decrease) and grows by a fraction of a slot per successful call (additive
+    increase), so it settles just under the provider's real quota. Throttles
+    within a cooldown of the last decrease belong to the same congestion
+    event (concurrent calls rejected by one burst) and don't halve it again.
+
+    Use as ``async with limiter:`` around each call, then report the outcome
+    with ``await on_success()`` or on_throttle().
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        increase: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial: Starting number of concurrent calls
+            min_limit: Floor the limit never drops below
+            max_limit: Ceiling the limit never grows above
+            increase: Slots added per successful call (applied once whole)
+            cooldown: Seconds after a decrease during which further throttles are ignored
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.cooldown = cooldown
+        self._last_decrease = float("-inf")
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight."""
+        return int(self._limit)
+
+    async def __aenter__(self) -> "AIMDLimiter":
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    async def on_success(self) -> None:
+        """Additively grow the limit after a call the provider accepted."""
+        previous = self.limit
+        self._limit = min(self.max_limit, self._limit + self.increase)
+        if self.limit > previous:
+            # A slot opened up; wake anyone waiting for one
+            async with self._condition:
+                self._condition.notify_all()
+
+    def on_throttle(self) -> None:
+        """Halve the limit after the provider throttled a call, at most once per cooldown."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit / 2)
+
+
+class TokenBucketLimiter:
+    """
+    Per-minute request and token budget for a rate-limited API.
+
+    Two buckets refill continuously at limit/60 units per second, up to one
+    minute's worth. acquire() waits until both hold enough for the call and
+    then spends them, so bursts are smoothed to the provider's RPM/TPM quota
+    instead of being rejected with 429s. Waiters are served in arrival order.
+    A limit of 0 leaves that dimension unlimited.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        """
+        Initialize the limiter with full buckets.
+
+        Args:
+            requests_per_minute: Requests allowed per minute (0 for no limit)
+            tokens_per_minute: Tokens allowed per minute (0 for no limit)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait until there is budget for one request of the given size, then spend it.
+
+        Args:
+            tokens: Estimated tokens the request will consume (capped at one minute's budget)
+        """
+        limit_requests = self.requests_per_minute > 0
+        limit_tokens = self.tokens_per_minute > 0
+        if not (limit_requests or limit_tokens):
+            return
+        tokens = min(tokens, self.tokens_per_minute) if limit_tokens else 0
+        async with self._lock:
+            while True:
+                self._refill()
+                if (not limit_requests or self._requests >= 1) and self._tokens >= tokens:
+                    if limit_requests:
+                        self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                # Sleep just long enough for the emptier bucket to cover the call
+                wait = max(
+                    (1 - self._requests) * 60 / self.requests_per_minute if limit_requests else 0,
+                    (tokens - self._tokens) * 60 / self.tokens_per_minute if limit_tokens else 0,
+                )
+                await asyncio.sleep(wait)
@@ -1,11 +1,33 @@
 """
 Reference Image Analyzer Service
-Uses GPT-4o Vision to analyze reference thumbnails and extract style descriptions.
+Uses OpenAI vision models to analyze reference thumbnails and extract style descriptions.
 """
-import json
-import base64
-from typing import List, Optional
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Literal, Optional
 import openai
+from PIL import Image, ImageOps
+
+from . import openai_batch
+from .base64_codec import (
+    BYTES_LIKE,
+    b64encode_as_string,
+    decode_image_data,
+    sniff_base64_image_type,
+    sniff_image_type,
+)
+from .cache import TTLCache
+from .llm_json import JSONFieldStream, parse_json_object
+from .openai_clients import close_async_client, get_async_client, get_sync_client
+from .rate_limit import AIMDLimiter
+
+logger = logging.getLogger(__name__)
 
 
 ANALYSIS_SYSTEM_PROMPT = """You are an expert YouTube thumbnail FORMAT analyst. Your task is to extract the TEMPLATE/FORMAT from a reference thumbnail - NOT the actual people in it.
@@ -32,80 +54,62 @@ Analyze these FORMAT elements:
 
 OUTPUT FORMAT:
 Return ONLY a valid JSON object with this EXACT structure:
-{{
-    "composition": {{
+{
+    "composition": {
         "layout_type": "split/centered/thirds/etc",
         "person_count": 1,
         "person_positions": ["left 35%", "right 30%"],
         "person_size": "percentage of frame height (e.g., '80%')",
         "background_zones": ["description of each zone from left to right"]
-    }},
-    "pose_format": {{
-        "primary_person": {{
+    },
+    "pose_format": {
+        "primary_person": {
             "position": "left/right/center",
             "pose": "the pose they should strike (e.g., 'leaning forward, pointing')",
             "expression_type": "the expression type (e.g., 'shocked with wide eyes and open mouth')",
             "eye_direction": "looking at camera/looking at content/etc"
-        }},
+        },
         "secondary_people": [
-            {{
+            {
                 "position": "where this person is",
                 "pose": "their pose",
                 "expression_type": "their expression type"
-            }}
+            }
         ]
-    }},
+    },
     "text_elements": [
-        {{
+        {
             "text": "exact text content (for reference only - will be changed)",
             "position": "top/bottom/left/right with specifics",
             "font_style": "bold/italic/etc",
             "font_size": "large/medium/small relative to image",
             "color": "color description or hex",
             "effects": "shadow/outline/glow/none"
-        }}
+        }
     ],
     "graphic_elements": [
-        {{
+        {
             "type": "screenshot/icon/arrow/emoji/etc",
             "content": "what type of content",
             "position": "where in the frame",
             "size": "relative size"
-        }}
+        }
     ],
-    "colors": {{
+    "colors": {
         "primary": "main color",
         "secondary": "secondary color",
         "accent": "accent/highlight color",
         "background": "background color(s)",
         "text_colors": ["list of text colors used"]
-    }},
+    },
     "lighting_style": "description of lighting (e.g., 'dramatic rim lighting from behind')",
     "mood": "overall mood/energy of the thumbnail",
     "format_prompt": "A prompt describing the FORMAT/TEMPLATE only - use [PRIMARY_PERSON] and [SECONDARY_PERSON_N] as placeholders for where the user's faces will go"
-}}
+}
 
 REMEMBER: You are extracting a TEMPLATE. The actual people will come from separate face photos provided by the user. Do NOT copy any person's appearance from the reference."""
 
 
-FACE_ANALYSIS_PROMPT = """Analyze this face photo to create a detailed description for AI image generation.
-
-Describe in detail:
-1. ETHNICITY/SKIN TONE: Specific description (e.g., "Black man with dark brown skin")
-2. FACE SHAPE: Round, oval, square, etc.
-3. FACIAL HAIR: Beard, mustache, clean-shaven, stubble
-4. HAIR: Style, color, length
-5. DISTINCTIVE FEATURES: Any notable features
-6. AGE RANGE: Approximate age
-7. BUILD: If visible, body type
-
-Return a detailed description that can be inserted into an image generation prompt to accurately represent this person. Format as a single descriptive paragraph that starts with the person's ethnicity and key features.
-
-Example output: "A Black man in his 30s with dark brown skin, short black hair, clean-shaven face, oval face shape, confident expression, athletic build"
-
-Be specific and detailed so the AI can accurately generate images of this person."""
-
-
 MULTI_FACE_ANALYSIS_PROMPT = """Analyze these face photos. Each photo is a DIFFERENT person who will appear in the thumbnail.
 
 These faces will REPLACE the characters in a reference thumbnail format.
@@ -142,157 +146,700 @@ IMPORTANT:
 - Be extremely detailed so the AI can accurately generate these specific people"""
 
 
+
+# Structured extraction of layout, colours and faces is well within the mini
+# model's vision ability, and it answers several times faster than gpt-4o
+DEFAULT_VISION_MODEL = "gpt-4o-mini"
+
+# Bump when the analysis prompts change meaningfully, so persisted analyses
+# from the old prompts are no longer served
+ANALYSIS_PROMPT_VERSION = "v3"
+
+
+def _strict_object(properties: dict) -> dict:
+    """JSON schema object for strict structured outputs: every field required, no extras."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": _STRING}
+
+# Schemas mirroring the JSON the analysis prompts describe; strict mode
+# guarantees every field is present with the right type
+REFERENCE_ANALYSIS_SCHEMA = _strict_object({
+    "composition": _strict_object({
+        "layout_type": _STRING,
+        "person_count": {"type": "integer"},
+        "person_positions": _STRING_LIST,
+        "person_size": _STRING,
+        "background_zones": _STRING_LIST,
+    }),
+    "pose_format": _strict_object({
+        "primary_person": _strict_object({
+            "position": _STRING,
+            "pose": _STRING,
+            "expression_type": _STRING,
+            "eye_direction": _STRING,
+        }),
+        "secondary_people": {"type": "array", "items": _strict_object({
+            "position": _STRING,
+            "pose": _STRING,
+            "expression_type": _STRING,
+        })},
+    }),
+    "text_elements": {"type": "array", "items": _strict_object({
+        "text": _STRING,
+        "position": _STRING,
+        "font_style": _STRING,
+        "font_size": _STRING,
+        "color": _STRING,
+        "effects": _STRING,
+    })},
+    "graphic_elements": {"type": "array", "items": _strict_object({
+        "type": _STRING,
+        "content": _STRING,
+        "position": _STRING,
+        "size": _STRING,
+    })},
+    "colors": _strict_object({
+        "primary": _STRING,
+        "secondary": _STRING,
+        "accent": _STRING,
+        "background": _STRING,
+        "text_colors": _STRING_LIST,
+    }),
+    "lighting_style": _STRING,
+    "mood": _STRING,
+    "format_prompt": _STRING,
+})
+
+FACE_ANALYSIS_SCHEMA = _strict_object({
+    "faces": {"type": "array", "items": _strict_object({
+        "index": {"type": "integer"},
+        "description": _STRING,
+    })},
+    "total_faces": {"type": "integer"},
+    "combined_description": _STRING,
+})
+
+_REFERENCE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "reference_analysis", "strict": True, "schema": REFERENCE_ANALYSIS_SCHEMA},
+}
+_FACE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "face_analysis", "strict": True, "schema": FACE_ANALYSIS_SCHEMA},
+}
+
+# Vision detail level: "low" is a single 85-token view of the image, "high"
+# tiles it into 512px patches (several times the input tokens), "auto"
+# lets the API choose from the image size
+ImageDetail = Literal["low", "auto", "high"]
+
+# Images larger than this are downscaled and re-encoded as WebP before upload;
+# the vision model never looks at more than MAX_IMAGE_SIDE pixels per side
+# at the detail levels used here, so the extra bytes only slow the upload
+IMAGE_SHRINK_MIN_BYTES = 256 * 1024
+MAX_IMAGE_SIDE = 1024
+# "low" detail only ever sees a 512px view (face photos), so those shrink further
+LOW_DETAIL_SHRINK_MIN_BYTES = 64 * 1024
+LOW_DETAIL_SIDE = 512
+WEBP_QUALITY = 80
+# Shrunk images kept per analyzer, so a reference reused across requests is
+# only resized once
+IMAGE_CACHE_SIZE = 64
+IMAGE_CACHE_TTL = 3600
+# Async analyses decode and resize their images here, in parallel and off the
+# event loop (Pillow releases the GIL while decoding); shared by all analyzers
+_DECODE_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="decode")
+
+# Placeholders a reference format_prompt may use for faces and the topic
+_PLACEHOLDER_RE = re.compile(
+    r"\[(FACE_\d+|PERSON_\d+|SECONDARY_PERSON_\d+|PRIMARY_PERSON|PERSON_DESCRIPTION|VIDEO_TOPIC)\]"
+)
+
+# Output budgets, sized from the JSON each prompt asks for with ~20% headroom:
+# a fully filled reference analysis runs to ~1000 tokens, a face
+# description to ~100. Unused budget is free, but a runaway reply is not.
+REFERENCE_MAX_TOKENS = 1200
+FACE_MAX_TOKENS_BASE = 150
+FACE_MAX_TOKENS_PER_FACE = 120
+# From this many faces the async path describes each photo in its own
+# concurrent call: long multi-face replies risk truncation and mixing up
+# who is who, and N small calls finish about as fast as one
+FACE_FANOUT_MIN_FACES = 5
+# JSON replies never contain a blank line, so three newlines only appear
+# when JSON mode starts padding with whitespace after the object
+JSON_STOP = ["\n\n\n"]
+
+# Fixed pieces of every image content part
+_IMAGE_PART = {"type": "image_url"}
+_JPEG_URI_PREFIX = "data:image/jpeg;base64,"
+# Data URI prefix by the first four base64 characters (the encoded magic bytes)
+_BASE64_URI_PREFIXES = {
+    "/9j/": _JPEG_URI_PREFIX,
+    "iVBO": "data:image/png;base64,",
+    "R0lG": "data:image/gif;base64,",
+    "UklG": "data:image/webp;base64,",
+}
+
+
+def _prompt_cache_body(system_prompt: str) -> dict:
+    """Pin calls sharing a static system prompt to one OpenAI prompt cache bucket."""
+    return {"prompt_cache_key": hashlib.md5(system_prompt.encode("utf-8")).hexdigest()}
+
+
+def _log_cache_usage(response) -> None:
+    """Log how much of a call's prompt OpenAI served from its prompt cache."""
+    usage = response.usage
+    details = usage.prompt_tokens_details if usage is not None else None
+    if details is not None:
+        logger.debug(
+            "Vision call used %d prompt tokens, %d cached", usage.prompt_tokens, details.cached_tokens or 0
+        )
+
+
+_ANALYSIS_CACHE_BODY = _prompt_cache_body(ANALYSIS_SYSTEM_PROMPT)
+_MULTI_FACE_CACHE_BODY = _prompt_cache_body(MULTI_FACE_ANALYSIS_PROMPT)
+# Built once and shared by every request; the SDK only reads message dicts
+_ANALYSIS_SYSTEM_MESSAGE = {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT}
+_MULTI_FACE_SYSTEM_MESSAGE = {"role": "system", "content": MULTI_FACE_ANALYSIS_PROMPT}
+
+
+def _shrink_image(image_data, max_side: int) -> Optional[str]:
+    """
+    Downscale an image to fit max_side and re-encode it as WebP.
+
+    Args:
+        image_data: Base64 string, data URI, or raw image bytes
+        max_side: Longest side of the result, in pixels
+
+    Returns:
+        WebP data URI, or None if the image can't be decoded or doesn't get smaller
+    """
+    raw = bytes(image_data) if isinstance(image_data, BYTES_LIKE) else decode_image_data(image_data)
+    try:
+        img = Image.open(io.BytesIO(raw))
+        # JPEGs decode straight at a reduced scale, skipping most of the work
+        img.draft("RGB", (max_side, max_side))
+        # WebP re-encoding drops the EXIF Orientation tag, so rotate phone photos upright first
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        buf = io.BytesIO()
+        img.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.debug("Sending image unmodified, could not shrink it: %s", e)
+        return None
+
+    if buf.tell() >= len(raw):
+        return None
+    return f"data:image/webp;base64,{b64encode_as_string(buf.getbuffer())}"
+
+
 class ReferenceAnalyzer:
-    """Analyzes reference thumbnails and face photos using GPT-4o Vision."""
+    """Analyzes reference thumbnails and face photos using OpenAI vision models."""
 
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = DEFAULT_VISION_MODEL,
+        shadow_model: Optional[str] = None,
+        max_concurrency: int = 20,
+        auto_downscale: bool = True,
+    ):
         """
         Initialize the reference analyzer.
 
         Args:
             api_key: OpenAI API key
             model: Model to use (must support vision)
+            shadow_model: Optional second model every async analysis is re-run
+                on in the background, logging where its answer differs. For
+                comparing models during a rollout; doubles the vision calls.
+            max_concurrency: Most async vision calls in flight at once; halved
+                whenever OpenAI still rate limits after the SDK's retries
+            auto_downscale: Shrink large images to the size the model actually
+                looks at before upload; disable to send images untouched
         """
-        self.client = openai.OpenAI(api_key=api_key)
+        self.api_key = api_key
+        # Pooled clients shared with PromptGenerator; the async one keeps the SDK's default retries
+        self.client = get_sync_client(api_key)
+        self.async_client = get_async_client(api_key).with_options(max_retries=openai.DEFAULT_MAX_RETRIES)
         self.model = model
+        self.shadow_model = shadow_model
+        # Persisted analyses are only reused for the model that produced them
+        self.prompt_version = f"{ANALYSIS_PROMPT_VERSION}:{model}"
+        self.auto_downscale = auto_downscale
+        self._shrunk_images = TTLCache(maxsize=IMAGE_CACHE_SIZE, ttl=IMAGE_CACHE_TTL)
+        self._shadow_tasks = set()
+        self._limiter = AIMDLimiter(initial=max_concurrency, max_limit=max_concurrency)
+
+    async def aclose(self) -> None:
+        """Cancel pending shadow analyses and close the async client's pooled connections."""
+        for task in self._shadow_tasks:
+            task.cancel()
+        await close_async_client(self.api_key)
+
+    def _start_shadow(self, request: dict, result: dict, parse) -> None:
+        """
+        Re-run an analysis on the shadow model without delaying the caller.
+
+        Args:
+            request: Chat completion arguments the result came from
+            result: Parsed result from the primary model
+            parse: Parser that produced result
+        """
+        if not self.shadow_model:
+            return
+        task = asyncio.create_task(self._compare_shadow(request, result, parse))
+        # Hold a reference until done so the task is not garbage collected
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    async def _compare_shadow(self, request: dict, result: dict, parse) -> None:
+        """Run request on the shadow model and log the fields whose values differ."""
+        try:
+            response = await self._acreate({**request, "model": self.shadow_model})
+            shadow = parse(response.choices[0].message.content)
+        except (openai.OpenAIError, ValueError) as e:
+            logger.warning("Shadow analysis with %s failed: %s", self.shadow_model, e)
+            return
+
+        differing = sorted(key for key in result.keys() | shadow.keys() if result.get(key) != shadow.get(key))
+        if not differing:
+            logger.info("Shadow analysis with %s matches %s", self.shadow_model, self.model)
+            return
+        logger.info("Shadow analysis with %s differs from %s on: %s", self.shadow_model, self.model, ", ".join(differing))
+        for key in differing:
+            logger.debug("  %s: %r (%s) vs %r (%s)", key, result.get(key), self.model, shadow.get(key), self.shadow_model)
+
+    async def _acreate(self, request: dict):
+        """
+        Make an async chat completion call within the concurrency limit.
+
+        Args:
+            request: Keyword arguments for chat.completions.create
 
-    def _prepare_image_content(self, image_data: str) -> dict:
+        Returns:
+            The chat completion
+
+        Raises:
+            openai.RateLimitError: If OpenAI kept rate limiting through the SDK's retries
+        """
+        async with self._limiter:
+            try:
+                response = await self.async_client.chat.completions.create(**request)
+            except openai.RateLimitError:
+                self._limiter.on_throttle()
+                raise
+        await self._limiter.on_success()
+        _log_cache_usage(response)
+        return response
+
+    def _prepare_image_content(self, image_data, detail: ImageDetail = "auto") -> dict:
         """
         Prepare image data for the OpenAI API.
 
         Args:
-            image_data: Base64 encoded image (with or without data URI prefix)
+            image_data: Base64 encoded image (with or without data URI prefix),
+                or raw image bytes from a multipart upload
+            detail: Vision detail level
 
         Returns:
             Image content dict for OpenAI API
         """
-        # Handle data URI format
-        if image_data.startswith('data:'):
-            # Extract the base64 part
-            return {
-                "type": "image_url",
-                "image_url": {
-                    "url": image_data,
-                    "detail": "high"
-                }
-            }
-        else:
-            # Assume it's raw base64, add data URI prefix
-            # Try to detect image type from base64 header
-            if image_data.startswith('/9j/'):
-                media_type = 'image/jpeg'
-            elif image_data.startswith('iVBOR'):
-                media_type = 'image/png'
+        url = self._shrunk_image_url(image_data, detail) if self.auto_downscale else None
+        if url is None:
+            if isinstance(image_data, BYTES_LIKE):
+                # Raw upload: the API only takes base64, so encode exactly once here
+                url = f"data:{sniff_image_type(image_data)};base64,{b64encode_as_string(image_data)}"
             else:
-                media_type = 'image/jpeg'  # Default to JPEG
-
-            return {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:{media_type};base64,{image_data}",
-                    "detail": "high"
-                }
-            }
+                # Only the first few characters identify a data URI or image type
+                if image_data[:5] == "data:":
+                    url = image_data
+                else:
+                    prefix = _BASE64_URI_PREFIXES.get(image_data[:4])
+                    if prefix is None:
+                        # Rarer formats: match the decoded header, sending anything unrecognised as JPEG
+                        prefix = f"data:{sniff_base64_image_type(image_data, 'image/jpeg')};base64,"
+                    url = prefix + image_data
+
+        return {**_IMAGE_PART, "image_url": {"url": url, "detail": detail}}
+
+    def _shrunk_image_url(self, image_data, detail: ImageDetail) -> Optional[str]:
+        """
+        Return a downscaled WebP data URI for a large image, cached by content hash.
+
+        Args:
+            image_data: As for _prepare_image_content
+            detail: Vision detail level the image is sent at
+
+        Returns:
+            Data URI, or None to send the image as given
+        """
+        key = self._shrink_key(image_data, detail)
+        if key is None:
+            return None
+        shrunk = self._shrunk_images.get(key)
+        if shrunk is None:
+            # "" records an image that doesn't shrink, so it isn't retried
+            shrunk = _shrink_image(image_data, key[1]) or ""
+            self._shrunk_images.set(key, shrunk)
+        return shrunk or None
+
+    @staticmethod
+    def _shrink_key(image_data, detail: ImageDetail) -> Optional[tuple]:
+        """Cache key (content hash, max side) for an image worth shrinking, or None if it's small enough."""
+        if detail == "low":
+            max_side, min_bytes = LOW_DETAIL_SIDE, LOW_DETAIL_SHRINK_MIN_BYTES
+        else:
+            max_side, min_bytes = MAX_IMAGE_SIDE, IMAGE_SHRINK_MIN_BYTES
+
+        is_raw = isinstance(image_data, BYTES_LIKE)
+        # Base64 carries 3 bytes per 4 characters; small images skip hashing entirely
+        size = len(image_data) if is_raw else len(image_data) * 3 // 4
+        if size < min_bytes:
+            return None
+        return (hashlib.sha256(image_data if is_raw else image_data.encode("ascii", "replace")).digest(), max_side)
+
+    async def _ashrink_images(self, images: Iterable, detail: ImageDetail) -> list:
+        """
+        Shrink the images an async analysis will send, in parallel on the decode pool.
+
+        The results go into the shrunk-image cache, so building the request
+        afterwards only does cache lookups on the event loop.
+
+        Args:
+            images: As for analyze_reference_thumbnails or analyze_face_photos
+            detail: Vision detail level the images are sent at
+
+        Returns:
+            The images as a list, ready to build the request from
+        """
+        images = list(images)
+        if not self.auto_downscale:
+            return images
+
+        pending = {}
+        for image in images:
+            data, _ = self._image_fields(image)
+            key = self._shrink_key(data, detail)
+            if key is not None and key not in pending and self._shrunk_images.get(key) is None:
+                pending[key] = data
+        if not pending:
+            return images
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(_DECODE_POOL, _shrink_image, data, key[1]) for key, data in pending.items())
+        )
+        # Cache writes stay on the event loop thread; TTLCache isn't thread-safe
+        for key, shrunk in zip(pending, results):
+            self._shrunk_images.set(key, shrunk or "")
+        return images
+
+    @staticmethod
+    def _image_fields(image) -> tuple:
+        """Return (data, description) from base64/bytes, a dict, or a model with .data."""
+        if isinstance(image, (str, *BYTES_LIKE)):
+            return image, None
+        if isinstance(image, dict):
+            return image.get("data"), image.get("description")
+        return image.data, getattr(image, "description", None)
 
     def analyze_reference_thumbnails(
         self,
-        reference_images: List[dict],
+        reference_images: Iterable,
+        detail: ImageDetail = "auto",
     ) -> dict:
         """
         Analyze multiple reference thumbnails to extract style information.
 
+        Blocking; async callers should use aanalyze_reference_thumbnails.
+
         Args:
-            reference_images: List of dicts with 'data' (base64) and optional 'description'
+            reference_images: Base64 strings, or dicts/models with 'data' (base64)
+                and optional 'description'. Consumed in a single pass.
+            detail: Vision detail level; layout and colour analysis rarely needs "high"
 
         Returns:
             Dictionary with style analysis
+
+        Raises:
+            ValueError: If the model refused or its reply was cut off
         """
-        if not reference_images:
-            return {
-                "style_description": "No reference thumbnails provided",
-                "common_elements": [],
-                "color_palette": "Default vibrant colors",
-                "composition_style": "Standard thumbnail composition",
-                "text_style": None,
-                "recommendations": "Use standard viral thumbnail practices"
-            }
+        request = self._reference_request(reference_images, detail)
+        if request is None:
+            return self._no_reference_analysis()
+        response = self.client.chat.completions.create(**request)
+        _log_cache_usage(response)
+        return self._parse_reference_analysis(response.choices[0].message.content)
+
+    async def aanalyze_reference_thumbnails(
+        self,
+        reference_images: Iterable,
+        detail: ImageDetail = "auto",
+    ) -> dict:
+        """
+        Analyze reference thumbnails without blocking the event loop.
 
-        # Build content array with all images
-        content = [
-            {
-                "type": "text",
-                "text": f"Analyze these {len(reference_images)} reference YouTube thumbnails and extract the style information:"
-            }
-        ]
+        Args:
+            reference_images: Base64 strings, or dicts/models with 'data' (base64)
+                and optional 'description'. Consumed in a single pass.
+            detail: Vision detail level; layout and colour analysis rarely needs "high"
+
+        Returns:
+            Dictionary with style analysis
+
+        Raises:
+            ValueError: If the model refused or its reply was cut off
+        """
+        reference_images = await self._ashrink_images(reference_images, detail)
+        request = self._reference_request(reference_images, detail)
+        if request is None:
+            return self._no_reference_analysis()
+        response = await self._acreate(request)
+        result = self._parse_reference_analysis(response.choices[0].message.content)
+        self._start_shadow(request, result, self._parse_reference_analysis)
+        return result
+
+    async def astream_reference_analysis(
+        self,
+        reference_images: Iterable,
+        detail: ImageDetail = "auto",
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a reference analysis, yielding each top-level field as soon as the model finishes it.
+
+        Yields ``{"partial": {field: value}}`` once per completed field, in
+        schema order (format_prompt last), then the full analysis (the same
+        value aanalyze_reference_thumbnails returns) as the final item.
+        Callers needing only the early fields can stop iterating, which
+        closes the stream and skips generating the rest.
+
+        Args:
+            reference_images: As for analyze_reference_thumbnails
+            detail: Vision detail level
+
+        Yields:
+            Partial field events, then the complete analysis dictionary
+
+        Raises:
+            ValueError: If the model refused or its reply was cut off
+        """
+        reference_images = await self._ashrink_images(reference_images, detail)
+        request = self._reference_request(reference_images, detail)
+        if request is None:
+            yield self._no_reference_analysis()
+            return
+
+        fields = JSONFieldStream()
+        chunks = []
+        # The slot is held until the stream ends, since the model is generating until then
+        async with self._limiter:
+            try:
+                stream = await self.async_client.chat.completions.create(**request, stream=True)
+            except openai.RateLimitError:
+                self._limiter.on_throttle()
+                raise
+            try:
+                async for chunk in stream:
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    chunks.append(chunk.choices[0].delta.content)
+                    for key, value in fields.feed(chunks[-1]):
+                        yield {"partial": {key: value}}
+            finally:
+                await stream.close()
+        await self._limiter.on_success()
+
+        yield self._parse_reference_analysis("".join(chunks))
+
+    def _reference_request(self, reference_images: Iterable, detail: ImageDetail) -> Optional[dict]:
+        """
+        Build the chat completion arguments for a reference analysis.
+
+        Args:
+            reference_images: As for analyze_reference_thumbnails
+            detail: Vision detail level
+
+        Returns:
+            Keyword arguments for chat.completions.create, or None if there are no images
+        """
+        content = []
+        num_images = 0
 
         for i, ref in enumerate(reference_images):
+            data, description = self._image_fields(ref)
+
             # Add the image
-            content.append(self._prepare_image_content(ref.get('data', ref) if isinstance(ref, dict) else ref))
+            content.append(self._prepare_image_content(data, detail))
 
             # Add user description if provided
-            if isinstance(ref, dict) and ref.get('description'):
+            if description:
                 content.append({
                     "type": "text",
-                    "text": f"User note for image {i + 1}: {ref['description']}"
+                    "text": f"User note for image {i + 1}: {description}"
                 })
-
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            num_images += 1
+
+        if not num_images:
+            return None
+
+        # The instruction varies with the image count, so it goes last: the
+        # static system prompt and schema stay the start of every request,
+        # which is the prefix OpenAI's prompt cache matches on
+        content.append({
+            "type": "text",
+            "text": f"Analyze the {num_images} reference YouTube thumbnails above and extract the style information."
+        })
+
+        return {
+            "model": self.model,
+            "messages": [
+                _ANALYSIS_SYSTEM_MESSAGE,
                 {"role": "user", "content": content}
             ],
-            response_format={"type": "json_object"},
-            max_tokens=2000,  # Increased for detailed JSON
-            temperature=0.2,  # Lower for more precise analysis
-        )
+            "response_format": _REFERENCE_RESPONSE_FORMAT,
+            "max_tokens": REFERENCE_MAX_TOKENS,
+            "stop": JSON_STOP,
+            "temperature": 0.2,  # Lower for more precise analysis
+            "extra_body": _ANALYSIS_CACHE_BODY,
+        }
 
-        raw_content = response.choices[0].message.content
-        print(f"[DEBUG] Reference analysis result: {raw_content[:500]}...")
+    @staticmethod
+    def _no_reference_analysis() -> dict:
+        """Analysis returned when no reference thumbnails were given."""
+        return {
+            "style_description": "No reference thumbnails provided",
+            "common_elements": [],
+            "color_palette": "Default vibrant colors",
+            "composition_style": "Standard thumbnail composition",
+            "text_style": None,
+            "recommendations": "Use standard viral thumbnail practices"
+        }
 
-        try:
-            result = json.loads(raw_content.strip())
-        except json.JSONDecodeError:
-            # Fallback response with new structure
-            result = {
-                "composition": {
-                    "layout_type": "split",
-                    "person_position": "left 35%",
-                    "person_size": "80%",
-                    "background_zones": ["person area", "content area"]
-                },
-                "person": {
-                    "pose": "facing camera",
-                    "expression": "engaging",
-                    "eye_direction": "looking at camera",
-                    "clothing": "casual",
-                    "lighting_on_face": "soft front lighting"
-                },
-                "text_elements": [],
-                "graphic_elements": [],
-                "colors": {
-                    "primary": "white",
-                    "secondary": "black",
-                    "accent": "yellow",
-                    "background": "white",
-                    "text_colors": ["black", "yellow"]
-                },
-                "mood": "energetic and professional",
-                "recreation_prompt": "Generate a YouTube thumbnail with person on left, content on right"
-            }
+    @staticmethod
+    def _parse_reference_analysis(raw_content: str) -> dict:
+        """
+        Parse the model's reference analysis.
+
+        Structured outputs guarantee the schema, so this only fails on
+        refusals (no content) and replies cut off at max_tokens. Those raise
+        rather than returning a made-up format that callers would cache.
+
+        Args:
+            raw_content: Message content returned by the model
 
+        Returns:
+            Dictionary with style analysis
+
+        Raises:
+            ValueError: If the reply holds no JSON object
+        """
+        logger.debug("Reference analysis result: %.500s...", raw_content)
+
+        result = parse_json_object(raw_content)
+        if result is None:
+            raise ValueError("Reference analysis reply was not valid JSON")
         return result
 
+    def submit_batch(self, reference_sets: Dict[str, Iterable], detail: ImageDetail = "auto") -> str:
+        """
+        Submit reference analyses to the OpenAI Batch API.
+
+        Batch jobs cost half as much as interactive calls and complete
+        within 24 hours, for offline work such as re-analysing a library of
+        saved references after the analysis prompt changes.
+
+        Args:
+            reference_sets: Reference images (as for analyze_reference_thumbnails)
+                keyed by a unique item ID; sets with no images are skipped
+            detail: Vision detail level
+
+        Returns:
+            Batch ID to pass to collect_batch or poll_batch
+
+        Raises:
+            ValueError: If no set has any images
+        """
+        requests = {}
+        for item_id, reference_images in reference_sets.items():
+            request = self._reference_request(reference_images, detail)
+            if request is not None:
+                requests[item_id] = request
+        return openai_batch.submit_batch(self.client, requests, "references.jsonl", "reference analysis")
+
+    def collect_batch(self, batch_id: str) -> Dict[str, dict]:
+        """
+        Wait for a batch submitted with submit_batch and parse its analyses.
+
+        Blocks, polling with exponential backoff, until the batch finishes.
+
+        Args:
+            batch_id: ID returned by submit_batch
+
+        Returns:
+            Style analyses keyed by item ID; failed or unparseable requests are omitted
+
+        Raises:
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        contents = openai_batch.collect_batch(self.client, batch_id, "reference analysis")
+        return self._parse_batch(batch_id, contents)
+
+    def poll_batch(self, batch_id: str) -> Optional[Dict[str, dict]]:
+        """
+        Check a batch once, without waiting, and parse its analyses if it has finished.
+
+        Suits job queues that re-check on their own schedule instead of
+        blocking a worker in collect_batch.
+
+        Args:
+            batch_id: ID returned by submit_batch
+
+        Returns:
+            Style analyses keyed by item ID (failed or unparseable requests
+            omitted), or None while the batch is still running
+
+        Raises:
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        contents = openai_batch.poll_batch(self.client, batch_id, "reference analysis")
+        return None if contents is None else self._parse_batch(batch_id, contents)
+
+    def _parse_batch(self, batch_id: str, contents: Dict[str, Optional[str]]) -> Dict[str, dict]:
+        """Parse batch replies keyed by item ID, dropping refusals and cut-off replies."""
+        results = {}
+        for item_id, content in contents.items():
+            try:
+                results[item_id] = self._parse_reference_analysis(content)
+            except ValueError as e:
+                logger.warning("Dropping reference analysis %s from batch %s: %s", item_id, batch_id, e)
+        return results
+
     def analyze_face_photos(
         self,
-        face_images: List[str],
+        face_images: Iterable,
+        detail: ImageDetail = "low",
     ) -> dict:
         """
         Analyze ALL face photos individually and generate descriptions for each.
         All faces are treated equally - they will replace characters in the reference format.
 
+        Blocking; async callers should use aanalyze_face_photos.
+
         Args:
-            face_images: List of base64 encoded face photos
+            face_images: Base64 encoded face photos, or models with .data.
+                Consumed in a single pass.
+            detail: Vision detail level; "low" is enough to describe a face
 
         Returns:
             Dictionary with individual face descriptions:
@@ -306,50 +853,134 @@ class ReferenceAnalyzer:
                 "face_descriptions": ["desc1", "desc2"]  # Simple list for easy access
             }
         """
-        if not face_images:
-            return {
-                "faces": [],
-                "total_faces": 0,
-                "combined_description": "",
-                "face_descriptions": []
-            }
+        request = self._face_request(face_images, detail)
+        if request is None:
+            return self._no_face_analysis()
+        response = self.client.chat.completions.create(**request)
+        _log_cache_usage(response)
+        return self._parse_face_analysis(response.choices[0].message.content)
+
+    async def aanalyze_face_photos(
+        self,
+        face_images: Iterable,
+        detail: ImageDetail = "low",
+        fanout: bool = True,
+    ) -> dict:
+        """
+        Analyze face photos without blocking the event loop.
+
+        Args:
+            face_images: Base64 encoded face photos, or models with .data.
+                Consumed in a single pass.
+            detail: Vision detail level; "low" is enough to describe a face
+            fanout: Describe each photo in its own call once there are
+                FACE_FANOUT_MIN_FACES or more; False always sends one call
+
+        Returns:
+            Dictionary with individual face descriptions (see analyze_face_photos).
+            When fanned out, a photo that got no description has "".
+        """
+        face_images = await self._ashrink_images(face_images, detail)
+        if fanout and len(face_images) >= FACE_FANOUT_MIN_FACES:
+            descriptions = await asyncio.gather(
+                *(self._adescribe_face(face_image, detail) for face_image in face_images)
+            )
+            return self.face_analysis_from_descriptions(descriptions)
+
+        request = self._face_request(face_images, detail)
+        if request is None:
+            return self._no_face_analysis()
+        response = await self._acreate(request)
+        result = self._parse_face_analysis(response.choices[0].message.content)
+        self._start_shadow(request, result, self._parse_face_analysis)
+        return result
 
+    async def _adescribe_face(self, face_image, detail: ImageDetail) -> str:
+        """Describe one face photo with its own request ("" if the model gave no description)."""
+        request = self._face_request([face_image], detail)
+        response = await self._acreate(request)
+        descriptions = self._parse_face_analysis(response.choices[0].message.content)["face_descriptions"]
+        return descriptions[0] if descriptions else ""
+
+    def _face_request(self, face_images: Iterable, detail: ImageDetail) -> Optional[dict]:
+        """
+        Build the chat completion arguments for a face analysis.
+
+        All faces go in one labeled request, so N photos cost one call.
+
+        Args:
+            face_images: As for analyze_face_photos
+            detail: Vision detail level
+
+        Returns:
+            Keyword arguments for chat.completions.create, or None if there are no photos
+        """
         # Build content with ALL face images labeled
-        content = [
-            {
-                "type": "text",
-                "text": f"Analyze these {len(face_images)} face photos. Each is a DIFFERENT person who will appear in the thumbnail:"
-            }
-        ]
+        content = []
+        num_faces = 0
 
         for i, face_image in enumerate(face_images):
+            data, _ = self._image_fields(face_image)
             content.append({
                 "type": "text",
                 "text": f"\n--- FACE PHOTO {i + 1} ---"
             })
-            content.append(self._prepare_image_content(face_image))
-
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": MULTI_FACE_ANALYSIS_PROMPT},
+            content.append(self._prepare_image_content(data, detail))
+            num_faces += 1
+
+        if not num_faces:
+            return None
+
+        # Count-dependent instruction last, as for reference analyses
+        content.append({
+            "type": "text",
+            "text": f"Analyze the {num_faces} face photos above. Each is a DIFFERENT person who will appear in the thumbnail."
+        })
+
+        return {
+            "model": self.model,
+            "messages": [
+                _MULTI_FACE_SYSTEM_MESSAGE,
                 {"role": "user", "content": content}
             ],
-            response_format={"type": "json_object"},
-            max_tokens=1000,
-            temperature=0.3,
-        )
+            "response_format": _FACE_RESPONSE_FORMAT,
+            "max_tokens": FACE_MAX_TOKENS_BASE + FACE_MAX_TOKENS_PER_FACE * num_faces,
+            "stop": JSON_STOP,
+            "temperature": 0.3,
+            "extra_body": _MULTI_FACE_CACHE_BODY,
+        }
 
-        raw_content = response.choices[0].message.content
-        print(f"[DEBUG] Face analysis result: {raw_content[:500]}...")
+    @staticmethod
+    def _no_face_analysis() -> dict:
+        """Analysis returned when no face photos were given."""
+        return {
+            "faces": [],
+            "total_faces": 0,
+            "combined_description": "",
+            "face_descriptions": []
+        }
 
-        try:
-            result = json.loads(raw_content.strip())
-        except json.JSONDecodeError:
-            result = {
-                "faces": [{"index": 1, "description": "A person"}],
-                "combined_description": "A person"
-            }
+    @staticmethod
+    def _parse_face_analysis(raw_content: str) -> dict:
+        """
+        Parse the model's face analysis and add the flattened description fields.
+
+        A refusal or truncated reply yields no descriptions, so callers fall
+        back to their own placeholder for each photo instead of one made-up
+        description being matched (and cached) against the first photo.
+
+        Args:
+            raw_content: Message content returned by the model
+
+        Returns:
+            Dictionary with individual face descriptions
+        """
+        logger.debug("Face analysis result: %.500s...", raw_content)
+
+        result = parse_json_object(raw_content)
+        if result is None:
+            logger.warning("Face analysis reply was not valid JSON")
+            result = {"faces": [], "combined_description": ""}
 
         # Extract face descriptions into a simple list
         faces = result.get("faces", [])
@@ -364,32 +995,68 @@ class ReferenceAnalyzer:
 
         return result
 
-    def analyze_single_face(self, face_image: str) -> str:
+    @staticmethod
+    def face_analysis_from_descriptions(face_descriptions: List[str]) -> dict:
+        """
+        Build a result shaped like analyze_face_photos' from known descriptions.
+
+        Lets callers that cache descriptions per photo reassemble a full analysis.
+
+        Args:
+            face_descriptions: One description per face, in photo order
+
+        Returns:
+            Dictionary with individual face descriptions
+        """
+        return {
+            "faces": [{"index": i, "description": d} for i, d in enumerate(face_descriptions, 1)],
+            "total_faces": len(face_descriptions),
+            "combined_description": " ".join(face_descriptions),
+            "face_descriptions": face_descriptions,
+            "primary_face": face_descriptions[0] if face_descriptions else "",
+            "secondary_faces": face_descriptions[1:],
+        }
+
+    def analyze_faces_batch(self, face_images: List[str], detail: ImageDetail = "low") -> List[str]:
         """
-        Analyze a single face photo (legacy method for backward compatibility).
+        Describe several face photos with one request.
+
+        N faces cost one call (one RPM slot, one system prompt) instead of N.
+
+        Args:
+            face_images: Base64 encoded face photos
+            detail: Vision detail level
+
+        Returns:
+            One description per photo, in input order
+        """
+        descriptions = self.analyze_face_photos(face_images, detail)["face_descriptions"]
+        # Keep the result aligned with the input if the model skipped a face
+        descriptions = descriptions[:len(face_images)]
+        descriptions += ["A person"] * (len(face_images) - len(descriptions))
+        return descriptions
+
+    def analyze_single_face(self, face_image: str, detail: ImageDetail = "low") -> str:
+        """
+        Analyze a single face photo.
+
+        Deprecated: use analyze_face_photos or analyze_faces_batch, which
+        describe every photo in one call. This now goes through the same
+        request instead of a separate single-face prompt.
 
         Args:
             face_image: Base64 encoded face photo
+            detail: Vision detail level
 
         Returns:
             Description string for the face
         """
-        content = [
-            {"type": "text", "text": "Analyze this face photo:"},
-            self._prepare_image_content(face_image)
-        ]
-
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": FACE_ANALYSIS_PROMPT},
-                {"role": "user", "content": content}
-            ],
-            max_tokens=300,
-            temperature=0.3,
+        warnings.warn(
+            "analyze_single_face is deprecated; use analyze_faces_batch",
+            DeprecationWarning,
+            stacklevel=2,
         )
-
-        return response.choices[0].message.content.strip()
+        return self.analyze_faces_batch([face_image], detail)[0]
 
     def generate_style_enhanced_prompt(
         self,
@@ -409,7 +1076,12 @@ class ReferenceAnalyzer:
         Returns:
             Enhanced prompt with format info and ALL faces to use
         """
-        enhanced_prompt = base_prompt
+        # Nothing to add: the common prompt-only case skips all section building
+        if not reference_analysis and not face_description:
+            return base_prompt
+
+        # Prompt sections, joined once at the end
+        parts = [base_prompt]
 
         # Get all face descriptions
         face_descriptions = []
@@ -427,26 +1099,27 @@ class ReferenceAnalyzer:
         if reference_analysis:
             # Use the format_prompt if available
             format_prompt = reference_analysis.get('format_prompt') or reference_analysis.get('recreation_prompt', '')
-            if format_prompt:
-                # Replace placeholders with face descriptions
+            if format_prompt and "[" in format_prompt:
+                # Replace placeholders with face descriptions in one pass;
+                # unknown ones (e.g. a face index with no photo) are left as is
+                subs = {"VIDEO_TOPIC": base_prompt}
                 for i, face_desc in enumerate(face_descriptions):
-                    format_prompt = format_prompt.replace(f'[FACE_{i+1}]', face_desc)
-                    format_prompt = format_prompt.replace(f'[PERSON_{i+1}]', face_desc)
+                    subs[f"FACE_{i + 1}"] = subs[f"PERSON_{i + 1}"] = face_desc
                     # Legacy placeholders
                     if i == 0:
-                        format_prompt = format_prompt.replace('[PRIMARY_PERSON]', face_desc)
-                        format_prompt = format_prompt.replace('[PERSON_DESCRIPTION]', face_desc)
+                        subs["PRIMARY_PERSON"] = subs["PERSON_DESCRIPTION"] = face_desc
                     else:
-                        format_prompt = format_prompt.replace(f'[SECONDARY_PERSON_{i}]', face_desc)
-                format_prompt = format_prompt.replace('[VIDEO_TOPIC]', base_prompt)
-                enhanced_prompt = format_prompt
+                        subs[f"SECONDARY_PERSON_{i}"] = face_desc
+                parts[0] = _PLACEHOLDER_RE.sub(lambda m: subs.get(m.group(1), m.group(0)), format_prompt)
+            elif format_prompt:
+                parts[0] = format_prompt
 
             # Add composition details (FORMAT ONLY)
             composition = reference_analysis.get('composition', {})
             colors = reference_analysis.get('colors', {})
             pose_format = reference_analysis.get('pose_format', {})
 
-            style_addition = f"""
+            parts.append(f"""
 
 === REFERENCE FORMAT (layout/style only - NOT the people) ===
 Layout: {composition.get('layout_type', 'split')}
@@ -460,22 +1133,106 @@ Colors: {colors.get('primary', 'white')}, {colors.get('accent', 'yellow')}, {col
 Lighting: {reference_analysis.get('lighting_style', 'dramatic lighting')}
 Mood: {reference_analysis.get('mood', 'energetic')}
 === END FORMAT ===
-"""
-            enhanced_prompt += style_addition
+""")
 
         # Add face descriptions - these REPLACE characters in the reference format
         if face_descriptions:
-            enhanced_prompt += f"""
+            parts.append(f"""
 
 === FACES TO USE ({len(face_descriptions)} people) ===
 These faces REPLACE the characters in the reference format.
 DO NOT include anyone from the reference - use ONLY these faces.
-"""
-            for i, face_desc in enumerate(face_descriptions):
-                enhanced_prompt += f"""
-FACE {i + 1}:
+""")
+            parts.extend(
+                f"""
+FACE {i}:
 {face_desc}
 """
-            enhanced_prompt += "=== END FACES ==="
+                for i, face_desc in enumerate(face_descriptions, 1)
+            )
+            parts.append("=== END FACES ===")
+
+        return "".join(parts)
+
+
+# Most faces one coalesced vision call describes (the per-request upload limit)
+FACE_BATCH_MAX_FACES = 6
+
 
-        return enhanced_prompt
+class FaceAnalysisBatcher:
+    """
+    Coalesces face photos from concurrent requests into shared vision calls.
+
+    Photos submitted within a short window of each other (or until
+    FACE_BATCH_MAX_FACES are waiting) are described by one multi-face
+    request, so several users' uploads share one system prompt and one
+    round trip instead of one call each. Batches are never fanned out
+    into per-photo calls, whatever FACE_FANOUT_MIN_FACES is.
+    """
+
+    def __init__(self, analyzer: ReferenceAnalyzer, window: float = 0.05, max_faces: int = FACE_BATCH_MAX_FACES):
+        """
+        Initialize the batcher.
+
+        Args:
+            analyzer: Analyzer whose aanalyze_face_photos serves each batch
+            window: Seconds the first waiting photo waits for others to join it
+            max_faces: Batch size that is sent without waiting out the window
+        """
+        self.analyzer = analyzer
+        self.window = window
+        self.max_faces = max_faces
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches = set()
+
+    async def describe(self, face_image) -> Optional[str]:
+        """
+        Describe one face photo as part of the next batch.
+
+        Args:
+            face_image: Base64 encoded face photo, or a model with .data
+
+        Returns:
+            Description of the face, or None if the model did not describe
+            every photo in the batch (so descriptions may not line up)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((face_image, future))
+        if len(self._pending) >= self.max_faces:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send every waiting photo as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            # Hold a reference until done so the task is not garbage collected
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run(self, batch: List[tuple]) -> None:
+        """Describe a batch and hand each caller its photo's description."""
+        try:
+            # Coalescing is the point, so don't let a full batch split back into per-photo calls
+            analysis = await self.analyzer.aanalyze_face_photos([face for face, _ in batch], fanout=False)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        descriptions = analysis["face_descriptions"]
+        if len(descriptions) != len(batch):
+            logger.warning("Face batch of %d came back with %d descriptions", len(batch), len(descriptions))
+            descriptions = [None] * len(batch)
+        for (_, future), description in zip(batch, descriptions):
+            if not future.done():
+                future.set_result(description)
@@ -2,12 +2,62 @@
 Text Overlay Service
 Adds professional text overlays to thumbnail images using Pillow.
 """
-import base64
 import io
+import math
 import os
-from typing import Optional, Tuple, List
+from functools import lru_cache
+from typing import Optional, Tuple, List, Union
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 
+from .base64_codec import b64encode_as_string, decode_image_data
+
+# Most (fonts dir, font, size) combinations kept loaded. Every distinct size
+# is its own FreeType face, so an unbounded cache grows with each custom size.
+FONT_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(fonts_dir: Optional[str], font_names: Tuple[str, ...], size: int) -> ImageFont.FreeTypeFont:
+    """
+    Load the first available font, trying fonts_dir before system fonts.
+
+    Args:
+        fonts_dir: Directory containing custom fonts (optional)
+        font_names: Font names in order of preference
+        size: Font size in pixels
+
+    Returns:
+        The loaded font, DejaVu Sans Bold, or Pillow's default font
+    """
+    for font_name in font_names:
+        # Try custom fonts directory first
+        if fonts_dir:
+            for ext in [".ttf", ".otf"]:
+                font_path = os.path.join(fonts_dir, f"{font_name}{ext}")
+                if os.path.exists(font_path):
+                    try:
+                        return ImageFont.truetype(font_path, size)
+                    except Exception:
+                        continue
+
+        # Try system fonts
+        try:
+            return ImageFont.truetype(font_name, size)
+        except Exception:
+            continue
+
+    # Fallback to default
+    try:
+        return ImageFont.truetype("DejaVuSans-Bold.ttf", size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+def _parse_hex_color(hex_color: str) -> Tuple[int, int, int]:
+    """Convert a "#RRGGBB" color to an RGB tuple."""
+    hex_color = hex_color.lstrip("#")
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
 
 class TextOverlayService:
     """Adds professional text overlays to thumbnail images."""
@@ -65,6 +115,12 @@ class TextOverlayService:
         },
     }
 
+    # COLOR_PRESETS as RGB tuples, parsed once when the class is created
+    _PRESET_RGB = {
+        name: {role: _parse_hex_color(value) for role, value in preset.items()}
+        for name, preset in COLOR_PRESETS.items()
+    }
+
     # Position presets
     POSITION_PRESETS = {
         "top_left": (0.05, 0.1),
@@ -76,66 +132,80 @@ class TextOverlayService:
         "bottom_right": (0.95, 0.85),
     }
 
-    def __init__(self, fonts_dir: Optional[str] = None):
+    # Output encodings: Pillow format, MIME type, save options. JPEG is the
+    # default because YouTube takes JPG/PNG/GIF thumbnails up to 2MB, and a
+    # photographic 1280x720 PNG is several times larger and slower to encode.
+    OUTPUT_FORMATS = {
+        "jpeg": ("JPEG", "image/jpeg", {"quality": 92}),
+        "webp": ("WEBP", "image/webp", {"quality": 90, "method": 4}),
+        "png": ("PNG", "image/png", {}),
+    }
+
+    def __init__(self, fonts_dir: Optional[str] = None, output_format: str = "jpeg"):
         """
         Initialize the text overlay service.
 
         Args:
             fonts_dir: Directory containing custom fonts (optional)
+            output_format: Encoding of returned data URIs: "jpeg", "webp" or "png"
+
+        Raises:
+            ValueError: If output_format is not supported
         """
+        if output_format not in self.OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
         self.fonts_dir = fonts_dir or os.path.join(
             os.path.dirname(__file__), "..", "assets", "fonts"
         )
-        self._font_cache = {}
+        self.output_format = output_format
+
+        # Load the default font at each size auto-sizing picks for a 720p
+        # thumbnail (short, 21+ and 31+ characters) so requests don't wait on it
+        for text_length in (1, 21, 31):
+            self._get_font("impact", self._auto_font_size(text_length, 720))
 
     def _get_font(self, preset: str, size: int) -> ImageFont.FreeTypeFont:
         """Get a font with fallback support."""
-        cache_key = f"{preset}_{size}"
-        if cache_key in self._font_cache:
-            return self._font_cache[cache_key]
-
         font_config = self.FONT_PRESETS.get(preset, self.FONT_PRESETS["impact"])
-        font_names = [font_config["family"]] + font_config["fallbacks"]
-
-        font = None
-        for font_name in font_names:
-            # Try custom fonts directory first
-            if self.fonts_dir:
-                for ext in [".ttf", ".otf"]:
-                    font_path = os.path.join(self.fonts_dir, f"{font_name}{ext}")
-                    if os.path.exists(font_path):
-                        try:
-                            font = ImageFont.truetype(font_path, size)
-                            break
-                        except Exception:
-                            continue
-
-            # Try system fonts
-            if font is None:
-                try:
-                    font = ImageFont.truetype(font_name, size)
-                    break
-                except Exception:
-                    continue
-
-        # Fallback to default
-        if font is None:
-            try:
-                font = ImageFont.truetype("DejaVuSans-Bold.ttf", size)
-            except Exception:
-                font = ImageFont.load_default()
-
-        self._font_cache[cache_key] = font
-        return font
+        return _load_font(self.fonts_dir, (font_config["family"], *font_config["fallbacks"]), size)
+
+    @staticmethod
+    def _auto_font_size(text_length: int, height: int) -> int:
+        """Font size for text of text_length characters on an image height pixels tall."""
+        # Dynamic sizing based on text length and image size
+        base_size = int(height * 0.12)  # 12% of height as base
+        # Reduce size for longer text
+        if text_length > 20:
+            base_size = int(base_size * 0.8)
+        if text_length > 30:
+            base_size = int(base_size * 0.7)
+        return max(base_size, 24)
+
+    def _load_image(self, image_data: Union[str, bytes, Image.Image], mode: str = "RGBA") -> Image.Image:
+        """Open a base64 string/data URI, raw bytes, or PIL image as a new image in mode."""
+        if isinstance(image_data, Image.Image):
+            return image_data.convert(mode)
+
+        if isinstance(image_data, str):
+            image_data = decode_image_data(image_data)
+
+        return Image.open(io.BytesIO(image_data)).convert(mode)
+
+    def _encode_image(self, image: Image.Image) -> str:
+        """Encode an RGB image as a data URI in the configured output format."""
+        pil_format, mime_type, options = self.OUTPUT_FORMATS[self.output_format]
+        buffer = io.BytesIO()
+        image.save(buffer, format=pil_format, **options)
+
+        return f"data:{mime_type};base64,{b64encode_as_string(buffer.getbuffer())}"
 
     def _hex_to_rgb(self, hex_color: str) -> Tuple[int, int, int]:
         """Convert hex color to RGB tuple."""
-        hex_color = hex_color.lstrip("#")
-        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+        return _parse_hex_color(hex_color)
 
     def add_text(
         self,
-        image_data: str,
+        image_data: Union[str, bytes, Image.Image],
         text: str,
         position: str = "bottom_center",
         font_preset: str = "impact",
@@ -151,7 +221,7 @@ class TextOverlayService:
         Add text overlay to an image.
 
         Args:
-            image_data: Base64 encoded image or data URI
+            image_data: Base64 encoded image or data URI (or raw bytes / PIL image)
             text: Text to add
             position: Position preset name
             font_preset: Font style preset
@@ -166,38 +236,67 @@ class TextOverlayService:
         Returns:
             Base64 encoded image with text overlay
         """
-        # Decode the image
-        if image_data.startswith("data:"):
-            image_data = image_data.split(",")[1]
+        image = self._add_text_to_image(
+            self._load_image(image_data, "RGB"),
+            text,
+            position=position,
+            font_preset=font_preset,
+            color_preset=color_preset,
+            font_size=font_size,
+            stroke_width=stroke_width,
+            shadow_offset=shadow_offset,
+            max_width_ratio=max_width_ratio,
+            custom_position=custom_position,
+            custom_colors=custom_colors,
+        )
+
+        # Encode back to base64
+        return self._encode_image(image)
+
+    def _add_text_to_image(
+        self,
+        image: Image.Image,
+        text: str,
+        position: str = "bottom_center",
+        font_preset: str = "impact",
+        color_preset: str = "white_shadow",
+        font_size: Optional[int] = None,
+        stroke_width: int = 4,
+        shadow_offset: int = 5,
+        max_width_ratio: float = 0.9,
+        custom_position: Optional[Tuple[float, float]] = None,
+        custom_colors: Optional[dict] = None,
+    ) -> Image.Image:
+        """
+        Draw a text overlay onto an RGB image in place, without encoding it.
+
+        Args:
+            image: RGB image to draw on
+            (other arguments as for add_text)
 
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
+        Returns:
+            The same image, for chaining
+        """
         width, height = image.size
 
-        # Create overlay for text
-        overlay = Image.new("RGBA", image.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
+        # Draw straight onto the image instead of onto a full-size overlay
+        # that would then have to be composited over it
+        draw = ImageDraw.Draw(image)
 
         # Calculate font size if not specified
         if font_size is None:
-            # Dynamic sizing based on text length and image size
-            base_size = int(height * 0.12)  # 12% of height as base
-            # Reduce size for longer text
-            if len(text) > 20:
-                base_size = int(base_size * 0.8)
-            if len(text) > 30:
-                base_size = int(base_size * 0.7)
-            font_size = max(base_size, 24)
+            font_size = self._auto_font_size(len(text), height)
 
         font = self._get_font(font_preset, font_size)
 
         # Get colors
-        colors = custom_colors or self.COLOR_PRESETS.get(
-            color_preset, self.COLOR_PRESETS["white_shadow"]
-        )
-        fill_color = self._hex_to_rgb(colors["fill"])
-        stroke_color = self._hex_to_rgb(colors["stroke"])
-        shadow_color = self._hex_to_rgb(colors["shadow"]) + (128,)  # Semi-transparent shadow
+        if custom_colors:
+            fill_color = self._hex_to_rgb(custom_colors["fill"])
+            stroke_color = self._hex_to_rgb(custom_colors["stroke"])
+            shadow_color = self._hex_to_rgb(custom_colors["shadow"])
+        else:
+            colors = self._PRESET_RGB.get(color_preset, self._PRESET_RGB["white_shadow"])
+            fill_color, stroke_color, shadow_color = colors["fill"], colors["stroke"], colors["shadow"]
 
         # Get position
         pos_ratios = custom_position or self.POSITION_PRESETS.get(
@@ -227,43 +326,46 @@ class TextOverlayService:
 
         # Draw shadow
         if shadow_offset > 0:
-            shadow_pos = (x + shadow_offset, y + shadow_offset)
-            if "\n" in text:
-                draw.multiline_text(
-                    shadow_pos, text, font=font, fill=shadow_color, align="center"
-                )
-            else:
-                draw.text(shadow_pos, text, font=font, fill=shadow_color)
-
-        # Draw stroke/outline
-        if stroke_width > 0:
-            for dx in range(-stroke_width, stroke_width + 1):
-                for dy in range(-stroke_width, stroke_width + 1):
-                    if dx * dx + dy * dy <= stroke_width * stroke_width:
-                        stroke_pos = (x + dx, y + dy)
-                        if "\n" in text:
-                            draw.multiline_text(
-                                stroke_pos, text, font=font, fill=stroke_color, align="center"
-                            )
-                        else:
-                            draw.text(stroke_pos, text, font=font, fill=stroke_color)
-
-        # Draw main text
+            self._draw_shadow(image, draw, (x + shadow_offset, y + shadow_offset), text, font, shadow_color)
+
+        # Draw main text; FreeType renders the outline in the same pass
+        # instead of redrawing the text at every offset within stroke_width
+        stroke = {"stroke_width": stroke_width, "stroke_fill": stroke_color} if stroke_width > 0 else {}
         if "\n" in text:
-            draw.multiline_text((x, y), text, font=font, fill=fill_color, align="center")
+            draw.multiline_text((x, y), text, font=font, fill=fill_color, align="center", **stroke)
         else:
-            draw.text((x, y), text, font=font, fill=fill_color)
+            draw.text((x, y), text, font=font, fill=fill_color, **stroke)
 
-        # Composite overlay onto image
-        result = Image.alpha_composite(image, overlay)
-        result = result.convert("RGB")
+        return image
 
-        # Encode back to base64
-        buffer = io.BytesIO()
-        result.save(buffer, format="PNG", quality=95)
-        buffer.seek(0)
-
-        return f"data:image/png;base64,{base64.b64encode(buffer.read()).decode('utf-8')}"
+    def _draw_shadow(
+        self,
+        image: Image.Image,
+        draw: ImageDraw.ImageDraw,
+        position: Tuple[int, int],
+        text: str,
+        font: ImageFont.FreeTypeFont,
+        color: Tuple[int, int, int],
+    ) -> None:
+        """Blend a semi-transparent text shadow into image, through a mask covering just the text."""
+        multiline = "\n" in text
+        measure = draw.multiline_textbbox if multiline else draw.textbbox
+        left, top, right, bottom = measure(position, text, font=font, align="center")
+        left, top = max(int(left), 0), max(int(top), 0)
+        right, bottom = min(math.ceil(right), image.width), min(math.ceil(bottom), image.height)
+        if right <= left or bottom <= top:
+            return
+
+        # Glyph coverage scaled to 50% opacity, so pasting the colour through
+        # it blends the shadow like compositing a translucent overlay would
+        mask = Image.new("L", (right - left, bottom - top), 0)
+        mask_draw = ImageDraw.Draw(mask)
+        mask_position = (position[0] - left, position[1] - top)
+        if multiline:
+            mask_draw.multiline_text(mask_position, text, font=font, fill=128, align="center")
+        else:
+            mask_draw.text(mask_position, text, font=font, fill=128)
+        image.paste(color, (left, top, right, bottom), mask)
 
     def _wrap_text(
         self, text: str, font: ImageFont.FreeTypeFont, max_width: int, draw: ImageDraw.Draw
@@ -272,16 +374,22 @@ class TextOverlayService:
         words = text.split()
         lines = []
         current_line = []
+        # Line widths are kept as running sums of advance widths, so each
+        # word is measured once instead of re-measuring the whole line
+        space_width = draw.textlength(" ", font=font)
+        line_width = 0.0
 
         for word in words:
-            test_line = " ".join(current_line + [word])
-            bbox = draw.textbbox((0, 0), test_line, font=font)
-            if bbox[2] - bbox[0] <= max_width:
+            word_width = draw.textlength(word, font=font)
+            test_width = line_width + space_width + word_width if current_line else word_width
+            if test_width <= max_width:
                 current_line.append(word)
+                line_width = test_width
             else:
                 if current_line:
                     lines.append(" ".join(current_line))
                 current_line = [word]
+                line_width = word_width
 
         if current_line:
             lines.append(" ".join(current_line))
@@ -308,11 +416,12 @@ class TextOverlayService:
         Returns:
             Base64 encoded image with all text overlays
         """
-        result = image_data
+        # Decode once and encode once; every overlay draws on the same PIL image
+        result = self._load_image(image_data, "RGB")
 
         for text_config in texts:
-            result = self.add_text(
-                image_data=result,
+            self._add_text_to_image(
+                result,
                 text=text_config.get("text", ""),
                 position=text_config.get("position", "bottom_center"),
                 font_preset=text_config.get("font_preset", "impact"),
@@ -322,54 +431,53 @@ class TextOverlayService:
                 custom_colors=text_config.get("custom_colors"),
             )
 
-        return result
+        return self._encode_image(result)
 
     def add_gradient_background(
         self,
-        image_data: str,
+        image_data: Union[str, bytes, Image.Image],
         position: str = "bottom",
         opacity: float = 0.6,
         height_ratio: float = 0.3,
-    ) -> str:
+        as_image: bool = False,
+    ) -> Union[str, Image.Image]:
         """
         Add a gradient background for better text readability.
 
         Args:
-            image_data: Base64 encoded image
+            image_data: Base64 encoded image (or raw bytes / PIL image)
             position: "top" or "bottom"
             opacity: Gradient max opacity (0-1)
             height_ratio: Height of gradient as ratio of image height
+            as_image: Return the PIL image instead of a data URI, for chaining
+                into add_text without a PNG/base64 round-trip
 
         Returns:
             Image with gradient overlay
         """
-        if image_data.startswith("data:"):
-            image_data = image_data.split(",")[1]
-
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
+        image = self._load_image(image_data)
         width, height = image.size
 
-        # Create gradient overlay
+        # Create gradient overlay: black, with the alpha ramp built as one
+        # column of bytes and stretched across the width in C
         gradient = Image.new("RGBA", (width, height), (0, 0, 0, 0))
         gradient_height = int(height * height_ratio)
 
-        for y in range(gradient_height):
+        if gradient_height > 0:
             if position == "bottom":
-                actual_y = height - gradient_height + y
-                alpha = int(255 * opacity * (y / gradient_height))
+                top = height - gradient_height
+                ramp = bytes(int(255 * opacity * (y / gradient_height)) for y in range(gradient_height))
             else:  # top
-                actual_y = y
-                alpha = int(255 * opacity * (1 - y / gradient_height))
+                top = 0
+                ramp = bytes(int(255 * opacity * (1 - y / gradient_height)) for y in range(gradient_height))
 
-            for x in range(width):
-                gradient.putpixel((x, actual_y), (0, 0, 0, alpha))
+            column = Image.frombytes("L", (1, gradient_height), ramp)
+            alpha = Image.new("L", (width, height), 0)
+            alpha.paste(column.resize((width, gradient_height), Image.NEAREST), (0, top))
+            gradient.putalpha(alpha)
 
         result = Image.alpha_composite(image, gradient)
-        result = result.convert("RGB")
-
-        buffer = io.BytesIO()
-        result.save(buffer, format="PNG", quality=95)
-        buffer.seek(0)
+        if as_image:
+            return result
 
-        return f"data:image/png;base64,{base64.b64encode(buffer.read()).decode('utf-8')}"
+        return self._encode_image(result.convert("RGB"))
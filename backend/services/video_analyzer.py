@@ -2,10 +2,29 @@
 Video Analyzer Service
 Extracts metadata and transcripts from YouTube videos.
 """
+import logging
 import re
 from typing import Optional
+import httpx
 from youtube_transcript_api import YouTubeTranscriptApi
-from googleapiclient.discovery import build
+
+from .cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+# Every supported URL form in one pattern, so a URL is scanned once
+_VIDEO_ID_RE = re.compile(r'(?:youtube\.com/(?:watch\?v=|embed/|v/|live/|shorts/)|youtu\.be/)([^&\n?#]+)')
+
+# YouTube Data API v3 videos.list, called directly; asking for only the
+# snippet fields get_metadata returns keeps the response to those
+VIDEOS_URL = 'https://youtube.googleapis.com/youtube/v3/videos'
+_METADATA_FIELDS = 'items(snippet(title,description,tags,channelTitle,categoryId,publishedAt))'
+
+# Keyless, quota-free endpoint for a video's title, channel and thumbnail
+OEMBED_URL = 'https://www.youtube.com/oembed'
+BASIC_METADATA_CACHE_SIZE = 1024
+BASIC_METADATA_CACHE_TTL = 3600
 
 
 class VideoAnalyzer:
@@ -18,8 +37,17 @@ class VideoAnalyzer:
         Args:
             youtube_api_key: YouTube Data API v3 key
         """
-        self.youtube = build('youtube', 'v3', developerKey=youtube_api_key)
+        self.youtube_api_key = youtube_api_key
         self.transcript_api = YouTubeTranscriptApi()
+        # One pooled, thread-safe client for Data API and oEmbed calls, so
+        # concurrent analyses from worker threads reuse keep-alive connections
+        # (googleapiclient's shared httplib2.Http is not safe across threads)
+        self._http = httpx.Client(timeout=httpx.Timeout(10.0, connect=5.0))
+        self._basic_metadata = TTLCache(maxsize=BASIC_METADATA_CACHE_SIZE, ttl=BASIC_METADATA_CACHE_TTL)
+
+    def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        self._http.close()
 
     def extract_video_id(self, url: str) -> str:
         """
@@ -42,19 +70,9 @@ class VideoAnalyzer:
         Raises:
             ValueError: If URL format is not recognized
         """
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=)([^&\n?#]+)',
-            r'(?:youtu\.be\/)([^&\n?#]+)',
-            r'(?:youtube\.com\/embed\/)([^&\n?#]+)',
-            r'(?:youtube\.com\/v\/)([^&\n?#]+)',
-            r'(?:youtube\.com\/live\/)([^&\n?#]+)',
-            r'(?:youtube\.com\/shorts\/)([^&\n?#]+)',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
+        match = _VIDEO_ID_RE.search(url)
+        if match:
+            return match.group(1)
 
         raise ValueError(f"Could not extract video ID from URL: {url}")
 
@@ -71,16 +89,17 @@ class VideoAnalyzer:
         Raises:
             ValueError: If video is not found
         """
-        request = self.youtube.videos().list(
-            part='snippet,contentDetails,statistics',
-            id=video_id
+        response = self._http.get(
+            VIDEOS_URL,
+            params={'part': 'snippet', 'id': video_id, 'fields': _METADATA_FIELDS, 'key': self.youtube_api_key},
         )
-        response = request.execute()
+        response.raise_for_status()
+        items = response.json().get('items')
 
-        if not response.get('items'):
+        if not items:
             raise ValueError(f"Video not found: {video_id}")
 
-        snippet = response['items'][0]['snippet']
+        snippet = items[0]['snippet']
 
         return {
             'title': snippet.get('title', ''),
@@ -91,6 +110,42 @@ class VideoAnalyzer:
             'published_at': snippet.get('publishedAt'),
         }
 
+    def get_basic_metadata(self, video_id: str) -> dict:
+        """
+        Fetch a video's title and channel from YouTube's oEmbed endpoint.
+
+        Needs no API key and uses no Data API quota, but has no description
+        or tags. Results are cached for an hour.
+
+        Args:
+            video_id: YouTube video ID
+
+        Returns:
+            Dictionary containing title, channel, thumbnail_url
+
+        Raises:
+            ValueError: If the video is not found or not embeddable
+        """
+        metadata = self._basic_metadata.get(video_id)
+        if metadata is not None:
+            return metadata
+
+        response = self._http.get(
+            OEMBED_URL, params={'url': f'https://www.youtube.com/watch?v={video_id}', 'format': 'json'}
+        )
+        if response.status_code in (400, 401, 403, 404):
+            raise ValueError(f"Video not found: {video_id}")
+        response.raise_for_status()
+        data = response.json()
+
+        metadata = {
+            'title': data.get('title', ''),
+            'channel': data.get('author_name', ''),
+            'thumbnail_url': data.get('thumbnail_url'),
+        }
+        self._basic_metadata.set(video_id, metadata)
+        return metadata
+
     def get_transcript(
         self,
         video_id: str,
@@ -115,32 +170,40 @@ class VideoAnalyzer:
             # Use the new fetch() API (youtube-transcript-api >= 1.0.0)
             transcript = self.transcript_api.fetch(video_id, languages=languages)
 
-            # Combine text segments from the FetchedTranscript object
-            full_text = ' '.join([
-                snippet.text.replace('\n', ' ')
-                for snippet in transcript
-            ])
+            # Combine text segments from the FetchedTranscript object, stopping
+            # once there is enough: long videos have far more than max_length
+            parts = []
+            total = 0
+            for snippet in transcript:
+                text = snippet.text.replace('\n', ' ')
+                parts.append(text)
+                total += len(text) + 1
+                if total > max_length:
+                    break
 
             # Limit length for LLM context
-            return full_text[:max_length]
+            return ' '.join(parts)[:max_length]
 
         except Exception as e:
             # Transcript not available - this is common and not an error
-            print(f"Transcript not available for {video_id}: {e}")
+            logger.info("Transcript not available for %s: %s", video_id, e)
             return None
 
-    def analyze(self, url: str) -> dict:
+    def analyze(self, url: str, include_description: bool = True) -> dict:
         """
         Complete video analysis - metadata and transcript.
 
         Args:
             url: YouTube video URL
+            include_description: Fetch description and tags from the Data API;
+                if False, only title and channel come from oEmbed (no quota)
 
         Returns:
             Dictionary containing video_id, title, description, tags, channel, transcript
+            (title, channel, thumbnail_url and transcript without include_description)
         """
         video_id = self.extract_video_id(url)
-        metadata = self.get_metadata(video_id)
+        metadata = self.get_metadata(video_id) if include_description else self.get_basic_metadata(video_id)
         transcript = self.get_transcript(video_id)
 
         return {
@@ -18,6 +18,7 @@ export default function Home() {
         // Convert base64 to blob for proper download
         const byteString = atob(imageUrl.split(',')[1]);
         const mimeString = imageUrl.split(',')[0].split(':')[1].split(';')[0];
+        link.download = `thumbnail-${index + 1}-${Date.now()}.${mimeString.split('/')[1].replace('jpeg', 'jpg')}`;
         const ab = new ArrayBuffer(byteString.length);
         const ia = new Uint8Array(ab);
         for (let i = 0; i < byteString.length; i++) {